@@ -2,10 +2,23 @@ from django.contrib import admin
 from django.contrib.auth import get_user_model
 from django.contrib.auth.admin import UserAdmin
 
-from .models import FriendShip
+from .models import FriendShip, PurgeJob
 
 User = get_user_model()
 
-admin.site.register(User, UserAdmin)
+
+@admin.action(description="Soft-delete selected users")
+def soft_delete_users(modeladmin, request, queryset):
+    for user in queryset.filter(deleted_at__isnull=True):
+        user.soft_delete()
+
+
+class SoftDeleteUserAdmin(UserAdmin):
+    list_display = UserAdmin.list_display + ("deleted_at",)
+    actions = [soft_delete_users]
+
+
+admin.site.register(User, SoftDeleteUserAdmin)
 admin.site.register(FriendShip)
+admin.site.register(PurgeJob, list_display=("__str__", "deleted_rows", "created_at", "finished_at"))
 # Register your models here.
@@ -0,0 +1,210 @@
+import numpy as np
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from mysite.caches import is_shared
+from mysite.metrics import record_cache
+from outbox.models import Change
+from tweets.models import Like, Tweet
+
+from .models import FriendShip
+
+DAY = 86400
+
+
+def _cache():
+    return caches[settings.ANALYTICS_CACHE]
+
+
+def _key(user_id):
+    return f"analytics:{user_id}"
+
+
+def _utc_offset():
+    # Days are cut at TIME_ZONE's current offset; across a DST change events
+    # close to midnight can land on the neighbouring day.
+    return timezone.localtime().utcoffset().total_seconds()
+
+
+def _timestamps(values):
+    return np.fromiter((value.timestamp() for value in values), dtype=np.float64)
+
+
+def _days(timestamps):
+    return ((timestamps + _utc_offset()) // DAY).astype(np.int64)
+
+
+def day_number(value):
+    """Local calendar day of a datetime, counted from 1970-01-01."""
+    return int(_days(np.array([value.timestamp()]))[0])
+
+
+class ProfileStats:
+    """One user's activity as daily counts, current up to outbox change `position`.
+
+    Each series holds a count per day from day number `start` on. tweet_ids is
+    sorted and tweet_likes[i] is how many likes tweet_ids[i] received.
+    Followers are counted on the day they followed, so follower growth only
+    covers people who still follow the user.
+    """
+
+    SERIES = ("tweets", "likes", "followers")
+
+    def __init__(self, start, tweets, likes, followers, tweet_ids, tweet_likes, position):
+        self.start = start
+        self.tweets = tweets
+        self.likes = likes
+        self.followers = followers
+        self.tweet_ids = tweet_ids
+        self.tweet_likes = tweet_likes
+        self.position = position
+
+    @classmethod
+    def build(cls, user_id, today):
+        snapshot = connection.vendor == "postgresql" and not connection.in_atomic_block
+        with transaction.atomic():
+            # The log position and the rows are read from one snapshot, so
+            # every change up to the position is counted exactly once and the
+            # consumer applies the rest. SQLite and MySQL transactions read a
+            # single snapshot already; PostgreSQL needs REPEATABLE READ.
+            if snapshot:
+                with connection.cursor() as cursor:
+                    cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+            position = Change.objects.aggregate(position=Max("pk"))["position"] or 0
+            tweet_days = _days(
+                _timestamps(Tweet.objects.filter(user_id=user_id).values_list("created_at", flat=True).iterator())
+            )
+            liked = np.fromiter(
+                (
+                    (tweet_id, created_at.timestamp())
+                    for tweet_id, created_at in Like.objects.filter(tweet__user_id=user_id)
+                    .values_list("tweet_id", "created_at")
+                    .iterator()
+                ),
+                dtype=[("tweet_id", np.int64), ("timestamp", np.float64)],
+            )
+            follower_days = _days(
+                _timestamps(
+                    FriendShip.objects.filter(following_id=user_id).values_list("created_at", flat=True).iterator()
+                )
+            )
+        days = [tweet_days, _days(liked["timestamp"]), follower_days]
+        present = [values for values in days if len(values)]
+        start = min([today, *(values.min() for values in present)])
+        end = max([today, *(values.max() for values in present)])
+        series = [np.bincount(values - start, minlength=end - start + 1) for values in days]
+        tweet_ids, tweet_likes = np.unique(liked["tweet_id"], return_counts=True)
+        return cls(int(start), *series, tweet_ids, tweet_likes.astype(np.int64), position)
+
+    def _index(self, day):
+        index = day - self.start
+        if index < 0:
+            return None
+        grow = index + 1 - len(self.tweets)
+        if grow > 0:
+            for name in self.SERIES:
+                setattr(self, name, np.concatenate([getattr(self, name), np.zeros(grow, dtype=np.int64)]))
+        return index
+
+    def add(self, series, day, tweet_id=None):
+        """Count one new event; return False if it predates the series."""
+        index = self._index(day)
+        if index is None:
+            return False
+        getattr(self, series)[index] += 1
+        if tweet_id is not None:
+            i = np.searchsorted(self.tweet_ids, tweet_id)
+            if i < len(self.tweet_ids) and self.tweet_ids[i] == tweet_id:
+                self.tweet_likes[i] += 1
+            else:
+                self.tweet_ids = np.insert(self.tweet_ids, i, tweet_id)
+                self.tweet_likes = np.insert(self.tweet_likes, i, 1)
+        return True
+
+    def totals(self):
+        return {name: int(getattr(self, name).sum()) for name in self.SERIES}
+
+    def daily(self, today, days):
+        """(date, tweets, likes, new followers, followers) for each of the last `days` days."""
+        end = self._index(today) + 1
+        begin = max(end - days, 0)
+        followers = np.cumsum(self.followers[:end])
+        dates = np.arange(self.start + begin, self.start + end).astype("datetime64[D]")
+        return list(
+            zip(
+                dates.tolist(),
+                self.tweets[begin:end].tolist(),
+                self.likes[begin:end].tolist(),
+                self.followers[begin:end].tolist(),
+                followers[begin:].tolist(),
+            )
+        )
+
+    def top_tweets(self, n):
+        """(tweet id, likes) for the n most liked tweets, most liked and then newest first."""
+        n = min(n, len(self.tweet_ids))
+        if not n:
+            return []
+        # Everything tied with the n-th largest count stays in, so ties are
+        # broken by id rather than by where the partition happened to cut.
+        threshold = np.partition(self.tweet_likes, -n)[-n]
+        candidates = np.flatnonzero(self.tweet_likes >= threshold)
+        order = candidates[np.lexsort((-self.tweet_ids[candidates], -self.tweet_likes[candidates]))][:n]
+        return list(zip(self.tweet_ids[order].tolist(), self.tweet_likes[order].tolist()))
+
+
+def get_stats(user_id):
+    if not is_shared(settings.ANALYTICS_CACHE):
+        # The consumer's updates would only reach its own process, so a
+        # per-process copy would go stale; build the stats on every view.
+        return ProfileStats.build(user_id, day_number(timezone.now()))
+    stats = _cache().get(_key(user_id))
+    record_cache("analytics", hit=stats is not None)
+    if stats is None:
+        stats = ProfileStats.build(user_id, day_number(timezone.now()))
+        _cache().set(_key(user_id), stats, settings.ANALYTICS_CACHE_TTL)
+    return stats
+
+
+def apply_changes(changes):
+    """Fold outbox changes into the cached stats they touch.
+
+    Creates are counted in place. Anything else (a delete or an archive move)
+    drops the owner's entry instead, since the change doesn't say which day
+    the removed row was counted on.
+    """
+    if not is_shared(settings.ANALYTICS_CACHE):
+        return
+    authors = dict(
+        Tweet.all_objects.filter(pk__in={change.data["tweet_id"] for change in changes if change.topic == "like"})
+        .values_list("id", "user_id")
+        .iterator()
+    )
+    events = []
+    for change in changes:
+        if change.topic == "tweet":
+            events.append((change, change.data["user_id"], "tweets", None))
+        elif change.topic == "like" and change.data["tweet_id"] in authors:
+            events.append((change, authors[change.data["tweet_id"]], "likes", change.data["tweet_id"]))
+        elif change.topic == "follow":
+            events.append((change, change.data["following_id"], "followers", None))
+    cache = _cache()
+    cached = cache.get_many({_key(owner) for _, owner, _, _ in events})
+    updated = set()
+    stale = set()
+    for change, owner, series, tweet_id in events:
+        key = _key(owner)
+        stats = cached.get(key)
+        if stats is None or change.pk <= stats.position:
+            continue
+        if change.op != Change.CREATE or not stats.add(series, day_number(change.created_at), tweet_id):
+            del cached[key]
+            stale.add(key)
+            continue
+        stats.position = change.pk
+        updated.add(key)
+    cache.set_many({key: cached[key] for key in updated - stale}, settings.ANALYTICS_CACHE_TTL)
+    cache.delete_many(stale)
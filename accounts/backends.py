@@ -0,0 +1,34 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+from mysite.caches import is_shared
+from mysite.memoize import memoize
+
+User = get_user_model()
+
+
+def user_tag(user_id):
+    return f"auth_user:{user_id}"
+
+
+def _load_user(user_id):
+    return User._default_manager.get(pk=user_id)
+
+
+@memoize(tags=lambda user_id: [user_tag(user_id)], ttl=300)
+def _cached_user(user_id):
+    return _load_user(user_id)
+
+
+class CachedModelBackend(ModelBackend):
+    # request.user is loaded on nearly every request; the cached copy is
+    # dropped whenever the user row is saved (password, profile, last_login).
+    # Only a shared cache sees that from every process, so with a per-process
+    # one a password change or deactivation elsewhere would go unnoticed.
+    def get_user(self, user_id):
+        load = _cached_user if is_shared("default") else _load_user
+        try:
+            user = load(int(user_id))
+        except (User.DoesNotExist, TypeError, ValueError):
+            return None
+        return user if self.user_can_authenticate(user) else None
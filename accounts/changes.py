@@ -0,0 +1,6 @@
+def follow_rows(queryset):
+    """(key, data) of each friendship, as FollowView records them."""
+    return [
+        (f"{follower_id}:{following_id}", {"follower_id": follower_id, "following_id": following_id})
+        for follower_id, following_id in queryset.values_list("follower_id", "following_id").iterator()
+    ]
@@ -0,0 +1,8 @@
+from outbox.feed import consumer
+
+from .analytics import apply_changes
+
+
+@consumer("accounts.analytics", topics=["tweet", "like", "follow"])
+def update_analytics(changes):
+    apply_changes(changes)
@@ -0,0 +1,72 @@
+import json
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+from tweets.models import ArchivedLike, ArchivedTweet, Like, Tweet
+
+from .models import FriendShip
+
+
+def _dumps(kind, row):
+    return json.dumps({"type": kind, **row}, cls=DjangoJSONEncoder, ensure_ascii=False) + "\n"
+
+
+def _iter_lines(kind, queryset, chunk_size):
+    # Rows are fetched chunk by chunk and each chunk is flushed as one string,
+    # so memory stays bounded by chunk_size regardless of the account size.
+    lines = []
+    for row in queryset.iterator(chunk_size=chunk_size):
+        lines.append(_dumps(kind, row))
+        if len(lines) >= chunk_size:
+            yield "".join(lines)
+            lines = []
+    if lines:
+        yield "".join(lines)
+
+
+def iter_user_export(user, chunk_size=None):
+    chunk_size = chunk_size or settings.ACCOUNT_EXPORT_CHUNK_SIZE
+    yield _dumps(
+        "user",
+        {
+            "id": user.id,
+            "username": user.username,
+            "email": user.email,
+            "date_joined": user.date_joined,
+        },
+    )
+    yield from _iter_lines(
+        "tweet",
+        Tweet.objects.filter(user_id=user.id).order_by("id").values("id", "title", "content", "created_at"),
+        chunk_size,
+    )
+    yield from _iter_lines(
+        "tweet",
+        ArchivedTweet.objects.filter(user_id=user.id).order_by("id").values("id", "title", "content", "created_at"),
+        chunk_size,
+    )
+    yield from _iter_lines(
+        "like",
+        Like.objects.filter(user_id=user.id).order_by("id").values("tweet_id"),
+        chunk_size,
+    )
+    yield from _iter_lines(
+        "like",
+        ArchivedLike.objects.filter(user_id=user.id).order_by("id").values("tweet_id"),
+        chunk_size,
+    )
+    yield from _iter_lines(
+        "following",
+        FriendShip.objects.filter(follower_id=user.id)
+        .order_by("id")
+        .values("following_id", "following__username", "created_at"),
+        chunk_size,
+    )
+    yield from _iter_lines(
+        "follower",
+        FriendShip.objects.filter(following_id=user.id)
+        .order_by("id")
+        .values("follower_id", "follower__username", "created_at"),
+        chunk_size,
+    )
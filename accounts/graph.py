@@ -0,0 +1,303 @@
+import mmap
+import os
+import struct
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Max
+
+from .models import FriendShip
+
+User = get_user_model()
+
+MAGIC = b"SGRAPH1\0"
+# magic, epoch, seq, item size, then the length of each of the four arrays
+HEADER = struct.Struct("<8sqqqqqqq")
+
+EPOCH_KEY = "graph:epoch"
+SEQ_KEY = "graph:seq"
+
+FOLLOW = "follow"
+UNFOLLOW = "unfollow"
+DROP = "drop"
+
+RETRY_INTERVAL = 300
+
+
+def _delta_key(seq):
+    return f"graph:delta:{seq}"
+
+
+def _cache():
+    return caches[settings.SOCIAL_GRAPH_CACHE]
+
+
+class SocialGraph:
+    """Follow edges as sorted integer arrays per user, in both directions.
+
+    ids[offsets[user_id]:offsets[user_id + 1]] is the sorted slice belonging to
+    a user. Changes since the arrays were built live in a small overlay until
+    the next reload.
+    """
+
+    ARRAYS = ("following_offsets", "following_ids", "follower_offsets", "follower_ids")
+
+    def __init__(self, following_offsets, following_ids, follower_offsets, follower_ids, epoch, seq, mapping=None):
+        self.following_offsets = following_offsets
+        self.following_ids = following_ids
+        self.follower_offsets = follower_offsets
+        self.follower_ids = follower_ids
+        self.epoch = epoch
+        self.seq = seq
+        self.mapping = mapping
+        self.added = {}
+        self.added_followers = {}
+        self.removed = set()
+        self.dropped = set()
+        self.missing_since = None
+
+    @property
+    def nbytes(self):
+        return sum(len(ids) * ids.itemsize for ids in self.arrays())
+
+    def arrays(self):
+        return [getattr(self, name) for name in self.ARRAYS]
+
+    @property
+    def overlay_size(self):
+        return len(self.removed) + len(self.dropped) + sum(map(len, self.added.values()))
+
+    @staticmethod
+    def _base(offsets, ids, user_id):
+        if user_id + 1 >= len(offsets):
+            return ids[0:0]
+        return ids[offsets[user_id] : offsets[user_id + 1]]
+
+    def _merge(self, offsets, ids, user_id, added, reverse):
+        if user_id in self.dropped:
+            return []
+        members = set(added.get(user_id, ()))
+        for other in self._base(offsets, ids, user_id):
+            edge = (other, user_id) if reverse else (user_id, other)
+            if edge not in self.removed and other not in self.dropped:
+                members.add(other)
+        return sorted(members)
+
+    def _count(self, offsets, ids, user_id, added, reverse):
+        # Same result as len(_merge()), but only the overlay is walked; the
+        # base slice is only probed, so a popular user costs no more.
+        if user_id in self.dropped:
+            return 0
+        base = self._base(offsets, ids, user_id)
+
+        def in_base(other):
+            index = bisect_left(base, other)
+            return index < len(base) and base[index] == other
+
+        hidden = {other for other in self.dropped if in_base(other)}
+        for edge in self.removed:
+            owner, other = (edge[1], edge[0]) if reverse else edge
+            if owner == user_id and in_base(other):
+                hidden.add(other)
+        extra = sum(1 for other in added.get(user_id, ()) if other in hidden or not in_base(other))
+        return len(base) - len(hidden) + extra
+
+    def is_following(self, follower_id, following_id):
+        if follower_id in self.dropped or following_id in self.dropped:
+            return False
+        if (follower_id, following_id) in self.removed:
+            return False
+        if following_id in self.added.get(follower_id, ()):
+            return True
+        ids = self._base(self.following_offsets, self.following_ids, follower_id)
+        index = bisect_left(ids, following_id)
+        return index < len(ids) and ids[index] == following_id
+
+    def following(self, user_id):
+        return self._merge(self.following_offsets, self.following_ids, user_id, self.added, reverse=False)
+
+    def followers(self, user_id):
+        return self._merge(self.follower_offsets, self.follower_ids, user_id, self.added_followers, reverse=True)
+
+    def following_count(self, user_id):
+        return self._count(self.following_offsets, self.following_ids, user_id, self.added, reverse=False)
+
+    def follower_count(self, user_id):
+        return self._count(self.follower_offsets, self.follower_ids, user_id, self.added_followers, reverse=True)
+
+    def mutual(self, user_id):
+        """Users that user_id follows and who follow back."""
+        return sorted(set(self.following(user_id)).intersection(self.followers(user_id)))
+
+    def reach(self, user_id, hops=2):
+        seen = {user_id}
+        frontier = [user_id]
+        for _ in range(hops):
+            frontier = [other for member in frontier for other in self.following(member) if other not in seen]
+            seen.update(frontier)
+        seen.discard(user_id)
+        return seen
+
+    def apply(self, op, user_id, other_id):
+        if op == DROP:
+            self.dropped.add(user_id)
+        elif op == FOLLOW:
+            self.removed.discard((user_id, other_id))
+            self.added.setdefault(user_id, set()).add(other_id)
+            self.added_followers.setdefault(other_id, set()).add(user_id)
+        elif op == UNFOLLOW:
+            self.removed.add((user_id, other_id))
+            self.added.get(user_id, set()).discard(other_id)
+            self.added_followers.get(other_id, set()).discard(user_id)
+
+    def sync(self):
+        """Apply deltas other processes logged; return False if a reload is needed."""
+        state = _cache().get_many([EPOCH_KEY, SEQ_KEY])
+        if state.get(EPOCH_KEY) != self.epoch or SEQ_KEY not in state:
+            return False
+        target = state[SEQ_KEY]
+        if target - self.seq > settings.SOCIAL_GRAPH_MAX_OVERLAY:
+            return False
+        keys = [_delta_key(seq) for seq in range(self.seq + 1, target + 1)]
+        deltas = _cache().get_many(keys) if keys else {}
+        for key in keys:
+            if key not in deltas:
+                # Either the writer hasn't stored it yet or it expired; give
+                # the writer a moment before giving up on the overlay.
+                if self.missing_since is None:
+                    self.missing_since = time.monotonic()
+                return time.monotonic() - self.missing_since < settings.SOCIAL_GRAPH_DELTA_WAIT
+            self.apply(*deltas[key])
+            self.seq += 1
+        self.missing_since = None
+        return self.overlay_size <= settings.SOCIAL_GRAPH_MAX_OVERLAY
+
+    def save(self, path):
+        path = Path(path)
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        with open(tmp, "wb") as f:
+            arrays = self.arrays()
+            f.write(HEADER.pack(MAGIC, self.epoch, self.seq, arrays[0].itemsize, *map(len, arrays)))
+            for ids in arrays:
+                f.write(ids)
+        tmp.replace(path)
+
+    @classmethod
+    def open(cls, path):
+        """Map a snapshot written by save() without copying the arrays."""
+        with open(path, "rb") as f:
+            mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, epoch, seq, itemsize, *lengths = HEADER.unpack_from(mapping)
+        if magic != MAGIC:
+            mapping.close()
+            raise ValueError(f"{path} is not a social graph snapshot")
+        view = memoryview(mapping)
+        typecode = "i" if itemsize == 4 else "q"
+        arrays = []
+        start = HEADER.size
+        for length in lengths:
+            arrays.append(view[start : start + length * itemsize].cast(typecode))
+            start += length * itemsize
+        return cls(*arrays, epoch=epoch, seq=seq, mapping=mapping)
+
+    @classmethod
+    def build(cls, epoch, seq):
+        """Load every visible friendship, or return None if it won't fit the budget."""
+        max_id = User.all_objects.aggregate(max_id=Max("id"))["max_id"] or 0
+        edges = FriendShip.objects.count()
+        typecode = "i" if max_id < 2**31 else "q"
+        itemsize = array(typecode).itemsize
+        if 2 * (max_id + 2 + edges) * itemsize > settings.SOCIAL_GRAPH_MAX_BYTES:
+            return None
+        following = _csr(typecode, max_id, "follower_id", "following_id")
+        followers = _csr(typecode, max_id, "following_id", "follower_id")
+        return cls(*following, *followers, epoch=epoch, seq=seq)
+
+
+def _csr(typecode, max_id, key, other):
+    offsets = array(typecode, bytes(array(typecode).itemsize * (max_id + 2)))
+    ids = array(typecode)
+    for user_id, other_id in FriendShip.objects.order_by(key, other).values_list(key, other).iterator():
+        offsets[user_id + 1] += 1
+        ids.append(other_id)
+    for user_id in range(1, len(offsets)):
+        offsets[user_id] += offsets[user_id - 1]
+    return offsets, ids
+
+
+def current_state():
+    cache = _cache()
+    state = cache.get_many([EPOCH_KEY, SEQ_KEY])
+    if EPOCH_KEY not in state or SEQ_KEY not in state:
+        # Without both there is no telling which deltas were lost, so every
+        # process has to reload under a new epoch.
+        state = {EPOCH_KEY: time.time_ns(), SEQ_KEY: 0}
+        cache.set_many(state, None)
+    return state[EPOCH_KEY], state[SEQ_KEY]
+
+
+def load():
+    """Open the snapshot if it can be brought up to date, else rebuild and save one."""
+    epoch, seq = current_state()
+    path = settings.SOCIAL_GRAPH_SNAPSHOT
+    if path and Path(path).exists():
+        try:
+            graph = SocialGraph.open(path)
+        except (OSError, ValueError, struct.error):
+            graph = None
+        if graph is not None and graph.nbytes <= settings.SOCIAL_GRAPH_MAX_BYTES and graph.sync():
+            return graph
+    graph = SocialGraph.build(epoch, seq)
+    if graph is not None and path:
+        graph.save(path)
+    return graph
+
+
+_graph = None
+_failed_at = None
+_lock = threading.Lock()
+
+
+def get_graph():
+    """Return this process's graph, or None when disabled or over the memory budget."""
+    global _graph, _failed_at
+    if not settings.SOCIAL_GRAPH:
+        return None
+    with _lock:
+        if _graph is not None and not _graph.sync():
+            _graph = None
+        if _graph is None:
+            if _failed_at is not None and time.monotonic() - _failed_at < RETRY_INTERVAL:
+                return None
+            _graph = load()
+            _failed_at = None if _graph is not None else time.monotonic()
+        return _graph
+
+
+def reset():
+    global _graph, _failed_at
+    with _lock:
+        _graph = _failed_at = None
+
+
+def _record(op, user_id, other_id):
+    cache = _cache()
+    try:
+        seq = cache.incr(SEQ_KEY)
+    except ValueError:
+        current_state()
+        return
+    cache.set(_delta_key(seq), (op, user_id, other_id), settings.SOCIAL_GRAPH_DELTA_TTL)
+
+
+def record(op, user_id, other_id=None):
+    """Log a friendship change for every process's graph once the transaction commits."""
+    if settings.SOCIAL_GRAPH:
+        transaction.on_commit(lambda: _record(op, user_id, other_id))
@@ -0,0 +1,12 @@
+from tasks.models import Task
+from tasks.queue import task
+
+from .models import PurgeJob
+from .purge import run_purge_job
+
+
+@task("accounts.purge", priority=Task.LOW)
+def purge(job_id):
+    job = PurgeJob.objects.filter(pk=job_id, finished_at__isnull=True).first()
+    if job is not None:
+        run_purge_job(job)
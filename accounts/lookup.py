@@ -0,0 +1,43 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import router
+from django.http import Http404
+
+from mysite.memoize import memoize
+from mysite.metrics import record_cache
+
+User = get_user_model()
+
+PROFILE_FIELDS = ("id", "username")
+
+
+def _local_key(username):
+    return f"username:{username}"
+
+
+@memoize(key=lambda username: username, ttl=settings.USERNAME_CACHE_TTL, negative_ttl=60)
+def _lookup(username):
+    row = User.objects.filter(username=username).values_list(*PROFILE_FIELDS).first()
+    if row is None:
+        raise Http404("No User matches the given query.")
+    return row
+
+
+def resolve_username(username):
+    """Return a User holding only id and username; other fields load on access."""
+    # The "local" cache is a bounded in-process LRU in front of the shared
+    # cache. Other workers only see renames and deletions once their local
+    # entry expires, so it is kept short-lived.
+    local = caches["local"]
+    row = local.get(_local_key(username))
+    record_cache("username_local", hit=row is not None)
+    if row is None:
+        row = _lookup(username)
+        local.set(_local_key(username), row, settings.USERNAME_CACHE_LOCAL_TTL)
+    return User.from_db(router.db_for_read(User), PROFILE_FIELDS, row)
+
+
+def forget_username(username):
+    caches["local"].delete(_local_key(username))
+    _lookup.invalidate(username)
@@ -0,0 +1,31 @@
+import time
+
+from django.contrib.auth.hashers import check_password, get_hashers, make_password
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = "Measure signup (hash) and login (verify) throughput of the configured password hashers."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rounds", type=int, default=20)
+
+    def handle(self, *args, rounds, **options):
+        for hasher in get_hashers():
+            try:
+                encoded = make_password("benchmark-password", hasher=hasher)
+            except ValueError as exc:
+                self.stdout.write(f"{hasher.algorithm}: skipped ({exc})")
+                continue
+
+            start = time.perf_counter()
+            for _ in range(rounds):
+                make_password("benchmark-password", hasher=hasher)
+            signup = rounds / (time.perf_counter() - start)
+
+            start = time.perf_counter()
+            for _ in range(rounds):
+                check_password("benchmark-password", encoded)
+            login = rounds / (time.perf_counter() - start)
+
+            self.stdout.write(f"{hasher.algorithm}: signup {signup:.1f}/s, login {login:.1f}/s")
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from accounts.purge import pending_jobs, run_purge_job
+
+
+class Command(BaseCommand):
+    help = "Purge soft-deleted tweets and accounts, resuming unfinished jobs."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=None)
+
+    def handle(self, *args, batch_size, **options):
+        for job in pending_jobs():
+            run_purge_job(
+                job, batch_size, on_progress=lambda job: self.stdout.write(f"{job}: {job.deleted_rows} rows")
+            )
+            self.stdout.write(f"{job}: done")
@@ -0,0 +1,31 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.graph import SocialGraph, current_state
+
+
+class Command(BaseCommand):
+    help = "Build the social graph from the friendship table and write the snapshot workers map at startup."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--path", default=None)
+
+    def handle(self, *args, path, **options):
+        path = path or settings.SOCIAL_GRAPH_SNAPSHOT
+        if not path:
+            raise CommandError("Set SOCIAL_GRAPH_SNAPSHOT or pass --path.")
+        start = time.perf_counter()
+        graph = SocialGraph.build(*current_state())
+        if graph is None:
+            raise CommandError(f"The graph doesn't fit SOCIAL_GRAPH_MAX_BYTES ({settings.SOCIAL_GRAPH_MAX_BYTES}).")
+        built = time.perf_counter() - start
+        graph.save(path)
+        start = time.perf_counter()
+        SocialGraph.open(path)
+        opened = time.perf_counter() - start
+        self.stdout.write(
+            f"{len(graph.following_ids)} edges, {graph.nbytes / 1024:.0f} KiB: "
+            f"built in {built * 1000:.1f} ms, mapped in {opened * 1000:.2f} ms"
+        )
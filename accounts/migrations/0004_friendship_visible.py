@@ -0,0 +1,27 @@
+# Generated by Django 4.1.13 on 2026-10-19 15:58
+
+from django.db import migrations, models
+from django.db.models import Q
+
+
+def hide_deleted(apps, schema_editor):
+    FriendShip = apps.get_model("accounts", "FriendShip")
+    FriendShip.objects.filter(Q(follower__deleted_at__isnull=False) | Q(following__deleted_at__isnull=False)).update(
+        visible=False
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0003_purgejob_alter_user_options_alter_user_managers_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="friendship",
+            name="visible",
+            field=models.BooleanField(default=True),
+        ),
+        migrations.RunPython(hide_deleted, migrations.RunPython.noop),
+    ]
@@ -1,10 +1,61 @@
 # from django.contrib.auth import get_user_model
-from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.contrib.auth.models import AbstractUser, UserManager
+from django.db import models, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+
+class ActiveUserManager(UserManager):
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
 
 
 class User(AbstractUser):
     email = models.EmailField(max_length=254)
+    deleted_at = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    objects = ActiveUserManager()
+    all_objects = UserManager()
+
+    class Meta(AbstractUser.Meta):
+        # Auth backends, admin and unique validation must still see soft-deleted
+        # accounts; deactivating them keeps them from logging in.
+        default_manager_name = "all_objects"
+
+    def soft_delete(self):
+        from notifications.models import Notification
+        from notifications.queries import forget_unread
+        from outbox.feed import record_changes
+        from outbox.models import Change
+        from tasks.queue import enqueue_on_commit
+        from tweets.changes import like_rows, tweet_rows
+        from tweets.models import Like, Tweet
+
+        from .changes import follow_rows
+        from .graph import DROP, record
+        from .jobs import purge
+
+        with transaction.atomic():
+            self.deleted_at = timezone.now()
+            self.is_active = False
+            self.save(update_fields=["deleted_at", "is_active"])
+            # Hidden rows are deletes as far as outbox consumers are concerned.
+            hidden = [
+                ("tweet", tweet_rows, Tweet.all_objects.filter(user_id=self.pk)),
+                ("like", like_rows, Like.all_objects.filter(Q(user_id=self.pk) | Q(tweet__user_id=self.pk))),
+                (
+                    "follow",
+                    follow_rows,
+                    FriendShip.all_objects.filter(Q(follower_id=self.pk) | Q(following_id=self.pk)),
+                ),
+            ]
+            for topic, rows, queryset in hidden:
+                record_changes(topic, Change.DELETE, rows(queryset.filter(visible=True)))
+                queryset.update(visible=False)
+            forget_unread(Notification.objects.filter(actor_id=self.pk))
+            job, _ = PurgeJob.objects.get_or_create(target_type=PurgeJob.USER, target_id=self.pk)
+            enqueue_on_commit(purge, job.pk, key=f"purge:{job.pk}")
+            record(DROP, self.pk)
 
 
 # class Article(models.Model):
@@ -14,12 +65,42 @@ class User(AbstractUser):
 #     )
 
 
+class FriendShipManager(models.Manager):
+    def get_queryset(self):
+        return super().get_queryset().filter(visible=True)
+
+
 class FriendShip(models.Model):
     follower = models.ForeignKey(User, related_name="follower", on_delete=models.CASCADE)
     following = models.ForeignKey(User, related_name="following", on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
+    # False once either user is soft-deleted.
+    visible = models.BooleanField(default=True)
+
+    objects = FriendShipManager()
+    all_objects = models.Manager()
 
     class Meta:
         constraints = [
             models.UniqueConstraint(fields=["follower", "following"], name="unique_friendship"),
         ]
+
+
+class PurgeJob(models.Model):
+    TWEET = "tweet"
+    USER = "user"
+
+    target_type = models.CharField(max_length=10, choices=[(TWEET, "tweet"), (USER, "user")])
+    target_id = models.BigIntegerField()
+    deleted_rows = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["target_type", "target_id"], name="unique_purge_job"),
+        ]
+
+    def __str__(self):
+        return f"{self.target_type}:{self.target_id}"
@@ -0,0 +1,73 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from notifications.models import Notification
+from outbox.feed import record_changes
+from outbox.models import Change
+from tweets.changes import like_rows, tweet_rows
+from tweets.models import ArchivedLike, ArchivedTweet, Like, Tweet
+
+from .changes import follow_rows
+from .models import FriendShip, PurgeJob, User
+
+# Outbox topic and (key, data) rows for purged models that consumers follow.
+CHANGES = {Tweet: ("tweet", tweet_rows), Like: ("like", like_rows), FriendShip: ("follow", follow_rows)}
+
+
+def _steps(job):
+    # Dependents first, so that deleting the target itself never has to
+    # cascade through a large number of rows in one transaction.
+    if job.target_type == PurgeJob.TWEET:
+        return [
+            Like.all_objects.filter(tweet_id=job.target_id),
+            Notification.objects.filter(tweet_id=job.target_id),
+            Tweet.all_objects.filter(pk=job.target_id),
+        ]
+    return [
+        Notification.objects.filter(recipient_id=job.target_id),
+        Notification.objects.filter(actor_id=job.target_id),
+        Notification.objects.filter(tweet__user_id=job.target_id),
+        Like.all_objects.filter(user_id=job.target_id),
+        Like.all_objects.filter(tweet__user_id=job.target_id),
+        FriendShip.all_objects.filter(follower_id=job.target_id),
+        FriendShip.all_objects.filter(following_id=job.target_id),
+        Tweet.all_objects.filter(user_id=job.target_id),
+        ArchivedLike.objects.filter(user_id=job.target_id),
+        ArchivedLike.objects.filter(tweet__user_id=job.target_id),
+        ArchivedTweet.all_objects.filter(user_id=job.target_id),
+        User.all_objects.filter(pk=job.target_id),
+    ]
+
+
+def run_purge_job(job, batch_size=None, on_progress=None):
+    """Delete a soft-deleted target and its dependents in bounded batches.
+
+    Each batch runs in its own transaction and is recorded on the job, so an
+    interrupted purge simply continues from where it stopped. Removed tweets,
+    likes and friendships are recorded in the outbox along with the batch.
+    """
+    batch_size = batch_size or settings.PURGE_BATCH_SIZE
+    for queryset in _steps(job):
+        while True:
+            with transaction.atomic():
+                pks = list(queryset.values_list("pk", flat=True)[:batch_size])
+                if not pks:
+                    break
+                batch = queryset.model._base_manager.filter(pk__in=pks)
+                if queryset.model in CHANGES:
+                    topic, rows = CHANGES[queryset.model]
+                    record_changes(topic, Change.DELETE, rows(batch))
+                batch.delete()
+                PurgeJob.objects.filter(pk=job.pk).update(deleted_rows=F("deleted_rows") + len(pks))
+            job.deleted_rows += len(pks)
+            if on_progress:
+                on_progress(job)
+    job.finished_at = timezone.now()
+    job.save(update_fields=["finished_at", "updated_at"])
+    return job
+
+
+def pending_jobs():
+    return PurgeJob.objects.filter(finished_at__isnull=True).order_by("created_at")
@@ -0,0 +1,55 @@
+from mysite.bloom import MembershipFilter
+from mysite.memoize import memoize
+
+from .graph import get_graph
+from .models import FriendShip
+
+
+def _user_tags(user_id):
+    return [f"user:{user_id}"]
+
+
+@memoize(tags=_user_tags, ttl=300)
+def _following_count(user_id):
+    return FriendShip.objects.filter(follower_id=user_id).count()
+
+
+@memoize(tags=_user_tags, ttl=300)
+def _follower_count(user_id):
+    return FriendShip.objects.filter(following_id=user_id).count()
+
+
+def following_count(user_id):
+    graph = get_graph()
+    if graph is not None:
+        return graph.following_count(user_id)
+    return _following_count(user_id)
+
+
+def follower_count(user_id):
+    graph = get_graph()
+    if graph is not None:
+        return graph.follower_count(user_id)
+    return _follower_count(user_id)
+
+
+def following_ids(user_id):
+    graph = get_graph()
+    if graph is not None:
+        return graph.following(user_id)
+    return list(FriendShip.objects.filter(follower_id=user_id).values_list("following_id", flat=True))
+
+
+following_filter = MembershipFilter(
+    "following", lambda user_id: FriendShip.objects.filter(follower_id=user_id).values_list("following_id", flat=True)
+)
+
+
+def is_following(follower_id, following_id):
+    graph = get_graph()
+    if graph is not None:
+        return graph.is_following(follower_id, following_id)
+    return (
+        following_filter.might_contain(follower_id, following_id)
+        and FriendShip.objects.filter(follower_id=follower_id, following_id=following_id).exists()
+    )
@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBStore
+from django.core.cache import caches
+
+
+class SessionStore(CachedDBStore):
+    """cached_db sessions with an in-process front cache.
+
+    The "local" cache answers repeated requests of the same session without a
+    round trip to the shared cache. Writes and deletes in this process update
+    it immediately; other workers may serve a stale copy for at most
+    SESSION_LOCAL_CACHE_TTL seconds.
+    """
+
+    cache_key_prefix = "accounts.sessions"
+
+    def __init__(self, session_key=None):
+        self._local = caches["local"]
+        super().__init__(session_key)
+
+    def load(self):
+        data = self._local.get(self.cache_key) if self.session_key else None
+        if data is None:
+            data = super().load()
+            if self.session_key:
+                self._local.set(self.cache_key, data, settings.SESSION_LOCAL_CACHE_TTL)
+        return data
+
+    def save(self, must_create=False):
+        super().save(must_create)
+        self._local.set(self.cache_key, self._session, settings.SESSION_LOCAL_CACHE_TTL)
+
+    def delete(self, session_key=None):
+        session_key = session_key or self.session_key
+        if session_key is not None:
+            self._local.delete(self.cache_key_prefix + session_key)
+        super().delete(session_key)
@@ -0,0 +1,64 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from mysite.memoize import invalidate_tags
+
+from .backends import user_tag
+from .graph import FOLLOW, UNFOLLOW, record
+from .lookup import forget_username
+from .models import FriendShip
+from .queries import following_filter
+
+User = get_user_model()
+
+
+@receiver(pre_save, sender=User)
+def remember_old_username(sender, instance, update_fields=None, **kwargs):
+    instance._old_username = None
+    if instance.pk is None or (update_fields is not None and "username" not in update_fields):
+        return
+    instance._old_username = User.objects.filter(pk=instance.pk).values_list("username", flat=True).first()
+
+
+@receiver(post_save, sender=User)
+def forget_saved_user(sender, instance, created, **kwargs):
+    invalidate_tags(user_tag(instance.pk))
+    # A new user may replace a cached "does not exist" entry for its name.
+    if created or instance._old_username != instance.username or instance.deleted_at:
+        forget_username(instance.username)
+    if instance._old_username and instance._old_username != instance.username:
+        forget_username(instance._old_username)
+
+
+@receiver(post_delete, sender=User)
+def forget_deleted_user(sender, instance, **kwargs):
+    invalidate_tags(user_tag(instance.pk))
+    forget_username(instance.username)
+
+
+# Friendship changes reach the social graph and the membership filters here
+# rather than in the views, so admin edits and cascades are included.
+@receiver(pre_save, sender=FriendShip)
+def remember_old_edge(sender, instance, **kwargs):
+    instance._old_edge = None
+    if instance.pk is not None:
+        instance._old_edge = (
+            FriendShip.all_objects.filter(pk=instance.pk).values_list("follower_id", "following_id").first()
+        )
+
+
+@receiver(post_save, sender=FriendShip)
+def record_saved_friendship(sender, instance, created, **kwargs):
+    edge = (instance.follower_id, instance.following_id)
+    if not created and instance._old_edge in (None, edge):
+        return
+    if instance._old_edge:
+        record(UNFOLLOW, *instance._old_edge)
+    following_filter.add(*edge)
+    record(FOLLOW, *edge)
+
+
+@receiver(post_delete, sender=FriendShip)
+def record_deleted_friendship(sender, instance, **kwargs):
+    record(UNFOLLOW, instance.follower_id, instance.following_id)
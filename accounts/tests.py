@@ -1,11 +1,32 @@
+import io
+import json
+import os
+import tempfile
+import tracemalloc
+from datetime import datetime, timedelta
+from unittest import mock
+
 from django.conf import settings
 from django.contrib.auth import SESSION_KEY
-from django.test import TestCase
+from django.core.management import call_command
+from django.db import connection
+from django.http import Http404
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 
+from accounts import graph
+from accounts.analytics import ProfileStats, day_number, get_stats
 from accounts.forms import User
-from accounts.models import FriendShip
-from tweets.models import Tweet
+from accounts.hashers import TunablePBKDF2PasswordHasher
+from accounts.lookup import resolve_username
+from accounts.models import FriendShip, PurgeJob
+from accounts.purge import run_purge_job
+from mysite.checks import check_analytics_cache, check_shared_caches
+from mysite.testcases import TestCase
+from outbox.feed import consume
+from tweets.models import Like, Tweet
 
 
 class TestSignUpView(TestCase):
@@ -297,7 +318,11 @@ class TestUserProfileView(TestCase):
         Tweet.objects.create(user=self.user2, content="testcontent")
         response = self.client.get(self.url)
 
-        self.assertQuerysetEqual(response.context["object_list"], Tweet.objects.filter(user=self.user1))
+        self.assertQuerysetEqual(
+            response.context["object_list"],
+            Tweet.objects.filter(user=self.user1).values_list("pk", flat=True),
+            transform=lambda card: card.pk,
+        )
 
         self.assertEqual(response.context["following_count"], FriendShip.objects.filter(follower=self.user1).count())
         self.assertEqual(response.context["follower_count"], FriendShip.objects.filter(following=self.user1).count())
@@ -397,3 +422,423 @@ class TestFollowerListView(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(len(response.context["follower_list"]), 1)
         self.assertEqual(response.context["follower_list"][0], self.friendship2)
+
+
+class TestUserDataExportView(TestCase):
+    def setUp(self):
+        self.user1 = User.objects.create_user(username="testuser1", email="test1@example.com", password="testpassword")
+        self.user2 = User.objects.create_user(username="testuser2", email="test2@example.com", password="testpassword")
+        self.url = reverse("accounts:export")
+        self.client.force_login(self.user1)
+
+    def test_success_get(self):
+        tweet = Tweet.objects.create(user=self.user1, title="test", content="testtweet")
+        Tweet.objects.create(user=self.user2, title="test2", content="testtweet2")
+        Like.objects.create(user=self.user1, tweet=tweet)
+        FriendShip.objects.create(follower=self.user1, following=self.user2)
+        FriendShip.objects.create(follower=self.user2, following=self.user1)
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+
+        records = [json.loads(line) for line in b"".join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([record["type"] for record in records], ["user", "tweet", "like", "following", "follower"])
+        self.assertEqual(records[0]["username"], "testuser1")
+        self.assertEqual(records[1]["content"], "testtweet")
+        self.assertEqual(records[2]["tweet_id"], tweet.id)
+        self.assertEqual(records[3]["following__username"], "testuser2")
+        self.assertEqual(records[4]["follower__username"], "testuser2")
+
+    def test_failure_get_without_login(self):
+        self.client.logout()
+        response = self.client.get(self.url)
+        self.assertRedirects(response, f"{reverse(settings.LOGIN_URL)}?next={self.url}")
+
+    @override_settings(ACCOUNT_EXPORT_CHUNK_SIZE=50)
+    def test_peak_memory_is_flat(self):
+        def export_peak(tweet_count):
+            Tweet.objects.all().delete()
+            Tweet.objects.bulk_create(
+                Tweet(user=self.user1, title="title", content="c" * 100) for _ in range(tweet_count)
+            )
+            response = self.client.get(self.url)
+            tracemalloc.start()
+            size = sum(len(chunk) for chunk in response.streaming_content)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            self.assertGreater(size, tweet_count * 100)
+            return peak
+
+        small_peak = export_peak(200)
+        large_peak = export_peak(2000)
+        self.assertLess(large_peak, small_peak * 1.5)
+
+
+class TestUserAnalyticsView(TestCase):
+    def setUp(self):
+        self.user1 = User.objects.create_user(username="testuser1", password="testpassword")
+        self.user2 = User.objects.create_user(username="testuser2", password="testpassword")
+        self.user3 = User.objects.create_user(username="testuser3", password="testpassword")
+        self.url = reverse("accounts:analytics", kwargs={"username": "testuser1"})
+        self.tweet1 = Tweet.objects.create(user=self.user1, title="first", content="testtweet")
+        self.tweet2 = Tweet.objects.create(user=self.user1, title="second", content="testtweet")
+        Like.objects.create(user=self.user2, tweet=self.tweet2)
+        Like.objects.create(user=self.user3, tweet=self.tweet2)
+        Like.objects.create(user=self.user2, tweet=self.tweet1)
+        FriendShip.objects.create(follower=self.user2, following=self.user1)
+        self.client.login(username="testuser1", password="testpassword")
+        # Stats are only cached in a cache all processes share.
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        shared = {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache", "LOCATION": cache_dir.name}
+        overrides = override_settings(CACHES={**settings.CACHES, "shared": shared}, ANALYTICS_CACHE="shared")
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def test_success_get(self):
+        three_days_ago = timezone.now() - timedelta(days=3)
+        Tweet.objects.filter(pk=self.tweet1.pk).update(created_at=three_days_ago)
+        FriendShip.objects.filter(follower=self.user2).update(created_at=three_days_ago)
+        FriendShip.objects.create(follower=self.user3, following=self.user1)
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["totals"], {"tweets": 2, "likes": 3, "followers": 2})
+        self.assertEqual(response.context["top_tweets"], [(self.tweet2.pk, "second", 2), (self.tweet1.pk, "first", 1)])
+        daily = response.context["daily"]
+        self.assertEqual(len(daily), 4)
+        self.assertEqual(daily[0][1:], (1, 0, 1, 1))
+        self.assertEqual(daily[-1][1:], (1, 3, 1, 2))
+        self.assertEqual(daily[-1][0], timezone.localdate())
+
+    def test_failure_get_other_user(self):
+        response = self.client.get(reverse("accounts:analytics", kwargs={"username": "testuser2"}))
+        self.assertEqual(response.status_code, 403)
+
+    def test_new_events_update_cached_stats(self):
+        get_stats(self.user1.pk)
+        self.client.force_login(self.user3)
+        self.client.post(reverse("tweets:like", kwargs={"pk": self.tweet1.pk}))
+        self.client.post(reverse("accounts:follow", kwargs={"username": "testuser1"}))
+        consume("accounts.analytics")
+
+        with mock.patch.object(ProfileStats, "build", side_effect=AssertionError):
+            stats = get_stats(self.user1.pk)
+        self.assertEqual(stats.totals(), {"tweets": 2, "likes": 4, "followers": 2})
+        self.assertEqual(stats.top_tweets(1), [(self.tweet2.pk, 2)])
+        self.assertEqual(stats.top_tweets(2), [(self.tweet2.pk, 2), (self.tweet1.pk, 2)])
+        self.assertEqual(consume("accounts.analytics"), 0)
+
+    def test_deletion_rebuilds_stats(self):
+        get_stats(self.user1.pk)
+        self.client.force_login(self.user2)
+        self.client.post(reverse("tweets:unlike", kwargs={"pk": self.tweet2.pk}))
+        consume("accounts.analytics")
+
+        self.assertEqual(get_stats(self.user1.pk).totals()["likes"], 2)
+
+    def test_per_process_cache_is_not_used(self):
+        with override_settings(ANALYTICS_CACHE="default"):
+            self.assertEqual([warning.id for warning in check_analytics_cache(None)], ["mysite.W001"])
+            get_stats(self.user1.pk)
+            with mock.patch.object(ProfileStats, "build", wraps=ProfileStats.build) as build:
+                self.assertEqual(get_stats(self.user1.pk).totals()["likes"], 3)
+            build.assert_called_once()
+        self.assertEqual(check_analytics_cache(None), [])
+
+    def test_day_number(self):
+        self.assertEqual(day_number(datetime(1970, 1, 2, tzinfo=timezone.utc)), 1)
+        # TIME_ZONE is Asia/Tokyo, nine hours ahead of UTC.
+        self.assertEqual(day_number(datetime(1970, 1, 1, 15, tzinfo=timezone.utc)), 1)
+
+
+class TestResolveUsername(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", email="test@example.com", password="testpassword")
+
+    def test_cached_after_first_lookup(self):
+        with self.assertNumQueries(1):
+            user = resolve_username("testuser")
+        with self.assertNumQueries(0):
+            self.assertEqual(resolve_username("testuser"), user)
+        self.assertEqual(user.pk, self.user.pk)
+        self.assertEqual(user.username, "testuser")
+        self.assertEqual(
+            user.get_deferred_fields(), {f.attname for f in User._meta.concrete_fields} - {"id", "username"}
+        )
+
+    def test_invalidated_on_rename(self):
+        resolve_username("testuser")
+        self.user.username = "renamed"
+        self.user.save()
+        with self.assertRaises(Http404):
+            resolve_username("testuser")
+        self.assertEqual(resolve_username("renamed").pk, self.user.pk)
+
+    def test_invalidated_on_delete(self):
+        resolve_username("testuser")
+        self.user.delete()
+        with self.assertRaises(Http404):
+            resolve_username("testuser")
+
+    def test_negative_entry_cleared_on_signup(self):
+        with self.assertRaises(Http404):
+            resolve_username("newuser")
+        with self.assertNumQueries(0), self.assertRaises(Http404):
+            resolve_username("newuser")
+        user = User.objects.create_user(username="newuser", password="testpassword")
+        self.assertEqual(resolve_username("newuser").pk, user.pk)
+
+
+class TestAuthenticationQueries(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", email="test@example.com", password="testpassword")
+        self.url = reverse("tweets:home")
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        self.shared = {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache", "LOCATION": cache_dir.name}
+
+    def count_queries(self):
+        client = Client()
+        client.login(username="testuser", password="testpassword")
+        client.get(self.url)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(self.url)
+        self.assertEqual(response.context["user"], self.user)
+        return len(queries)
+
+    def test_session_and_user_served_from_cache(self):
+        with override_settings(CACHES={**settings.CACHES, "default": self.shared}):
+            cached = self.count_queries()
+            with override_settings(
+                SESSION_ENGINE="django.contrib.sessions.backends.db",
+                AUTHENTICATION_BACKENDS=["django.contrib.auth.backends.ModelBackend"],
+            ):
+                baseline = self.count_queries()
+        self.assertEqual(baseline - cached, 2)
+
+    def test_user_not_cached_per_process(self):
+        self.client.login(username="testuser", password="testpassword")
+        self.client.get(self.url)
+        # Another process changes the password; this one's cache never hears of it.
+        User.objects.filter(pk=self.user.pk).update(password="!")
+        response = self.client.get(self.url)
+        self.assertRedirects(response, f"{reverse(settings.LOGIN_URL)}?next={self.url}")
+
+    def test_cached_user_dropped_on_password_change(self):
+        self.client.login(username="testuser", password="testpassword")
+        self.client.get(self.url)
+        self.user.set_password("newpassword")
+        self.user.save()
+        response = self.client.get(self.url)
+        self.assertRedirects(response, f"{reverse(settings.LOGIN_URL)}?next={self.url}")
+
+
+class TestPasswordHashingPolicy(TestCase):
+    @override_settings(PASSWORD_HASH_PBKDF2_ITERATIONS=1000)
+    def test_signup_hashes_password_once(self):
+        data = {
+            "username": "testuser",
+            "email": "test@example.com",
+            "password1": "testpassword",
+            "password2": "testpassword",
+        }
+        with mock.patch.object(TunablePBKDF2PasswordHasher, "verify") as verify:
+            self.client.post(reverse("accounts:signup"), data=data)
+        verify.assert_not_called()
+        self.assertIn(SESSION_KEY, self.client.session)
+
+    def test_rehash_on_login_when_cost_changes(self):
+        with override_settings(PASSWORD_HASH_PBKDF2_ITERATIONS=1000):
+            user = User.objects.create_user(username="testuser", password="testpassword")
+        self.assertTrue(user.password.startswith("pbkdf2_sha256$1000$"))
+
+        with override_settings(PASSWORD_HASH_PBKDF2_ITERATIONS=2000):
+            self.client.post(reverse("accounts:login"), {"username": "testuser", "password": "testpassword"})
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith("pbkdf2_sha256$2000$"))
+        self.assertIn(SESSION_KEY, self.client.session)
+
+    @override_settings(
+        PASSWORD_HASHERS=[
+            "accounts.hashers.TunableScryptPasswordHasher",
+            "accounts.hashers.TunablePBKDF2PasswordHasher",
+        ],
+        PASSWORD_HASH_PBKDF2_ITERATIONS=1000,
+        PASSWORD_HASH_SCRYPT_WORK_FACTOR=2**10,
+    )
+    def test_rehash_on_login_when_algorithm_changes(self):
+        user = User.objects.create_user(username="testuser")
+        user.password = TunablePBKDF2PasswordHasher().encode("testpassword", "somesalt")
+        user.save()
+        self.client.post(reverse("accounts:login"), {"username": "testuser", "password": "testpassword"})
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith("scrypt$1024$"))
+
+
+class TestSoftDeleteUser(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", email="test@example.com", password="testpassword")
+        self.user2 = User.objects.create_user(username="testuser2", email="test2@example.com", password="testpassword")
+        tweet = Tweet.objects.create(user=self.user, title="test", content="tweet")
+        tweet2 = Tweet.objects.create(user=self.user2, title="test2", content="tweet2")
+        Like.objects.create(tweet=tweet, user=self.user2)
+        Like.objects.create(tweet=tweet2, user=self.user)
+        FriendShip.objects.create(follower=self.user, following=self.user2)
+        FriendShip.objects.create(follower=self.user2, following=self.user)
+
+    def test_soft_delete_hides_content(self):
+        self.client.login(username="testuser2", password="testpassword")
+        self.client.get(reverse("accounts:user_profile", kwargs={"username": "testuser"}))
+        self.user.soft_delete()
+
+        self.assertFalse(User.objects.filter(pk=self.user.pk).exists())
+        self.assertFalse(Tweet.objects.filter(user=self.user).exists())
+        self.assertFalse(Like.objects.filter(user=self.user).exists())
+        self.assertEqual(FriendShip.objects.count(), 0)
+        self.assertEqual(Tweet.all_objects.count(), 2)
+        response = self.client.get(reverse("accounts:user_profile", kwargs={"username": "testuser"}))
+        self.assertEqual(response.status_code, 404)
+
+    def test_soft_deleted_user_cannot_login(self):
+        self.user.soft_delete()
+        self.assertFalse(self.client.login(username="testuser", password="testpassword"))
+
+    def test_purge_deleted_removes_dependents(self):
+        self.user.soft_delete()
+        call_command("purge_deleted", batch_size=1, stdout=io.StringIO())
+
+        self.assertFalse(User.all_objects.filter(pk=self.user.pk).exists())
+        self.assertEqual(list(Tweet.all_objects.values_list("user_id", flat=True)), [self.user2.pk])
+        self.assertFalse(Like.all_objects.exists())
+        self.assertFalse(FriendShip.all_objects.exists())
+        job = PurgeJob.objects.get()
+        self.assertEqual(job.deleted_rows, 6)
+        self.assertIsNotNone(job.finished_at)
+
+    def test_purge_resumes_interrupted_job(self):
+        self.user.soft_delete()
+        job = PurgeJob.objects.get()
+
+        def interrupt(job):
+            raise KeyboardInterrupt
+
+        with self.assertRaises(KeyboardInterrupt):
+            run_purge_job(job, batch_size=1, on_progress=interrupt)
+        job.refresh_from_db()
+        self.assertEqual(job.deleted_rows, 1)
+        self.assertIsNone(job.finished_at)
+
+        run_purge_job(job, batch_size=1)
+        job.refresh_from_db()
+        self.assertEqual(job.deleted_rows, 6)
+        self.assertFalse(User.all_objects.filter(pk=self.user.pk).exists())
+
+
+class TestSocialGraph(TestCase):
+    def setUp(self):
+        self.snapshot = tempfile.NamedTemporaryFile(suffix=".bin", delete=False)
+        self.snapshot.close()
+        os.unlink(self.snapshot.name)
+        self.settings = override_settings(SOCIAL_GRAPH=True, SOCIAL_GRAPH_SNAPSHOT=self.snapshot.name)
+        self.settings.enable()
+        graph.reset()
+        self.user1 = User.objects.create_user(username="testuser1", password="testpassword")
+        self.user2 = User.objects.create_user(username="testuser2", password="testpassword")
+        self.user3 = User.objects.create_user(username="testuser3", password="testpassword")
+        FriendShip.objects.create(follower=self.user1, following=self.user2)
+        FriendShip.objects.create(follower=self.user2, following=self.user1)
+        FriendShip.objects.create(follower=self.user2, following=self.user3)
+        self.client.login(username="testuser1", password="testpassword")
+
+    def tearDown(self):
+        self.settings.disable()
+        graph.reset()
+        if os.path.exists(self.snapshot.name):
+            os.unlink(self.snapshot.name)
+
+    def test_queries(self):
+        social_graph = graph.get_graph()
+        self.assertTrue(social_graph.is_following(self.user1.pk, self.user2.pk))
+        self.assertFalse(social_graph.is_following(self.user1.pk, self.user3.pk))
+        self.assertEqual(social_graph.following(self.user2.pk), [self.user1.pk, self.user3.pk])
+        self.assertEqual(social_graph.follower_count(self.user3.pk), 1)
+        self.assertEqual(social_graph.mutual(self.user1.pk), [self.user2.pk])
+        self.assertEqual(social_graph.reach(self.user1.pk), {self.user2.pk, self.user3.pk})
+
+    def test_counts_match_lists_without_listing(self):
+        user4 = User.objects.create_user(username="testuser4", password="testpassword")
+        FriendShip.objects.create(follower=self.user3, following=self.user1)
+        FriendShip.objects.create(follower=user4, following=self.user1)
+        social_graph = graph.SocialGraph.build(0, 0)
+        social_graph.apply(graph.UNFOLLOW, self.user2.pk, self.user1.pk)
+        social_graph.apply(graph.FOLLOW, self.user2.pk, self.user1.pk)
+        social_graph.apply(graph.UNFOLLOW, self.user3.pk, self.user1.pk)
+        social_graph.apply(graph.FOLLOW, self.user1.pk, self.user3.pk)
+        social_graph.apply(graph.FOLLOW, user4.pk, self.user2.pk)
+        social_graph.apply(graph.DROP, user4.pk, None)
+        users = [self.user1.pk, self.user2.pk, self.user3.pk, user4.pk]
+        expected = [(len(social_graph.following(pk)), len(social_graph.followers(pk))) for pk in users]
+        with mock.patch.object(graph.SocialGraph, "_merge", side_effect=AssertionError):
+            counts = [(social_graph.following_count(pk), social_graph.follower_count(pk)) for pk in users]
+        self.assertEqual(counts, expected)
+        self.assertEqual(counts[0], (2, 1))
+
+    def test_snapshot_is_mapped_on_next_load(self):
+        built = graph.get_graph()
+        self.assertTrue(os.path.exists(self.snapshot.name))
+        graph.reset()
+        with self.assertNumQueries(0):
+            mapped = graph.get_graph()
+        self.assertIsNotNone(mapped.mapping)
+        self.assertEqual(list(mapped.following_ids), list(built.following_ids))
+        self.assertEqual(list(mapped.follower_offsets), list(built.follower_offsets))
+
+    def test_follow_views_update_graph(self):
+        graph.get_graph()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("accounts:follow", kwargs={"username": "testuser3"}))
+        self.assertTrue(graph.get_graph().is_following(self.user1.pk, self.user3.pk))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("accounts:unfollow", kwargs={"username": "testuser2"}))
+        self.assertEqual(graph.get_graph().following(self.user1.pk), [self.user3.pk])
+        self.assertEqual(graph.get_graph().followers(self.user2.pk), [])
+
+    def test_writes_outside_views_update_graph(self):
+        graph.get_graph()
+        with self.captureOnCommitCallbacks(execute=True):
+            friendship = FriendShip.objects.create(follower=self.user3, following=self.user1)
+        self.assertTrue(graph.get_graph().is_following(self.user3.pk, self.user1.pk))
+        with self.captureOnCommitCallbacks(execute=True):
+            friendship.following = self.user2
+            friendship.save()
+        self.assertEqual(graph.get_graph().following(self.user3.pk), [self.user2.pk])
+        with self.captureOnCommitCallbacks(execute=True):
+            FriendShip.objects.filter(follower=self.user3).delete()
+        self.assertEqual(graph.get_graph().following(self.user3.pk), [])
+        self.assertEqual(graph.get_graph().followers(self.user2.pk), [self.user1.pk])
+
+    def test_check_requires_shared_cache(self):
+        self.assertEqual([error.id for error in check_shared_caches(None)], ["mysite.E001"])
+
+    def test_soft_deleted_user_dropped(self):
+        graph.get_graph()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user3.soft_delete()
+        self.assertEqual(graph.get_graph().following(self.user2.pk), [self.user1.pk])
+
+    def test_profile_served_from_graph(self):
+        graph.get_graph()
+        response = self.client.get(reverse("accounts:user_profile", kwargs={"username": "testuser2"}))
+        self.assertTrue(response.context["is_following"])
+        self.assertEqual(response.context["following_count"], 2)
+        self.assertEqual(response.context["follower_count"], 1)
+
+    @override_settings(SOCIAL_GRAPH_MAX_BYTES=16)
+    def test_over_budget_falls_back_to_database(self):
+        self.assertIsNone(graph.get_graph())
+        response = self.client.get(reverse("accounts:user_profile", kwargs={"username": "testuser2"}))
+        self.assertTrue(response.context["is_following"])
+        self.assertEqual(response.context["following_count"], 2)
@@ -1,17 +1,34 @@
 from django.conf import settings
 from django.contrib import messages
-from django.contrib.auth import authenticate, get_user_model, login
+from django.contrib.auth import get_user_model, login
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.views import LoginView, LogoutView
-from django.http import HttpResponseBadRequest
-from django.shortcuts import get_object_or_404
+from django.core.exceptions import PermissionDenied
+from django.db import IntegrityError, transaction
+from django.http import HttpResponseBadRequest, StreamingHttpResponse
 from django.urls import reverse_lazy
-from django.views.generic import CreateView, ListView, RedirectView
-
+from django.utils import timezone
+from django.views import View
+from django.views.generic import CreateView, ListView, RedirectView, TemplateView
+
+from mysite.memoize import invalidate_tags
+from mysite.metrics import record_write
+from mysite.ratelimit import RateLimitMixin
+from mysite.responsecache import CachedResponseMixin
+from mysite.streaming import StreamingListMixin
+from notifications.jobs import notify_follow
+from outbox.feed import record_change
+from outbox.models import Change
+from tasks.queue import enqueue_on_commit
 from tweets.models import Like, Tweet
+from tweets.timeline import TimelineMixin
 
+from .analytics import day_number, get_stats
+from .export import iter_user_export
 from .forms import SignupForm
+from .lookup import resolve_username
 from .models import FriendShip
+from .queries import follower_count, following_count, is_following
 
 User = get_user_model()
 
@@ -24,16 +41,13 @@ class UserSignUpView(CreateView):
 
     def form_valid(self, form):
         response = super().form_valid(form)
-        username = form.cleaned_data.get("username")
-        email = form.cleaned_data.get("email")
-        password = form.cleaned_data.get("password1")
-        user = authenticate(username=username, email=email, password=password)
-        if user is not None:
-            login(self.request, user)
-            return response
+        # The password was just validated and hashed by the form, so log the
+        # new user in directly instead of hashing it again in authenticate().
+        login(self.request, self.object)
+        return response
 
 
-class UserLoginView(LoginView):
+class UserLoginView(RateLimitMixin, LoginView):
     template_name = "accounts/login.html"
 
 
@@ -41,80 +55,118 @@ class UserLogoutView(LoginRequiredMixin, LogoutView):
     pass
 
 
-class UserProfileView(LoginRequiredMixin, ListView):
+class UserProfileView(LoginRequiredMixin, CachedResponseMixin, TimelineMixin, StreamingListMixin, ListView):
     template_name = "accounts/user_profile.html"
+    stream_template_name = "tweets/tweet_list.html"
     model = Tweet
     context_object_name = "tweets"
 
-    def get_queryset(self):
-        user = get_object_or_404(User, username=self.kwargs["username"])
-        self.user = user
-        return (
-            Tweet.objects.select_related("user")
-            .prefetch_related("liked_tweet")
-            .filter(user__username=self.kwargs.get("username"))
-            .order_by("-created_at")
-        )
+    def get_user(self):
+        if not hasattr(self, "user"):
+            self.user = resolve_username(self.kwargs["username"])
+        return self.user
+
+    def get_cache_entities(self):
+        return [f"user:{self.get_user().pk}"]
+
+    def get_timeline(self):
+        return Tweet.objects.timeline(user_id=self.get_user().pk)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context["user"] = self.user
-        context["is_following"] = FriendShip.objects.filter(follower=self.request.user, following=self.user)
-        context["following_count"] = FriendShip.objects.filter(follower=self.user).count()
-        context["follower_count"] = FriendShip.objects.filter(following=self.user).count()
-        context["liked_list"] = (
-            Like.objects.prefetch_related("tweet").filter(user=self.request.user).values_list("tweet", flat=True)
+        context["is_following"] = is_following(self.request.user.pk, self.user.pk)
+        context["following_count"] = following_count(self.user.pk)
+        context["follower_count"] = follower_count(self.user.pk)
+        context["liked_list"] = set(
+            Like.objects.filter(user_id=self.request.user.pk).values_list("tweet_id", flat=True)
         )
         return context
 
 
-class FollowView(LoginRequiredMixin, RedirectView):
+class FollowView(LoginRequiredMixin, RateLimitMixin, RedirectView):
     url = reverse_lazy("tweets:home")
 
     def post(self, request, *args, **kwargs):
-        target_user = get_object_or_404(User, username=self.kwargs["username"])
-        if target_user == self.request.user:
+        target_user = resolve_username(self.kwargs["username"])
+        if target_user.pk == request.user.pk:
             messages.add_message(request, messages.ERROR, "自分自身をフォローすることはできません。")
             return HttpResponseBadRequest("you cannnot follow yourself.")
-        if self.request.user.following.filter(following__username=target_user.username).exists():
-            messages.add_message(request, messages.INFO, "既にフォローしています。")
-        else:
-            FriendShip.objects.create(follower=request.user, following=target_user)
+        if self.follow(request.user.pk, target_user.pk):
+            record_write("follow")
+            invalidate_tags(f"user:{request.user.pk}", f"user:{target_user.pk}")
+            enqueue_on_commit(notify_follow, target_user.pk, request.user.pk)
             messages.add_message(request, messages.SUCCESS, "フォローしました。")
+        else:
+            messages.add_message(request, messages.INFO, "既にフォローしています。")
         return super().post(request, *args, **kwargs)
 
-
-class UnFollowView(LoginRequiredMixin, RedirectView):
+    def follow(self, follower_id, following_id):
+        # A definite miss in the filter or graph skips the existence check; the
+        # unique constraint still catches a concurrent follow.
+        if is_following(follower_id, following_id):
+            return False
+        try:
+            with transaction.atomic():
+                FriendShip.objects.create(follower_id=follower_id, following_id=following_id)
+                record_change(
+                    "follow",
+                    Change.CREATE,
+                    f"{follower_id}:{following_id}",
+                    follower_id=follower_id,
+                    following_id=following_id,
+                )
+        except IntegrityError:
+            return False
+        return True
+
+
+class UnFollowView(LoginRequiredMixin, RateLimitMixin, RedirectView):
     url = reverse_lazy("tweets:home")
 
     def post(self, request, *args, **kwargs):
-        target_user = get_object_or_404(User, username=self.kwargs["username"])
-        if target_user == self.request.user:
+        target_user = resolve_username(self.kwargs["username"])
+        if target_user.pk == request.user.pk:
             messages.add_message(request, messages.ERROR, "自分自身にその操作をすることはできません。")
             return HttpResponseBadRequest("you cannnot unfollow yourself.")
-        if FriendShip.objects.filter(following=target_user).filter(follower=self.request.user).exists():
-            target_friend_obj = get_object_or_404(FriendShip, following=target_user, follower=self.request.user)
-            target_friend_obj.delete()
+        if self.unfollow(request.user.pk, target_user.pk):
+            record_write("unfollow")
+            invalidate_tags(f"user:{request.user.pk}", f"user:{target_user.pk}")
             messages.add_message(request, messages.SUCCESS, "フォロー解除しました。")
         else:
             messages.add_message(request, messages.INFO, "フォローすらしていません")
         return super().post(request, *args, **kwargs)
 
+    def unfollow(self, follower_id, following_id):
+        with transaction.atomic():
+            deleted, _ = FriendShip.objects.filter(follower_id=follower_id, following_id=following_id).delete()
+            if deleted:
+                record_change(
+                    "follow",
+                    Change.DELETE,
+                    f"{follower_id}:{following_id}",
+                    follower_id=follower_id,
+                    following_id=following_id,
+                )
+        return deleted
+
 
 class FollowingListView(LoginRequiredMixin, ListView):
     template_name = "accounts/following_list.html"
     context_object_name = "following_list"
 
     def get_queryset(self):
-        target_user = get_object_or_404(
-            User,
-            username=self.kwargs.get("username"),
+        self.target_user = resolve_username(self.kwargs["username"])
+        return (
+            FriendShip.objects.filter(follower_id=self.target_user.pk)
+            .select_related("following")
+            .only("following", "following__username")
+            .order_by("-created_at")
         )
-        return target_user.follower.select_related("following").order_by("-created_at")
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context["user"] = self.object_list.first().following
+        context["user"] = self.target_user
         return context
 
 
@@ -123,13 +175,40 @@ class FollowerListView(LoginRequiredMixin, ListView):
     context_object_name = "follower_list"
 
     def get_queryset(self):
-        target_user = get_object_or_404(
-            User,
-            username=self.kwargs.get("username"),
+        self.target_user = resolve_username(self.kwargs["username"])
+        return (
+            FriendShip.objects.filter(following_id=self.target_user.pk)
+            .select_related("follower")
+            .only("follower", "follower__username")
+            .order_by("-created_at")
         )
-        return target_user.following.select_related("follower").order_by("-created_at")
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context["user"] = self.object_list.first().follower
+        context["user"] = self.target_user
+        return context
+
+
+class UserAnalyticsView(LoginRequiredMixin, TemplateView):
+    template_name = "accounts/analytics.html"
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        user = resolve_username(self.kwargs["username"])
+        if user.pk != self.request.user.pk:
+            raise PermissionDenied
+        stats = get_stats(user.pk)
+        top = stats.top_tweets(settings.ANALYTICS_TOP_TWEETS)
+        titles = dict(Tweet.objects.filter(pk__in=[pk for pk, _ in top]).values_list("id", "title"))
+        context["user"] = user
+        context["totals"] = stats.totals()
+        context["daily"] = stats.daily(day_number(timezone.now()), settings.ANALYTICS_DAYS)
+        context["top_tweets"] = [(pk, titles[pk], likes) for pk, likes in top if pk in titles]
         return context
+
+
+class UserDataExportView(LoginRequiredMixin, View):
+    def get(self, request, *args, **kwargs):
+        response = StreamingHttpResponse(iter_user_export(request.user), content_type="application/x-ndjson")
+        response["Content-Disposition"] = f'attachment; filename="{request.user.username}.ndjson"'
+        return response
@@ -0,0 +1,9 @@
+from django.contrib import admin
+
+# The admin app is installed without autodiscovery (mysite.lazyadmin), so
+# processes that never load the URLconf, like the task worker, skip every
+# admin.py.
+admin.autodiscover()
+
+app_name = "admin"
+urlpatterns = admin.site.get_urls()
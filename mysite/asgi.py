@@ -14,3 +14,9 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "mysite.settings")
 
 application = get_asgi_application()
+
+# Compile the URLconf and templates and load the optional social graph once,
+# before a preforking server (gunicorn --preload) forks its workers.
+from mysite.startup import warm  # noqa: E402
+
+warm()
@@ -0,0 +1,86 @@
+import functools
+import gzip
+import mimetypes
+import re
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404
+from django.templatetags.static import static
+from django.utils._os import safe_join
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+HASHED_NAME = re.compile(r"\.[0-9a-f]{12}\.\w+$")
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Manifest storage that also writes .gz (and .br when brotli is installed)
+    next to every hashed text asset, so they are compressed once at
+    collectstatic time rather than on each request."""
+
+    compressible_extensions = (".css", ".js", ".svg", ".json", ".txt", ".map")
+    min_size = 256
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for name in set(self.hashed_files.values()):
+            if name.endswith(self.compressible_extensions):
+                self.compress(name)
+
+    def compress(self, name):
+        path = Path(self.path(name))
+        data = path.read_bytes()
+        if len(data) < self.min_size:
+            return
+        variants = {".gz": gzip.compress(data, 9, mtime=0)}
+        if brotli is not None:
+            variants[".br"] = brotli.compress(data)
+        for suffix, compressed in variants.items():
+            if len(compressed) < len(data):
+                path.with_name(path.name + suffix).write_bytes(compressed)
+
+
+@functools.lru_cache(maxsize=None)
+def local_url(path):
+    """URL of a local static file, or None if it hasn't been vendored."""
+    if finders.find(path) is None and not staticfiles_storage.exists(path):
+        return None
+    return static(path)
+
+
+def serve(request, path):
+    """Serve collected static files for deployments without a front web server.
+
+    Hashed names never change content, so they are cached for a year; the
+    precompressed variant is picked from Accept-Encoding.
+    """
+    try:
+        fullpath = Path(safe_join(settings.STATIC_ROOT, path))
+    except SuspiciousFileOperation:
+        raise Http404
+    if not fullpath.is_file():
+        raise Http404
+    content_type = mimetypes.guess_type(fullpath.name)[0] or "application/octet-stream"
+    accepted = request.headers.get("Accept-Encoding", "")
+    encoding = None
+    for candidate, suffix in (("br", ".br"), ("gzip", ".gz")):
+        variant = fullpath.with_name(fullpath.name + suffix)
+        if candidate in accepted and variant.is_file():
+            fullpath, encoding = variant, candidate
+            break
+    response = FileResponse(fullpath.open("rb"), content_type=content_type)
+    if encoding:
+        response["Content-Encoding"] = encoding
+    response["Vary"] = "Accept-Encoding"
+    response["Cache-Control"] = IMMUTABLE if HASHED_NAME.search(path) else f"public, max-age={settings.STATIC_MAX_AGE}"
+    return response
@@ -0,0 +1,141 @@
+import hashlib
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from .memoize import LOCK_TIMEOUT
+from .metrics import record_cache
+
+LN2 = math.log(2)
+
+filters = {}
+
+
+class BloomFilter:
+    __slots__ = ("capacity", "size", "hashes", "count", "bits")
+
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        self.size = max(math.ceil(-capacity * math.log(error_rate) / LN2**2), 64)
+        self.hashes = max(round(self.size / capacity * LN2), 1)
+        self.count = 0
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item):
+        # Double hashing: k positions derived from two 64-bit halves of one digest.
+        digest = hashlib.blake2b(str(item).encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+    @property
+    def full(self):
+        return self.count >= self.capacity
+
+
+class MembershipFilter:
+    """A per-owner Bloom filter over a relation, held in the shared cache.
+
+    might_contain() returning False is definite, so callers can skip the exact
+    database check before a read or an insert; deletes never consult it.
+    Filters are rebuilt from load(owner_id) on a miss and carry the owner's
+    version; a write bumps the version before it commits, so a filter that may
+    be missing the new member is never trusted again. Removed members stay set
+    until the next rebuild, which only costs false positives.
+
+    Off unless settings.MEMBERSHIP_FILTER is set; might_contain() then always
+    answers "maybe".
+    """
+
+    def __init__(self, name, load):
+        self.name = name
+        self.load = load
+        filters[name] = self
+
+    @property
+    def cache(self):
+        return caches[settings.MEMBERSHIP_FILTER_CACHE]
+
+    def _keys(self, owner_id):
+        key = f"bloom:{self.name}:{owner_id}"
+        return key, f"{key}:version"
+
+    def _bump(self, version_key):
+        try:
+            return self.cache.incr(version_key)
+        except ValueError:
+            self.cache.set(version_key, time.time_ns(), None)
+            return None
+
+    def get(self, owner_id):
+        key, version_key = self._keys(owner_id)
+        found = self.cache.get_many([key, version_key])
+        entry = found.get(key)
+        if entry is not None and entry[0] == found.get(version_key):
+            return entry[1]
+        return self.rebuild(owner_id)
+
+    def rebuild(self, owner_id):
+        key, version_key = self._keys(owner_id)
+        # Read the version before loading, so a write committed meanwhile makes
+        # the stored filter stale instead of silently missing a member.
+        self.cache.add(version_key, time.time_ns(), None)
+        version = self.cache.get(version_key)
+        members = list(self.load(owner_id))
+        bloom = BloomFilter(
+            max(len(members) * 2, settings.MEMBERSHIP_FILTER_MIN_CAPACITY), settings.MEMBERSHIP_FILTER_ERROR_RATE
+        )
+        for member in members:
+            bloom.add(member)
+        self.cache.set(key, (version, bloom), settings.MEMBERSHIP_FILTER_TTL)
+        return bloom
+
+    def might_contain(self, owner_id, member_id):
+        if not settings.MEMBERSHIP_FILTER:
+            return True
+        found = member_id in self.get(owner_id)
+        record_cache(f"bloom:{self.name}", hit=not found)
+        return found
+
+    def add(self, owner_id, member_id):
+        """Record a member written in the current transaction."""
+        if not settings.MEMBERSHIP_FILTER:
+            return
+        _, version_key = self._keys(owner_id)
+        version = self._bump(version_key)
+        if version is not None:
+            transaction.on_commit(lambda: self._add(owner_id, member_id, version))
+
+    def _add(self, owner_id, member_id, version):
+        key, version_key = self._keys(owner_id)
+        lock_key = f"{key}:lock"
+        if not self.cache.add(lock_key, 1, LOCK_TIMEOUT):
+            self._bump(version_key)
+            return
+        try:
+            entry = self.cache.get(key)
+            # Only the filter from just before this write (or one rebuilt since)
+            # is complete apart from member_id; anything else is left to expire.
+            if entry is None or entry[0] not in (version - 1, version) or entry[1].full:
+                return
+            if self.cache.get(version_key) != version:
+                return
+            bloom = entry[1]
+            bloom.add(member_id)
+            self.cache.set(key, (self._bump(version_key), bloom), settings.MEMBERSHIP_FILTER_TTL)
+        finally:
+            self.cache.delete(lock_key)
+
+    def invalidate(self, owner_id):
+        self._bump(self._keys(owner_id)[1])
@@ -0,0 +1,7 @@
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+
+
+def is_shared(alias):
+    """Whether all processes see the same entries; LocMem caches are per process."""
+    return not isinstance(caches[alias], LocMemCache)
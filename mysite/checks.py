@@ -0,0 +1,59 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, Warning, register
+
+from .caches import is_shared
+
+# Feature flag -> setting naming its cache. These features keep state that
+# every process has to see, so a per-process cache would make them wrong
+# rather than just slower.
+SHARED_CACHE_FEATURES = {
+    "MEMBERSHIP_FILTER": "MEMBERSHIP_FILTER_CACHE",
+    "SOCIAL_GRAPH": "SOCIAL_GRAPH_CACHE",
+    "DUPLICATE_DETECTION": "DUPLICATE_CACHE",
+}
+
+
+@register(Tags.caches)
+def check_shared_caches(app_configs, **kwargs):
+    errors = []
+    for flag, cache_setting in SHARED_CACHE_FEATURES.items():
+        alias = getattr(settings, cache_setting)
+        if getattr(settings, flag) and not is_shared(alias):
+            errors.append(
+                Error(
+                    f"{flag} needs a cache shared by all processes, but {cache_setting} ({alias!r}) is per process.",
+                    hint=f"Point {cache_setting} at a Redis or Memcached cache, or turn {flag} off.",
+                    id="mysite.E001",
+                )
+            )
+    return errors
+
+
+@register(Tags.caches, deploy=True)
+def check_analytics_cache(app_configs, **kwargs):
+    if is_shared(settings.ANALYTICS_CACHE):
+        return []
+    return [
+        Warning(
+            f"ANALYTICS_CACHE ({settings.ANALYTICS_CACHE!r}) is per process, so profile analytics are rebuilt "
+            "from the database on every view.",
+            hint="Point ANALYTICS_CACHE at a Redis or Memcached cache.",
+            id="mysite.W001",
+        )
+    ]
+
+
+@register(Tags.caches, deploy=True)
+def check_default_cache(app_configs, **kwargs):
+    # Memoized lookups, cached pages and their tag versions live in "default";
+    # invalidate_tags() in one process can't reach another process's copy.
+    if is_shared("default"):
+        return []
+    return [
+        Warning(
+            "The 'default' cache is per process, so memoized counts and lookups and cached pages stay stale in "
+            "other processes after a write until they expire.",
+            hint="Point the 'default' cache at a Redis or Memcached cache.",
+            id="mysite.W002",
+        )
+    ]
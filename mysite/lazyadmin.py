@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.contrib.admin.apps import SimpleAdminConfig
+
+
+class LazyAdminConfig(SimpleAdminConfig):
+    """The admin without autodiscovery at startup.
+
+    Each app's admin.py is imported by mysite.admin_urls along with the
+    URLconf, so management commands and task workers never load them. With
+    DEBUG on they are imported right away so the system checks cover them.
+    """
+
+    def ready(self):
+        super().ready()
+        if settings.DEBUG:
+            self.module.autodiscover()
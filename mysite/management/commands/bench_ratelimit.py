@@ -0,0 +1,24 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from mysite.ratelimit import hit
+
+
+class Command(BaseCommand):
+    help = "Time the rate limit check made on every unsafe request."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rounds", type=int, default=2000)
+        parser.add_argument("--users", type=int, default=50, help="Distinct clients the hits are spread over.")
+        parser.add_argument("--max-us", type=float, help="Fail if a check takes longer, e.g. 1000.")
+
+    def handle(self, *args, rounds, users, max_us, **options):
+        start = time.perf_counter()
+        for i in range(rounds):
+            hit("bench", f"user:{i % users}", "1000000/m")
+        check_us = (time.perf_counter() - start) / rounds * 1e6
+        self.stdout.write(f"check ({settings.RATELIMIT_CACHE!r} cache): {check_us:.0f} µs per request")
+        if max_us is not None and check_us > max_us:
+            raise CommandError(f"A check took {check_us:.0f} µs, over the {max_us:.0f} µs budget.")
@@ -0,0 +1,25 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import autodiscover_modules
+
+from mysite.bloom import filters
+
+
+class Command(BaseCommand):
+    help = "Rebuild the cached follow/like membership filters from the database."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--filter", action="append", dest="names", help="Only rebuild these filters.")
+        parser.add_argument("user_ids", nargs="*", type=int)
+
+    def handle(self, *args, names, user_ids, **options):
+        autodiscover_modules("queries")
+        selected = [filters[name] for name in names] if names else list(filters.values())
+        if not user_ids:
+            user_ids = get_user_model().objects.values_list("pk", flat=True).iterator()
+        count = 0
+        for user_id in user_ids:
+            for membership_filter in selected:
+                membership_filter.rebuild(user_id)
+            count += 1
+        self.stdout.write(f"rebuilt {', '.join(f.name for f in selected)} for {count} users")
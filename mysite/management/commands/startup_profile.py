@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from mysite.startup import by_package, cold_start, import_profile
+
+
+class Command(BaseCommand):
+    help = "Break down the import time of a fresh interpreter loading the WSGI or ASGI application."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--module", default="mysite.wsgi")
+        parser.add_argument("--depth", type=int, default=2, help="Package depth to group modules by.")
+        parser.add_argument("--limit", type=int, default=20)
+        parser.add_argument(
+            "--budget", type=float, help="Fail if the cold start takes longer than this many seconds, e.g. 1.5."
+        )
+
+    def handle(self, *args, module, depth, limit, budget, **options):
+        seconds, modules = cold_start(f"import {module}")
+        self.stdout.write(f"import {module}: {seconds * 1000:.0f} ms, {len(modules)} modules")
+        if budget is not None and seconds > budget:
+            raise CommandError(f"Cold start took {seconds:.2f} s, over the {budget} s budget.")
+        rows = import_profile(module)
+        total = sum(self_us for _, self_us, _ in rows)
+        self.stdout.write(f"import time (self, by package, {total / 1000:.0f} ms in imports):")
+        for package, self_us in by_package(rows, depth).most_common(limit):
+            self.stdout.write(f"  {self_us / 1000:8.1f} ms  {self_us / total:6.1%}  {package}")
@@ -0,0 +1,24 @@
+import base64
+import hashlib
+import urllib.request
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = "Download CDN assets listed in VENDOR_ASSETS into static/ as local fallbacks."
+
+    def handle(self, *args, **options):
+        for name, (url, integrity, path) in settings.VENDOR_ASSETS.items():
+            with urllib.request.urlopen(url, timeout=30) as response:
+                data = response.read()
+            algorithm, expected = integrity.split("-", 1)
+            actual = base64.b64encode(hashlib.new(algorithm, data).digest()).decode()
+            if actual != expected:
+                raise CommandError(f"{name}: integrity check failed for {url}.")
+            target = Path(settings.STATICFILES_DIRS[0]) / path
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_bytes(data)
+            self.stdout.write(f"{name}: {len(data)} bytes -> {target}")
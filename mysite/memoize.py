@@ -0,0 +1,191 @@
+import functools
+import hashlib
+import math
+import random
+import threading
+import time
+
+from django.core.cache import caches
+from django.core.exceptions import ObjectDoesNotExist
+from django.db.models.query import QuerySet
+from django.http import Http404
+
+from .metrics import record_cache
+
+LOCK_TIMEOUT = 10
+WAIT_INTERVAL = 0.05
+NEGATIVE_EXCEPTIONS = (Http404, ObjectDoesNotExist)
+
+_local_locks = {}
+_local_locks_guard = threading.Lock()
+
+
+def _tag_key(tag):
+    return f"version:{tag}"
+
+
+def tag_versions(tags, cache_alias="default"):
+    cache = caches[cache_alias]
+    keys = [_tag_key(tag) for tag in tags]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # A tag that was never invalidated (or was evicted) starts from the
+            # clock, so it can't collide with entries stored under an old value.
+            cache.add(key, time.time_ns(), None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def invalidate_tags(*tags, cache_alias="default"):
+    cache = caches[cache_alias]
+    for tag in tags:
+        key = _tag_key(tag)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), None)
+
+
+class _Negative:
+    def __init__(self, exc):
+        self.exc = exc
+
+
+class _Entry:
+    __slots__ = ("value", "delta", "expiry")
+
+    def __init__(self, value, delta, expiry):
+        self.value = value
+        self.delta = delta
+        self.expiry = expiry
+
+    def should_recompute(self, beta):
+        # XFetch: the closer the expiry and the slower the computation, the
+        # more likely a reader is to refresh the entry ahead of time.
+        return time.time() - self.delta * beta * math.log(random.random()) >= self.expiry
+
+
+def _local_lock(key):
+    with _local_locks_guard:
+        holder = _local_locks.setdefault(key, [threading.Lock(), 0])
+        holder[1] += 1
+        return holder[0]
+
+
+def _forget_local_lock(key):
+    with _local_locks_guard:
+        holder = _local_locks[key]
+        holder[1] -= 1
+        if not holder[1]:
+            del _local_locks[key]
+
+
+def memoize(key=None, ttl=60, tags=(), beta=1.0, negative_ttl=None, cache_alias="default"):
+    """Cache a function's result with early expiration and single-flight refresh.
+
+    key, ttl and tags may be constants or callables taking the same arguments as
+    the wrapped function. Bumping any tag with invalidate_tags() orphans every
+    entry stored under it. Http404/DoesNotExist is cached for negative_ttl
+    seconds when set. QuerySet results are stored as lists.
+    """
+
+    def decorator(func):
+        name = f"{func.__module__}.{func.__qualname__}"
+
+        def resolve(value, args, kwargs):
+            return value(*args, **kwargs) if callable(value) else value
+
+        def cache_key(args, kwargs):
+            raw = resolve(key, args, kwargs) if key is not None else repr((args, sorted(kwargs.items())))
+            entry_tags = list(resolve(tags, args, kwargs))
+            versions = tag_versions(entry_tags, cache_alias) if entry_tags else []
+            digest = hashlib.sha256(repr((raw, entry_tags, versions)).encode()).hexdigest()
+            return f"memoize:{name}:{digest}"
+
+        def unwrap(entry):
+            if isinstance(entry.value, _Negative):
+                raise entry.value.exc
+            return entry.value
+
+        def compute(cache_key_, args, kwargs):
+            cache = caches[cache_alias]
+            start = time.time()
+            try:
+                value = func(*args, **kwargs)
+            except NEGATIVE_EXCEPTIONS as exc:
+                if negative_ttl is None:
+                    raise
+                cache.set(cache_key_, _Entry(_Negative(exc), 0, time.time() + negative_ttl), negative_ttl)
+                raise
+            if isinstance(value, QuerySet):
+                value = list(value)
+            timeout = resolve(ttl, args, kwargs)
+            cache.set(cache_key_, _Entry(value, time.time() - start, time.time() + timeout), timeout)
+            return value
+
+        def hit(entry):
+            record_cache(name, hit=True)
+            return unwrap(entry)
+
+        def refresh(key_, entry, local_lock, args, kwargs):
+            # Early refresh: whoever wins both locks recomputes, everyone else
+            # keeps using the current value.
+            if not local_lock.acquire(blocking=False):
+                return hit(entry)
+            try:
+                cache = caches[cache_alias]
+                if not cache.add(f"{key_}:lock", 1, LOCK_TIMEOUT):
+                    return hit(entry)
+                try:
+                    record_cache(name, hit=False)
+                    return compute(key_, args, kwargs)
+                finally:
+                    cache.delete(f"{key_}:lock")
+            finally:
+                local_lock.release()
+
+        def fill(key_, local_lock, args, kwargs):
+            # Cold miss: threads in this process queue on the local lock, other
+            # processes wait for the holder of the cache lock.
+            with local_lock:
+                cache = caches[cache_alias]
+                entry = cache.get(key_)
+                if entry is not None:
+                    return hit(entry)
+                locked = cache.add(f"{key_}:lock", 1, LOCK_TIMEOUT)
+                if not locked:
+                    deadline = time.monotonic() + LOCK_TIMEOUT
+                    while time.monotonic() < deadline:
+                        time.sleep(WAIT_INTERVAL)
+                        entry = cache.get(key_)
+                        if entry is not None:
+                            return hit(entry)
+                record_cache(name, hit=False)
+                try:
+                    return compute(key_, args, kwargs)
+                finally:
+                    if locked:
+                        cache.delete(f"{key_}:lock")
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key_ = cache_key(args, kwargs)
+            entry = caches[cache_alias].get(key_)
+            if entry is not None and not entry.should_recompute(beta):
+                return hit(entry)
+            local_lock = _local_lock(key_)
+            try:
+                if entry is not None:
+                    return refresh(key_, entry, local_lock, args, kwargs)
+                return fill(key_, local_lock, args, kwargs)
+            finally:
+                _forget_local_lock(key_)
+
+        def invalidate(*args, **kwargs):
+            caches[cache_alias].delete(cache_key(args, kwargs))
+
+        wrapper.invalidate = invalidate
+        return wrapper
+
+    return decorator
@@ -0,0 +1,233 @@
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection
+from django.http import HttpResponse, HttpResponseForbidden
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _ThreadShards:
+    # Each thread writes to its own dict, so recording a sample never takes a
+    # lock; the lock is only held when a new thread registers its shard.
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._shards = []
+
+    def get(self):
+        try:
+            return self._local.values
+        except AttributeError:
+            values = self._local.values = {}
+            with self._lock:
+                self._shards.append(values)
+            return values
+
+    def snapshot(self):
+        with self._lock:
+            shards = list(self._shards)
+        return [shard.copy() for shard in shards]
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, registry, name, documentation, labelnames=()):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        registry.register(self)
+
+    def inc(self, amount=1, **labels):
+        shard = self.registry.shards.get()
+        key = (self.name, tuple(labels[name] for name in self.labelnames))
+        shard[key] = shard.get(key, 0) + amount
+
+    @staticmethod
+    def merge(total, value):
+        return (total or 0) + value
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, registry, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        registry.register(self)
+
+    def observe(self, value, **labels):
+        shard = self.registry.shards.get()
+        key = (self.name, tuple(labels[name] for name in self.labelnames))
+        # [count per bucket..., +Inf count, sum]
+        state = shard.get(key)
+        if state is None:
+            state = shard[key] = [0] * (len(self.buckets) + 2)
+        state[bisect_left(self.buckets, value)] += 1
+        state[-1] += value
+
+    @staticmethod
+    def merge(total, value):
+        if total is None:
+            return list(value)
+        return [a + b for a, b in zip(total, value)]
+
+
+class Registry:
+    def __init__(self):
+        self.shards = _ThreadShards()
+        self.metrics = {}
+        self._last_flush = 0.0
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+
+    def collect(self):
+        return self.merge(self.shards.snapshot())
+
+    def merge(self, snapshots):
+        totals = {}
+        for snapshot in snapshots:
+            for key, value in snapshot.items():
+                totals[key] = self.metrics[key[0]].merge(totals.get(key), value)
+        return totals
+
+    def flush(self, directory, force=False):
+        # Gunicorn-style deployments run several worker processes; each one
+        # periodically dumps its totals to <dir>/<pid>.json and the scraped
+        # worker merges every file it finds.
+        now = time.monotonic()
+        if not force and now - self._last_flush < settings.METRICS_FLUSH_INTERVAL:
+            return
+        self._last_flush = now
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        rows = [[name, list(labels), value] for (name, labels), value in self.collect().items()]
+        tmp = directory / f".{os.getpid()}.json.tmp"
+        tmp.write_text(json.dumps(rows))
+        tmp.replace(directory / f"{os.getpid()}.json")
+
+    def collect_multiprocess(self, directory):
+        self.flush(directory, force=True)
+        snapshots = []
+        for path in Path(directory).glob("*.json"):
+            try:
+                rows = json.loads(path.read_text())
+            except (OSError, ValueError):
+                continue
+            snapshots.append({(name, tuple(labels)): value for name, labels, value in rows if name in self.metrics})
+        return self.merge(snapshots)
+
+    def exposition(self, totals):
+        by_metric = {}
+        for (name, labels), value in sorted(totals.items()):
+            by_metric.setdefault(name, []).append((labels, value))
+        lines = []
+        for name, metric in self.metrics.items():
+            lines.append(f"# HELP {name} {metric.documentation}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            for labels, value in by_metric.get(name, ()):
+                pairs = [f'{label}="{_escape(str(v))}"' for label, v in zip(metric.labelnames, labels)]
+                if metric.kind == "counter":
+                    lines.append(f"{name}{_labels(pairs)} {_number(value)}")
+                    continue
+                cumulative = 0
+                for bound, count in zip((*metric.buckets, "+Inf"), value[:-1]):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{_labels([*pairs, f"le={_quote(bound)}"])} {cumulative}')
+                lines.append(f"{name}_sum{_labels(pairs)} {_number(value[-1])}")
+                lines.append(f"{name}_count{_labels(pairs)} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _quote(value):
+    return f'"{value}"'
+
+
+def _labels(pairs):
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+registry = Registry()
+
+REQUEST_LATENCY = Histogram(
+    registry, "http_request_duration_seconds", "Request latency by URL name.", labelnames=("view",)
+)
+RESPONSES = Counter(registry, "http_responses_total", "Responses by URL name and status.", ("view", "status"))
+DB_QUERIES = Counter(registry, "db_queries_total", "SQL queries executed by URL name.", ("view",))
+DB_TIME = Counter(registry, "db_query_duration_seconds_total", "Time spent in SQL by URL name.", ("view",))
+WRITES = Counter(registry, "app_writes_total", "Like, follow and tweet writes.", ("kind",))
+CACHE_REQUESTS = Counter(registry, "cache_requests_total", "Cache lookups by cache and result.", ("cache", "result"))
+
+
+def record_write(kind):
+    WRITES.inc(kind=kind)
+
+
+def record_cache(cache, hit):
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+class _QueryTimer:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - start
+
+
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timer = _QueryTimer()
+        start = time.perf_counter()
+        with connection.execute_wrapper(timer):
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - start
+
+        match = request.resolver_match
+        view = match.view_name if match else "unresolved"
+        REQUEST_LATENCY.observe(elapsed, view=view)
+        RESPONSES.inc(view=view, status=response.status_code)
+        DB_QUERIES.inc(timer.count, view=view)
+        DB_TIME.inc(timer.duration, view=view)
+        if settings.METRICS_MULTIPROC_DIR:
+            registry.flush(settings.METRICS_MULTIPROC_DIR)
+        return response
+
+
+def metrics_view(request):
+    allowed = settings.METRICS_ALLOWED_IPS
+    if allowed is not None and request.META.get("REMOTE_ADDR") not in allowed:
+        return HttpResponseForbidden()
+    if settings.METRICS_MULTIPROC_DIR:
+        totals = registry.collect_multiprocess(settings.METRICS_MULTIPROC_DIR)
+    else:
+        totals = registry.collect()
+    return HttpResponse(registry.exposition(totals), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,139 @@
+import logging
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+
+def _collapse(frame):
+    names = []
+    while frame is not None:
+        names.append(f"{frame.f_globals.get('__name__', '?')}:{frame.f_code.co_qualname}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class StackSampler(threading.Thread):
+    def __init__(self, thread_id, interval):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[_collapse(frame)] += 1
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+
+class RequestProfile:
+    def __init__(self):
+        self.sql = 0.0
+        self.sql_in_template = 0.0
+        self.template = 0.0
+        self.rendering = False
+        self._render_started = None
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.sql += elapsed
+            if self.rendering:
+                self.sql_in_template += elapsed
+
+    def start_render(self):
+        self.rendering = True
+        self._render_started = time.perf_counter()
+
+    def end_render(self, response):
+        self.rendering = False
+        self.template += time.perf_counter() - self._render_started
+
+    def breakdown(self, total):
+        # Lazy querysets are evaluated inside templates, so their SQL time is
+        # attributed to "sql" and removed from the template share.
+        template = max(self.template - self.sql_in_template, 0.0)
+        return {
+            "sql": self.sql,
+            "template": template,
+            "python": max(total - self.sql - template, 0.0),
+        }
+
+
+class ProfilingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = settings.PROFILING_SAMPLE_RATE
+        self.interval = settings.PROFILING_INTERVAL
+        self.output_dir = Path(settings.PROFILING_OUTPUT_DIR)
+
+    def should_profile(self, request):
+        if "HTTP_X_PROFILE" in request.META or "__profile" in request.GET:
+            # Every profile costs sampler overhead and a file on disk, so only
+            # staff may ask for one outside development.
+            user = getattr(request, "user", None)
+            if settings.DEBUG or (user is not None and user.is_staff):
+                return True
+        return bool(self.sample_rate) and random.random() < self.sample_rate
+
+    def __call__(self, request):
+        if not self.should_profile(request):
+            return self.get_response(request)
+
+        profile = request._profile = RequestProfile()
+        sampler = StackSampler(threading.get_ident(), self.interval)
+        sampler.start()
+        start = time.perf_counter()
+        try:
+            with connection.execute_wrapper(profile):
+                response = self.get_response(request)
+        finally:
+            total = time.perf_counter() - start
+            sampler.stop()
+
+        breakdown = profile.breakdown(total)
+        response["Server-Timing"] = ", ".join(
+            f"{name};dur={seconds * 1000:.1f}" for name, seconds in breakdown.items()
+        )
+        path = self.write_stacks(request, sampler.stacks)
+        logger.info(
+            "profiled %s in %.1fms (%s) -> %s",
+            request.path,
+            total * 1000,
+            response["Server-Timing"],
+            path,
+        )
+        return response
+
+    def process_template_response(self, request, response):
+        profile = getattr(request, "_profile", None)
+        if profile is not None:
+            profile.start_render()
+            response.add_post_render_callback(profile.end_render)
+        return response
+
+    def write_stacks(self, request, stacks):
+        match = request.resolver_match
+        view_name = match.view_name.replace(":", "-") if match and match.view_name else "unresolved"
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        path = self.output_dir / f"{time.strftime('%Y%m%d-%H%M%S')}-{view_name}-{time.monotonic_ns()}.folded"
+        # One "frame;frame;frame count" line per stack, the input format of
+        # flamegraph.pl and speedscope.
+        path.write_text("".join(f"{stack} {count}\n" for stack, count in stacks.most_common()))
+        return path
@@ -0,0 +1,68 @@
+import math
+import time
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+
+PERIODS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+class HttpResponseTooManyRequests(HttpResponse):
+    status_code = 429
+
+
+@lru_cache(maxsize=None)
+def parse_rate(rate):
+    count, period = rate.split("/")
+    return int(count), PERIODS[period[0]]
+
+
+def client_key(request):
+    if request.user.is_authenticated:
+        return f"user:{request.user.pk}"
+    return f"ip:{request.META.get('REMOTE_ADDR', '')}"
+
+
+def hit(name, key, rate):
+    """Count one request; return 0 if allowed, else seconds until retrying makes sense.
+
+    Sliding window approximated from two fixed windows: the previous window's
+    count is weighted by how much of it still overlaps the sliding window.
+    Only add/incr/get are used, so it stays atomic on shared cache backends.
+    """
+    limit, period = parse_rate(rate)
+    cache = caches[settings.RATELIMIT_CACHE]
+    now = time.time()
+    window, elapsed = divmod(now, period)
+    current_key = f"ratelimit:{name}:{key}:{int(window)}"
+    cache.add(current_key, 0, period * 2)
+    try:
+        current = cache.incr(current_key)
+    except ValueError:
+        cache.set(current_key, 1, period * 2)
+        current = 1
+    previous = cache.get(f"ratelimit:{name}:{key}:{int(window) - 1}", 0)
+    if previous * (period - elapsed) / period + current <= limit:
+        return 0
+    return max(math.ceil(period - elapsed), 1)
+
+
+class RateLimitMixin:
+    """Limit unsafe requests per user (or per IP when anonymous).
+
+    The rate comes from settings.RATELIMITS, keyed by the URL name.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in ("GET", "HEAD", "OPTIONS"):
+            name = request.resolver_match.view_name
+            rate = settings.RATELIMITS.get(name)
+            if rate:
+                retry_after = hit(name, client_key(request), rate)
+                if retry_after:
+                    response = HttpResponseTooManyRequests("too many requests.")
+                    response["Retry-After"] = str(retry_after)
+                    return response
+        return super().dispatch(request, *args, **kwargs)
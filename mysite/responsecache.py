@@ -0,0 +1,96 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+
+from notifications.queries import inbox_tag, unread_count
+
+from .caches import is_shared
+from .memoize import LOCK_TIMEOUT, WAIT_INTERVAL, tag_versions
+from .metrics import record_cache
+
+
+class CachedResponseMixin:
+    """Serve GET responses from the cache, keyed by entity versions and viewer.
+
+    Entries are fresh for RESPONSE_CACHE_FRESH_SECONDS. After that, one request
+    re-renders the page under a lock while the others keep serving the stale
+    copy for up to RESPONSE_CACHE_STALE_SECONDS.
+    """
+
+    def get_cache_entities(self):
+        return []
+
+    def get_response_cache_key(self):
+        request = self.request
+        entities = self.get_cache_entities()
+        parts = [request.resolver_match.view_name, request.get_full_path(), *entities]
+        tags = list(entities)
+        if request.user.is_authenticated:
+            # Pages for logged-in users embed a CSRF token, so they are only
+            # reusable by the same user holding the same CSRF cookie.
+            csrf_cookie = request.COOKIES.get(settings.CSRF_COOKIE_NAME)
+            if not csrf_cookie:
+                return None
+            parts += [str(request.user.pk), csrf_cookie]
+            # base.html shows the viewer's unread notification count. The
+            # worker bumps the inbox tag, which a per-process cache never sees,
+            # so then the count itself is part of the key.
+            if is_shared("default"):
+                tags.append(inbox_tag(request.user.pk))
+            else:
+                parts.append(str(unread_count(request.user.pk)))
+        parts += map(str, tag_versions(tags))
+        return "response:" + hashlib.sha256("\0".join(parts).encode()).hexdigest()
+
+    def get(self, request, *args, **kwargs):
+        key = self.get_response_cache_key()
+        if key is None:
+            return super().get(request, *args, **kwargs)
+
+        lock_key = f"{key}:lock"
+        entry = cache.get(key)
+        if entry is not None and entry[2] > time.time():
+            return self.cached_response(entry, "hit")
+        locked = cache.add(lock_key, 1, LOCK_TIMEOUT)
+        if not locked:
+            if entry is not None:
+                return self.cached_response(entry, "stale")
+            deadline = time.monotonic() + settings.RESPONSE_CACHE_WAIT_SECONDS
+            while time.monotonic() < deadline:
+                time.sleep(WAIT_INTERVAL)
+                entry = cache.get(key)
+                if entry is not None:
+                    return self.cached_response(entry, "hit")
+
+        record_cache("response", hit=False)
+        try:
+            response = super().get(request, *args, **kwargs)
+        except BaseException:
+            if locked:
+                cache.delete(lock_key)
+            raise
+
+        def store(response):
+            if response.status_code == 200 and not response.streaming:
+                fresh = settings.RESPONSE_CACHE_FRESH_SECONDS
+                entry = (response.content, response["Content-Type"], time.time() + fresh)
+                cache.set(key, entry, fresh + settings.RESPONSE_CACHE_STALE_SECONDS)
+            if locked:
+                cache.delete(lock_key)
+
+        response["X-Cache"] = "miss"
+        if hasattr(response, "add_post_render_callback"):
+            response.add_post_render_callback(store)
+        else:
+            store(response)
+        return response
+
+    def cached_response(self, entry, state):
+        record_cache("response", hit=True)
+        content, content_type, _ = entry
+        response = HttpResponse(content, content_type=content_type)
+        response["X-Cache"] = state
+        return response
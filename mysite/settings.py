@@ -9,6 +9,7 @@ https://docs.djangoproject.com/en/4.0/topics/settings/
 For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.0/ref/settings/
 """
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -30,7 +31,7 @@ ALLOWED_HOSTS = []
 # Application definition
 
 INSTALLED_APPS = [
-    "django.contrib.admin",
+    "mysite.lazyadmin.LazyAdminConfig",
     "django.contrib.auth",
     "django.contrib.contenttypes",
     "django.contrib.sessions",
@@ -39,9 +40,15 @@ INSTALLED_APPS = [
     "accounts.apps.AccountsConfig",
     "tweets.apps.TweetsConfig",
     "welcome.apps.WelcomeConfig",
+    "tasks.apps.TasksConfig",
+    "notifications.apps.NotificationsConfig",
+    "outbox.apps.OutboxConfig",
+    "mysite.apps.MysiteConfig",
 ]
 
 MIDDLEWARE = [
+    "mysite.metrics.MetricsMiddleware",
+    "django.middleware.gzip.GZipMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -64,6 +71,7 @@ TEMPLATES = [
                 "django.template.context_processors.request",
                 "django.contrib.auth.context_processors.auth",
                 "django.contrib.messages.context_processors.messages",
+                "notifications.context_processors.unread_notifications",
             ],
         },
     },
@@ -83,6 +91,22 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/4.0/topics/cache/
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    # Always in-process, in front of "default" for small hot lookups.
+    "local": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "local",
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.0/ref/settings/#auth-password-validators
 
@@ -102,6 +126,28 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Password hashing
+# https://docs.djangoproject.com/en/4.0/topics/auth/passwords/
+# The preferred algorithm and its cost can be tuned per environment. Hashes
+# made with other settings are upgraded transparently on the next login.
+
+PASSWORD_HASH_ALGORITHM = os.environ.get("PASSWORD_HASH_ALGORITHM", "pbkdf2_sha256")
+PASSWORD_HASH_PBKDF2_ITERATIONS = int(os.environ.get("PASSWORD_HASH_PBKDF2_ITERATIONS", 390000))
+PASSWORD_HASH_SCRYPT_WORK_FACTOR = int(os.environ.get("PASSWORD_HASH_SCRYPT_WORK_FACTOR", 2**14))
+PASSWORD_HASH_ARGON2_TIME_COST = int(os.environ.get("PASSWORD_HASH_ARGON2_TIME_COST", 2))
+PASSWORD_HASH_ARGON2_MEMORY_COST = int(os.environ.get("PASSWORD_HASH_ARGON2_MEMORY_COST", 102400))
+
+_PASSWORD_HASHERS = {
+    "pbkdf2_sha256": "accounts.hashers.TunablePBKDF2PasswordHasher",
+    "scrypt": "accounts.hashers.TunableScryptPasswordHasher",
+    # Requires argon2-cffi.
+    "argon2": "accounts.hashers.TunableArgon2PasswordHasher",
+}
+PASSWORD_HASHERS = [_PASSWORD_HASHERS[PASSWORD_HASH_ALGORITHM]] + [
+    hasher for algorithm, hasher in _PASSWORD_HASHERS.items() if algorithm != PASSWORD_HASH_ALGORITHM
+]
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/4.0/topics/i18n/
 
@@ -118,6 +164,19 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/4.0/howto/static-files/
 
 STATIC_URL = "static/"
+STATIC_ROOT = BASE_DIR / "staticfiles"
+STATICFILES_DIRS = [BASE_DIR / "static"]
+STATIC_MAX_AGE = 3600
+# Serve STATIC_ROOT from Django when no web server sits in front of it.
+SERVE_STATIC = False
+
+VENDOR_ASSETS = {
+    "bootstrap": (
+        "https://cdn.jsdelivr.net/npm/bootstrap@5.0.2/dist/css/bootstrap.min.css",
+        "sha384-EVSTQN3/azprG1Anm3QDgpJLIm9Nao0Yz1ztcQTwFspd3yD65VohhpuuCOmLASjC",
+        "vendor/bootstrap.min.css",
+    ),
+}
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.0/ref/settings/#default-auto-field
@@ -126,11 +185,145 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 AUTH_USER_MODEL = "accounts.User"
 
+AUTHENTICATION_BACKENDS = ["accounts.backends.CachedModelBackend"]
+
+SESSION_ENGINE = "accounts.sessions"
+SESSION_LOCAL_CACHE_TTL = 5
+
 LOGIN_URL = "accounts:login"
 LOGIN_REDIRECT_URL = "tweets:home"
 
 LOGOUT_REDIRECT_URL = "accounts:login"
 
+ACCOUNT_EXPORT_CHUNK_SIZE = 500
+
+PURGE_BATCH_SIZE = 500
+
+# Home and profile timelines show this many tweets per page.
+TIMELINE_PAGE_SIZE = 50
+
+ARCHIVE_AFTER_DAYS = 365
+ARCHIVE_BATCH_SIZE = 500
+
+# Deflate tweet titles and contents with the newest trained dictionary.
+TWEET_TEXT_COMPRESSION = False
+TWEET_TEXT_DICTIONARY_DIR = BASE_DIR / "tweets" / "dictionaries"
+
+TASKS_WORKER_THREADS = 4
+TASKS_POLL_INTERVAL = 1.0
+TASKS_LOCK_TIMEOUT = 300
+# Running tasks have their lock extended this often, so only dead workers'
+# tasks outlive TASKS_LOCK_TIMEOUT.
+TASKS_HEARTBEAT_INTERVAL = 60
+TASKS_BACKOFF_BASE = 5
+TASKS_BACKOFF_MAX = 3600
+TASKS_RETENTION = 7 * 24 * 3600
+
+OUTBOX_BATCH_SIZE = 500
+OUTBOX_POLL_INTERVAL = 1.0
+# Raise on databases where concurrent transactions can commit ids out of order,
+# so a consumer doesn't move its offset past a change that isn't visible yet.
+OUTBOX_SETTLE_SECONDS = 0
+OUTBOX_COMPACT_AFTER = 7 * 24 * 3600
+
+NOTIFICATION_AGGREGATION_WINDOW = 3600
+NOTIFICATION_MAX_MENTIONS = 10
+NOTIFICATION_PAGE_SIZE = 20
+
+# Ranked "top" timeline: tweets from followed users within MAX_AGE are scored
+# in batches, at most CANDIDATES of them, and the best SIZE are cached.
+TOP_TIMELINE_SIZE = 50
+TOP_TIMELINE_CANDIDATES = 2000
+TOP_TIMELINE_BATCH_SIZE = 500
+TOP_TIMELINE_MAX_AGE = 3 * 24 * 3600
+TOP_TIMELINE_HALF_LIFE = 6 * 3600
+TOP_TIMELINE_VELOCITY_WEIGHT = 1.0
+TOP_TIMELINE_AFFINITY_WEIGHT = 1.0
+TOP_TIMELINE_AFFINITY_WINDOW = 30 * 24 * 3600
+TOP_TIMELINE_CACHE_TTL = 60
+
+# Reject a tweet that repeats one of the user's own within USER_WINDOW, and
+# throttle text that GLOBAL_LIMIT other users posted within GLOBAL_WINDOW.
+# Near duplicates are SimHashes at most DISTANCE (< 8) bits apart; unrelated
+# tweets are typically 16 or more apart. The recent posts are kept in
+# DUPLICATE_CACHE, which has to be shared by all processes (not LocMem).
+DUPLICATE_DETECTION = False
+DUPLICATE_CACHE = "default"
+DUPLICATE_DISTANCE = 7
+DUPLICATE_USER_WINDOW = 3600
+DUPLICATE_USER_HISTORY = 20
+DUPLICATE_GLOBAL_WINDOW = 600
+DUPLICATE_GLOBAL_LIMIT = 5
+# Shorter texts ("おはよう") are too common to treat as a flood.
+DUPLICATE_GLOBAL_MIN_LENGTH = 20
+DUPLICATE_BUCKET_SIZE = 50
+
+# Stream the home and profile timelines instead of rendering them in memory.
+STREAM_TIMELINES = False
+STREAM_CHUNK_SIZE = 100
+
+METRICS_ALLOWED_IPS = ["127.0.0.1", "::1"]
+METRICS_MULTIPROC_DIR = None
+METRICS_FLUSH_INTERVAL = 5
+
+USERNAME_CACHE_TTL = 3600
+USERNAME_CACHE_LOCAL_TTL = 30
+
+# Per-user Bloom filters that let follow/like skip their existence checks.
+# Needs MEMBERSHIP_FILTER_CACHE to be shared by all processes (not LocMem).
+MEMBERSHIP_FILTER = False
+MEMBERSHIP_FILTER_CACHE = "default"
+MEMBERSHIP_FILTER_TTL = 86400
+MEMBERSHIP_FILTER_ERROR_RATE = 0.01
+MEMBERSHIP_FILTER_MIN_CAPACITY = 256
+
+# Followers and following held in memory per process; the change log that
+# keeps processes in sync lives in SOCIAL_GRAPH_CACHE, which has to be shared
+# by all processes (not LocMem).
+SOCIAL_GRAPH = False
+SOCIAL_GRAPH_CACHE = "default"
+SOCIAL_GRAPH_SNAPSHOT = BASE_DIR / "social_graph.bin"
+SOCIAL_GRAPH_MAX_BYTES = 64 * 1024 * 1024
+SOCIAL_GRAPH_MAX_OVERLAY = 10000
+SOCIAL_GRAPH_DELTA_TTL = 86400
+SOCIAL_GRAPH_DELTA_WAIT = 5
+
+# Profile analytics stay current through the accounts.analytics outbox
+# consumer; without consume_outbox running they can be up to the TTL old.
+# They are only cached when ANALYTICS_CACHE is shared by all processes.
+ANALYTICS_CACHE = "default"
+ANALYTICS_CACHE_TTL = 86400
+ANALYTICS_DAYS = 30
+ANALYTICS_TOP_TWEETS = 10
+
+RESPONSE_CACHE_FRESH_SECONDS = 60
+RESPONSE_CACHE_STALE_SECONDS = 300
+RESPONSE_CACHE_WAIT_SECONDS = 2
+
+# Per URL name, "<requests>/<s|m|h|d>" for each user (or IP when anonymous).
+# RATELIMIT_CACHE = "default" shares the counters between workers.
+RATELIMIT_CACHE = "local"
+RATELIMITS = {
+    "accounts:login": "10/m",
+    "accounts:follow": "30/m",
+    "accounts:unfollow": "30/m",
+    "tweets:create": "10/m",
+    "tweets:like": "60/m",
+    "tweets:unlike": "60/m",
+}
+
+PROFILING = False
+PROFILING_SAMPLE_RATE = 0.01
+PROFILING_INTERVAL = 0.001
+PROFILING_OUTPUT_DIR = BASE_DIR / "profiles"
+
+if PROFILING:
+    # After authentication, so a manually requested profile can check request.user.
+    MIDDLEWARE.insert(
+        MIDDLEWARE.index("django.contrib.auth.middleware.AuthenticationMiddleware") + 1,
+        "mysite.profiling.ProfilingMiddleware",
+    )
+
 SQL_DEBUG = False
 
 if SQL_DEBUG:
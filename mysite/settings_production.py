@@ -0,0 +1,37 @@
+"""
+Production settings. Select with DJANGO_SETTINGS_MODULE=mysite.settings_production.
+"""
+
+import os
+
+from .settings import *  # noqa: F401,F403
+from .settings import SECRET_KEY, TEMPLATES
+
+DEBUG = False
+
+SECRET_KEY = os.environ.get("DJANGO_SECRET_KEY", SECRET_KEY)
+
+ALLOWED_HOSTS = [host for host in os.environ.get("DJANGO_ALLOWED_HOSTS", "").split(",") if host]
+
+STATICFILES_STORAGE = "mysite.assets.CompressedManifestStaticFilesStorage"
+
+# Templates are read and compiled once per process (before fork, by
+# mysite.startup.warm) and never checked on disk again.
+TEMPLATES = [
+    {
+        **TEMPLATES[0],
+        "APP_DIRS": False,
+        "OPTIONS": {
+            **TEMPLATES[0]["OPTIONS"],
+            "loaders": [
+                (
+                    "django.template.loaders.cached.Loader",
+                    [
+                        "django.template.loaders.filesystem.Loader",
+                        "django.template.loaders.app_directories.Loader",
+                    ],
+                ),
+            ],
+        },
+    },
+]
@@ -0,0 +1,95 @@
+import json
+import os
+import subprocess
+import sys
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+from django.template import TemplateDoesNotExist, engines
+from django.template.backends.django import DjangoTemplates
+from django.template.utils import get_app_template_dirs
+from django.urls import URLResolver, get_resolver
+
+COLD_START_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+{statement}
+print(json.dumps({{"seconds": time.perf_counter() - start, "modules": sorted(sys.modules)}}))
+"""
+
+
+def _run(*args):
+    env = {**os.environ, "DJANGO_SETTINGS_MODULE": os.environ.get("DJANGO_SETTINGS_MODULE", "mysite.settings")}
+    return subprocess.run(
+        [sys.executable, *args], capture_output=True, text=True, cwd=settings.BASE_DIR, env=env, check=True
+    )
+
+
+def parse_importtime(text):
+    """Return (module, self µs, cumulative µs) rows from `python -X importtime` output."""
+    rows = []
+    for line in text.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def import_profile(module):
+    return parse_importtime(_run("-X", "importtime", "-c", f"import {module}").stderr)
+
+
+def by_package(rows, depth):
+    totals = Counter()
+    for name, self_us, _ in rows:
+        totals[".".join(name.split(".")[:depth])] += self_us
+    return totals
+
+
+def cold_start(statement):
+    """Run statement in a fresh interpreter; return (seconds, names of the modules it loaded)."""
+    result = json.loads(_run("-c", COLD_START_SCRIPT.format(statement=statement)).stdout.splitlines()[-1])
+    return result["seconds"], set(result["modules"])
+
+
+def warm_urls(resolver=None):
+    resolver = resolver or get_resolver()
+    resolver.reverse_dict
+    for pattern in resolver.url_patterns:
+        pattern.pattern.regex
+        if isinstance(pattern, URLResolver):
+            warm_urls(pattern)
+
+
+def warm_templates():
+    """Compile the project's own templates into the cached loader; return how many."""
+    count = 0
+    for engine in engines.all():
+        if not isinstance(engine, DjangoTemplates):
+            continue
+        for directory in map(Path, [*engine.engine.dirs, *get_app_template_dirs("templates")]):
+            # Third-party templates (the admin's in particular) load their
+            # tag libraries on compile, so they are left for first use.
+            if not directory.is_relative_to(settings.BASE_DIR) or "site-packages" in directory.parts:
+                continue
+            for path in directory.rglob("*.html"):
+                try:
+                    engine.get_template(path.relative_to(directory).as_posix())
+                except TemplateDoesNotExist:
+                    # App directory the engine doesn't load from.
+                    continue
+                count += 1
+    return count
+
+
+def warm():
+    """Do the first request's one-off work before a preforking server forks."""
+    from accounts.graph import get_graph
+
+    warm_urls()
+    warm_templates()
+    get_graph()
+    connections.close_all()
@@ -0,0 +1,53 @@
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.template.loader import get_template, select_template
+
+# Rendered in place of the object list. Tweet text is autoescaped, so user
+# content can never produce this marker.
+STREAM_MARKER = "<!--stream-->"
+
+
+class StreamingListMixin:
+    """Stream a ListView page: the page header first, then the object list in
+    chunks, read from a server-side iterator for querysets, then the footer.
+
+    Enabled by settings.STREAM_TIMELINES. The page template renders
+    STREAM_MARKER instead of the list when the "streaming" context variable is
+    set; stream_template_name renders one chunk of objects.
+    """
+
+    stream_template_name = None
+
+    def render_to_response(self, context, **response_kwargs):
+        if not settings.STREAM_TIMELINES:
+            return super().render_to_response(context, **response_kwargs)
+        # The header is rendered before returning so that the CSRF cookie and
+        # consumed messages are handled by the middleware as usual.
+        context["streaming"] = True
+        page = select_template(self.get_template_names()).render(context, self.request)
+        head, tail = page.split(STREAM_MARKER, 1)
+        queryset = context["object_list"]
+        name = self.get_context_object_name(queryset)
+        chunk_template = get_template(self.stream_template_name)
+        chunk_size = settings.STREAM_CHUNK_SIZE
+
+        def render(chunk):
+            return chunk_template.render({**context, name: chunk}, self.request)
+
+        def stream():
+            yield head
+            chunk = []
+            # Querysets are read through a server-side cursor; a list is
+            # already in memory.
+            rows = queryset.iterator(chunk_size) if hasattr(queryset, "iterator") else queryset
+            for obj in rows:
+                chunk.append(obj)
+                if len(chunk) == chunk_size:
+                    yield render(chunk)
+                    chunk = []
+            if chunk:
+                yield render(chunk)
+            yield tail
+
+        response_kwargs.setdefault("content_type", self.content_type)
+        return StreamingHttpResponse(stream(), **response_kwargs)
@@ -0,0 +1,23 @@
+from django import template
+from django.conf import settings
+from django.utils.html import format_html
+
+from mysite.assets import local_url
+
+register = template.Library()
+
+
+@register.simple_tag
+def vendor_stylesheet(name):
+    """Link a CDN stylesheet, falling back to the vendored copy if the CDN fails."""
+    url, integrity, path = settings.VENDOR_ASSETS[name]
+    fallback = local_url(path)
+    if fallback is None:
+        return format_html('<link href="{}" rel="stylesheet" integrity="{}" crossorigin="anonymous">', url, integrity)
+    return format_html(
+        '<link href="{}" rel="stylesheet" integrity="{}" crossorigin="anonymous" '
+        "onerror=\"this.onerror=null;this.href='{}'\">",
+        url,
+        integrity,
+        fallback,
+    )
@@ -0,0 +1,16 @@
+from django.core.cache import caches
+from django.test import TestCase as DjangoTestCase
+
+
+class TestCase(DjangoTestCase):
+    """TestCase that starts every test with empty caches.
+
+    The test database is rolled back after every test but the caches are not,
+    so cached counts and versions would otherwise leak between tests. This
+    runs whichever runner, result class or debugger drives the test.
+    """
+
+    def _pre_setup(self):
+        super()._pre_setup()
+        for cache in caches.all():
+            cache.clear()
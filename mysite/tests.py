@@ -0,0 +1,505 @@
+import gzip
+import io
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.http import Http404
+from django.template import Context, Template
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from accounts.forms import User
+from accounts.models import FriendShip
+from accounts.queries import following_filter
+from notifications.jobs import notify_follow
+from tweets.models import Like, Tweet
+
+from . import assets
+from .bloom import BloomFilter
+from .checks import check_default_cache, check_shared_caches
+from .memoize import _Entry, invalidate_tags, memoize
+from .metrics import Counter, Histogram, Registry
+from .startup import by_package, cold_start, parse_importtime, warm_templates
+from .testcases import TestCase
+
+
+class TestProfilingMiddleware(TestCase):
+    def setUp(self):
+        self.output_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.output_dir.cleanup)
+        middleware = list(settings.MIDDLEWARE)
+        middleware.insert(
+            middleware.index("django.contrib.auth.middleware.AuthenticationMiddleware") + 1,
+            "mysite.profiling.ProfilingMiddleware",
+        )
+        self.settings_override = override_settings(
+            MIDDLEWARE=middleware,
+            PROFILING_SAMPLE_RATE=0,
+            PROFILING_OUTPUT_DIR=self.output_dir.name,
+        )
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        self.user = User.objects.create_user(
+            username="testuser", email="test@example.com", password="testpassword", is_staff=True
+        )
+        self.client.force_login(self.user)
+        Tweet.objects.create(user=self.user, title="test", content="testtweet")
+
+    def test_profiled_with_header(self):
+        response = self.client.get(reverse("tweets:home"), HTTP_X_PROFILE="1")
+        self.assertEqual(response.status_code, 200)
+        timings = dict(part.split(";dur=") for part in response["Server-Timing"].split(", "))
+        self.assertEqual(set(timings), {"sql", "template", "python"})
+        self.assertGreater(float(timings["sql"]), 0)
+        self.assertEqual([path.name.split("-")[2] for path in Path(self.output_dir.name).iterdir()], ["tweets"])
+
+    def test_profiled_with_query_flag(self):
+        response = self.client.get(reverse("tweets:home"), {"__profile": "1"})
+        self.assertIn("Server-Timing", response)
+
+    def test_not_profiled_without_flag(self):
+        response = self.client.get(reverse("tweets:home"))
+        self.assertNotIn("Server-Timing", response)
+        self.assertEqual(list(Path(self.output_dir.name).iterdir()), [])
+
+    def test_flag_ignored_for_non_staff(self):
+        User.objects.filter(pk=self.user.pk).update(is_staff=False)
+        response = self.client.get(reverse("tweets:home"), HTTP_X_PROFILE="1")
+        self.assertNotIn("Server-Timing", response)
+        self.client.logout()
+        response = self.client.get(reverse("accounts:login"), {"__profile": "1"})
+        self.assertNotIn("Server-Timing", response)
+        self.assertEqual(list(Path(self.output_dir.name).iterdir()), [])
+
+
+class TestMetricsRegistry(TestCase):
+    def setUp(self):
+        self.registry = Registry()
+        self.counter = Counter(self.registry, "test_total", "Test counter.", ("kind",))
+        self.histogram = Histogram(self.registry, "test_seconds", "Test histogram.", ("view",), buckets=(0.1, 1.0))
+
+    def test_counter_is_thread_safe(self):
+        def work():
+            for _ in range(1000):
+                self.counter.inc(kind="like")
+
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.registry.collect()[("test_total", ("like",))], 8000)
+
+    def test_exposition(self):
+        self.counter.inc(kind="follow")
+        self.histogram.observe(0.05, view="tweets:home")
+        self.histogram.observe(0.5, view="tweets:home")
+        self.histogram.observe(5, view="tweets:home")
+        text = self.registry.exposition(self.registry.collect())
+        self.assertIn("# TYPE test_total counter", text)
+        self.assertIn('test_total{kind="follow"} 1', text)
+        self.assertIn('test_seconds_bucket{view="tweets:home",le="0.1"} 1', text)
+        self.assertIn('test_seconds_bucket{view="tweets:home",le="1.0"} 2', text)
+        self.assertIn('test_seconds_bucket{view="tweets:home",le="+Inf"} 3', text)
+        self.assertIn('test_seconds_count{view="tweets:home"} 3', text)
+
+    def test_multiprocess_aggregation(self):
+        other = Registry()
+        Counter(other, "test_total", "Test counter.", ("kind",)).inc(2, kind="like")
+        self.counter.inc(kind="like")
+        with tempfile.TemporaryDirectory() as directory:
+            other.flush(directory, force=True)
+            # Both registries live in this process, so move the first dump
+            # aside as if another worker had written it.
+            (Path(directory) / f"{os.getpid()}.json").rename(Path(directory) / "other.json")
+            totals = self.registry.collect_multiprocess(directory)
+        self.assertEqual(totals[("test_total", ("like",))], 3)
+
+
+class TestMetricsView(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", email="test@example.com", password="testpassword")
+        self.client.force_login(self.user)
+
+    def test_success_get(self):
+        self.client.get(reverse("tweets:home"))
+        self.client.post(reverse("tweets:create"), {"title": "test", "content": "testtweet"})
+        response = self.client.get(reverse("metrics"))
+        self.assertEqual(response.status_code, 200)
+        text = response.content.decode()
+        self.assertIn('http_request_duration_seconds_count{view="tweets:home"}', text)
+        self.assertIn('db_queries_total{view="tweets:home"}', text)
+        self.assertIn('app_writes_total{kind="tweet_create"}', text)
+
+    @override_settings(METRICS_ALLOWED_IPS=["10.0.0.1"])
+    def test_failure_get_from_disallowed_ip(self):
+        response = self.client.get(reverse("metrics"))
+        self.assertEqual(response.status_code, 403)
+
+
+class TestCachedResponseMixin(TestCase):
+    def setUp(self):
+        self.user1 = User.objects.create_user(username="testuser1", email="test1@example.com", password="testpassword")
+        self.user2 = User.objects.create_user(username="testuser2", email="test2@example.com", password="testpassword")
+        self.tweet = Tweet.objects.create(user=self.user2, title="test", content="testtweet")
+        self.url = reverse("accounts:user_profile", kwargs={"username": "testuser2"})
+
+    def test_welcome_page_cached_for_anonymous(self):
+        self.assertEqual(self.client.get("/")["X-Cache"], "miss")
+        response = self.client.get("/")
+        self.assertEqual(response["X-Cache"], "hit")
+        self.assertContains(response, "Backend Final Assignment")
+
+    def test_profile_cached_per_viewer(self):
+        self.client.force_login(self.user1)
+        self.assertNotIn("X-Cache", self.client.get(self.url))
+        self.assertEqual(self.client.get(self.url)["X-Cache"], "miss")
+        self.assertEqual(self.client.get(self.url)["X-Cache"], "hit")
+
+        other_client = self.client_class()
+        other_client.force_login(self.user2)
+        other_client.get(self.url)
+        self.assertEqual(other_client.get(self.url)["X-Cache"], "miss")
+
+    def test_profile_invalidated_by_like(self):
+        self.client.force_login(self.user1)
+        self.client.get(self.url)
+        self.client.get(self.url)
+        self.client.post(reverse("tweets:like", kwargs={"pk": self.tweet.pk}))
+        response = self.client.get(self.url)
+        self.assertEqual(response["X-Cache"], "miss")
+        self.assertEqual(list(response.context["liked_list"]), [self.tweet.pk])
+
+    def test_tweet_detail_invalidated_by_version_bump(self):
+        url = reverse("tweets:detail", kwargs={"pk": self.tweet.pk})
+        self.client.force_login(self.user1)
+        self.client.get(url)
+        self.client.get(url)
+        self.assertEqual(self.client.get(url)["X-Cache"], "hit")
+        Like.objects.create(user=self.user2, tweet=self.tweet)
+        invalidate_tags(f"tweet:{self.tweet.pk}")
+        self.assertEqual(self.client.get(url)["X-Cache"], "miss")
+
+    def test_profile_invalidated_by_viewer_notification(self):
+        self.client.force_login(self.user1)
+        self.client.get(self.url)
+        self.client.get(self.url)
+        notify_follow(self.user1.pk, self.user2.pk)
+        response = self.client.get(self.url)
+        self.assertEqual(response["X-Cache"], "miss")
+        self.assertContains(response, "通知 (1)")
+
+    @override_settings(RESPONSE_CACHE_FRESH_SECONDS=0)
+    def test_stale_served_while_revalidating(self):
+        self.client.get("/")
+        # Another worker holds the revalidation lock.
+        with mock.patch.object(cache, "add", return_value=False):
+            self.assertEqual(self.client.get("/")["X-Cache"], "stale")
+        self.assertEqual(self.client.get("/")["X-Cache"], "miss")
+
+    def test_check_warns_about_per_process_cache(self):
+        self.assertEqual([warning.id for warning in check_default_cache(None)], ["mysite.W002"])
+        with override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}}):
+            self.assertEqual(check_default_cache(None), [])
+
+
+class TestMemoize(TestCase):
+    def setUp(self):
+        self.calls = []
+
+    def test_cached_until_tag_invalidated(self):
+        @memoize(tags=lambda user_id: [f"user:{user_id}"])
+        def count(user_id):
+            self.calls.append(user_id)
+            return len(self.calls)
+
+        self.assertEqual(count(1), 1)
+        self.assertEqual(count(1), 1)
+        self.assertEqual(count(2), 2)
+        invalidate_tags("user:1")
+        self.assertEqual(count(1), 3)
+        self.assertEqual(count(2), 2)
+
+    def test_queryset_stored_as_list(self):
+        user = User.objects.create_user(username="testuser", password="testpassword")
+
+        @memoize()
+        def users():
+            return User.objects.all()
+
+        self.assertEqual(users(), [user])
+        with self.assertNumQueries(0):
+            self.assertEqual(users(), [user])
+
+    def test_negative_caching(self):
+        @memoize(negative_ttl=60)
+        def lookup(username):
+            self.calls.append(username)
+            raise Http404
+
+        for _ in range(2):
+            with self.assertRaises(Http404):
+                lookup("missing")
+        self.assertEqual(self.calls, ["missing"])
+
+    def test_single_flight(self):
+        @memoize()
+        def slow():
+            self.calls.append(1)
+            time.sleep(0.1)
+            return "value"
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(slow())) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, ["value"] * 8)
+        self.assertEqual(self.calls, [1])
+
+    def test_early_expiration(self):
+        self.assertFalse(_Entry("value", 0, time.time() + 60).should_recompute(beta=1.0))
+        self.assertTrue(_Entry("value", 0, time.time() - 1).should_recompute(beta=1.0))
+        # A slow computation is refreshed well before it expires.
+        self.assertTrue(_Entry("value", 3600, time.time() + 1).should_recompute(beta=1000.0))
+
+
+@override_settings(MEMBERSHIP_FILTER=True)
+class TestMembershipFilter(TestCase):
+    def setUp(self):
+        self.user1 = User.objects.create_user(username="testuser1", password="testpassword")
+        self.user2 = User.objects.create_user(username="testuser2", password="testpassword")
+        self.client.login(username="testuser1", password="testpassword")
+
+    def test_no_false_negatives(self):
+        bloom = BloomFilter(1000, 0.01)
+        for member in range(1000):
+            bloom.add(member)
+        self.assertTrue(all(member in bloom for member in range(1000)))
+        false_positives = sum(member in bloom for member in range(1000, 11000))
+        self.assertLess(false_positives, 300)
+
+    def test_definite_miss_skips_exists_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(reverse("accounts:follow", kwargs={"username": "testuser2"}))
+        friendship_selects = [
+            query["sql"]
+            for query in queries
+            if query["sql"].startswith("SELECT")
+            and "accounts_friendship" in query["sql"]
+            and "LIMIT 1" in query["sql"]
+        ]
+        self.assertEqual(friendship_selects, [])
+        self.assertTrue(FriendShip.objects.filter(follower=self.user1, following=self.user2).exists())
+
+    def test_write_updates_filter_without_rebuild(self):
+        self.assertFalse(following_filter.might_contain(self.user1.pk, self.user2.pk))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("accounts:follow", kwargs={"username": "testuser2"}))
+        with mock.patch.object(following_filter, "load") as load:
+            self.assertTrue(following_filter.might_contain(self.user1.pk, self.user2.pk))
+        load.assert_not_called()
+
+    def test_uncommitted_write_makes_filter_stale(self):
+        following_filter.get(self.user1.pk)
+        FriendShip.objects.create(follower=self.user1, following=self.user2)
+        following_filter.add(self.user1.pk, self.user2.pk)
+        self.assertTrue(following_filter.might_contain(self.user1.pk, self.user2.pk))
+
+    def test_cached_filter_answers_without_queries(self):
+        following_filter.get(self.user1.pk)
+        with self.assertNumQueries(0):
+            self.assertFalse(following_filter.might_contain(self.user1.pk, self.user2.pk))
+
+    def test_deletes_ignore_the_filter(self):
+        tweet = Tweet.objects.create(user=self.user2, title="test", content="tweet")
+        following_filter.get(self.user1.pk)
+        # bulk_create sends no signals, so these rows are missing from the
+        # cached filters.
+        FriendShip.objects.bulk_create([FriendShip(follower=self.user1, following=self.user2)])
+        Like.objects.create(tweet=tweet, user=self.user1)
+        self.assertFalse(following_filter.might_contain(self.user1.pk, self.user2.pk))
+
+        self.client.post(reverse("accounts:unfollow", kwargs={"username": "testuser2"}))
+        self.client.post(reverse("tweets:unlike", kwargs={"pk": tweet.pk}))
+        self.assertFalse(FriendShip.objects.exists())
+        self.assertFalse(Like.objects.exists())
+
+    @override_settings(MEMBERSHIP_FILTER=False)
+    def test_disabled_filter_always_answers_maybe(self):
+        with self.assertNumQueries(0):
+            self.assertTrue(following_filter.might_contain(self.user1.pk, self.user2.pk))
+
+    def test_check_requires_shared_cache(self):
+        self.assertEqual([error.id for error in check_shared_caches(None)], ["mysite.E001"])
+        with override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}}):
+            self.assertEqual(check_shared_caches(None), [])
+
+    def test_rebuild_command(self):
+        FriendShip.objects.create(follower=self.user1, following=self.user2)
+        out = io.StringIO()
+        call_command("rebuild_membership_filters", "--filter=following", str(self.user1.pk), stdout=out)
+        self.assertIn("rebuilt following for 1 users", out.getvalue())
+        with self.assertNumQueries(0):
+            self.assertTrue(following_filter.might_contain(self.user1.pk, self.user2.pk))
+
+
+@override_settings(RATELIMITS={"tweets:like": "2/m", "accounts:login": "1/m"})
+class TestRateLimit(TestCase):
+    def setUp(self):
+        self.user1 = User.objects.create_user(username="testuser1", email="test1@example.com", password="testpassword")
+        self.user2 = User.objects.create_user(username="testuser2", email="test2@example.com", password="testpassword")
+        self.tweet = Tweet.objects.create(user=self.user1, title="test", content="testtweet")
+        self.url = reverse("tweets:like", kwargs={"pk": self.tweet.pk})
+
+    def test_limited_per_user(self):
+        self.client.force_login(self.user1)
+        self.assertEqual(self.client.post(self.url).status_code, 200)
+        self.assertEqual(self.client.post(self.url).status_code, 200)
+        response = self.client.post(self.url)
+        self.assertEqual(response.status_code, 429)
+        self.assertTrue(1 <= int(response["Retry-After"]) <= 60)
+
+        self.client.force_login(self.user2)
+        self.assertEqual(self.client.post(self.url).status_code, 200)
+
+    def test_limited_per_ip_when_anonymous(self):
+        url = reverse("accounts:login")
+        data = {"username": "testuser1", "password": "wrongpassword"}
+        self.assertEqual(self.client.post(url, data).status_code, 200)
+        self.assertEqual(self.client.post(url, data).status_code, 429)
+        self.assertEqual(self.client.post(url, data, REMOTE_ADDR="10.0.0.1").status_code, 200)
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_bench_command_enforces_budget(self):
+        out = io.StringIO()
+        call_command("bench_ratelimit", "--rounds", "10", "--max-us", "1000000", stdout=out)
+        self.assertIn("µs per request", out.getvalue())
+        with self.assertRaises(CommandError):
+            call_command("bench_ratelimit", "--rounds", "10", "--max-us", "0", stdout=io.StringIO())
+
+
+class TestStaticAssets(TestCase):
+    def setUp(self):
+        self.static_root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.static_root.cleanup)
+        assets.local_url.cache_clear()
+        self.addCleanup(assets.local_url.cache_clear)
+
+    def collectstatic(self):
+        with override_settings(
+            STATIC_ROOT=self.static_root.name,
+            STATICFILES_STORAGE="mysite.assets.CompressedManifestStaticFilesStorage",
+        ):
+            call_command("collectstatic", interactive=False, verbosity=0, stdout=io.StringIO())
+            return assets.CompressedManifestStaticFilesStorage().stored_name("tweets/like.js")
+
+    def test_collectstatic_hashes_and_precompresses(self):
+        name = self.collectstatic()
+        self.assertRegex(name, assets.HASHED_NAME)
+        root = Path(self.static_root.name)
+        self.assertEqual(gzip.decompress((root / f"{name}.gz").read_bytes()), (root / name).read_bytes())
+
+    def test_serve_prefers_precompressed_and_caches_hashed_names(self):
+        name = self.collectstatic()
+        with override_settings(STATIC_ROOT=self.static_root.name):
+            request = mock.Mock(headers={"Accept-Encoding": "gzip, deflate"})
+            response = assets.serve(request, name)
+            self.assertEqual(response["Content-Encoding"], "gzip")
+            self.assertEqual(response["Content-Type"], "text/javascript")
+            self.assertEqual(response["Cache-Control"], assets.IMMUTABLE)
+
+            response = assets.serve(mock.Mock(headers={}), "tweets/like.js")
+            self.assertNotIn("Content-Encoding", response)
+            self.assertEqual(response["Cache-Control"], f"public, max-age={settings.STATIC_MAX_AGE}")
+
+            with self.assertRaises(Http404):
+                assets.serve(request, "../settings.py")
+
+    def test_vendor_stylesheet_falls_back_to_local_copy(self):
+        template = Template('{% load assets %}{% vendor_stylesheet "bootstrap" %}')
+        self.assertNotIn("onerror", template.render(Context()))
+
+        with tempfile.TemporaryDirectory() as static_dir:
+            (Path(static_dir) / "vendor").mkdir()
+            (Path(static_dir) / "vendor" / "bootstrap.min.css").write_text("body {}")
+            assets.local_url.cache_clear()
+            with override_settings(STATICFILES_DIRS=[static_dir]):
+                self.assertIn("/static/vendor/bootstrap.min.css", template.render(Context()))
+
+
+class TestStartup(TestCase):
+    # Cold start time is checked with `startup_profile --budget`, outside the
+    # test suite, where wall time doesn't depend on the other tests.
+
+    def production_settings(self):
+        return mock.patch.dict(os.environ, {"DJANGO_SETTINGS_MODULE": "mysite.settings_production"})
+
+    def test_setup_skips_admin_modules(self):
+        with self.production_settings():
+            _, modules = cold_start("import django; django.setup()")
+        self.assertIn("accounts.models", modules)
+        self.assertNotIn("accounts.admin", modules)
+
+    def test_admin_loaded_with_urlconf(self):
+        user = User.objects.create_superuser(username="admin", password="testpassword")
+        self.client.force_login(user)
+        response = self.client.get(reverse("admin:accounts_user_changelist"))
+        self.assertEqual(response.status_code, 200)
+
+    def test_profile_command_enforces_budget(self):
+        with mock.patch("mysite.management.commands.startup_profile.cold_start", return_value=(2.0, set())):
+            with mock.patch("mysite.management.commands.startup_profile.import_profile", return_value=[]):
+                with self.assertRaises(CommandError):
+                    call_command("startup_profile", "--budget=1.5", stdout=io.StringIO())
+
+    def test_parse_importtime(self):
+        rows = parse_importtime(
+            "import time: self [us] | cumulative | imported package\n"
+            "import time:       120 |        120 |     django.db.models.fields\n"
+            "import time:        30 |        150 |   django.db.models\n"
+            "import time:        10 |         10 | json\n"
+        )
+        self.assertEqual(rows[0], ("django.db.models.fields", 120, 120))
+        self.assertEqual(by_package(rows, 2), {"django.db": 150, "json": 10})
+
+    def test_warm_templates(self):
+        self.assertGreater(warm_templates(), 10)
+
+
+class TestTemplates(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="testpassword")
+        self.tweet = Tweet.objects.create(user=self.user, title="title", content="content")
+        Like.objects.create(user=self.user, tweet=self.tweet)
+        self.client.login(username="testuser", password="testpassword")
+
+    def test_url_for_matches_url_tag(self):
+        template = Template(
+            '{% load urlformat %}{% url "accounts:user_profile" name %} {{ name|url_for:"accounts:user_profile" }} '
+            '{% url "tweets:detail" pk %} {{ pk|url_for:"tweets:detail" }}'
+        )
+        profile, fast_profile, detail, fast_detail = template.render(Context({"name": "a+b", "pk": 1234})).split()
+        self.assertEqual(profile, fast_profile)
+        self.assertEqual(detail, fast_detail)
+
+    def test_production_templates_cached(self):
+        from . import settings_production
+
+        with override_settings(TEMPLATES=settings_production.TEMPLATES):
+            response = self.client.get(reverse("tweets:home"))
+            self.assertContains(response, reverse("tweets:unlike", kwargs={"pk": self.tweet.pk}))
+            self.assertContains(response, f'href="{reverse("tweets:detail", kwargs={"pk": self.tweet.pk})}"')
+            with mock.patch("django.template.loaders.filesystem.Loader.get_contents") as get_contents:
+                self.client.get(reverse("tweets:home"))
+            get_contents.assert_not_called()
@@ -14,17 +14,24 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.conf import settings
-from django.contrib import admin
-from django.urls import include, path
+from django.urls import include, path, re_path
+
+from . import assets
+from .metrics import metrics_view
 
 urlpatterns = [
-    path("admin/", admin.site.urls),
+    path("metrics", metrics_view, name="metrics"),
+    path("admin/", include("mysite.admin_urls")),
     path("accounts/", include("accounts.urls")),
     path("tweets/", include("tweets.urls")),
+    path("notifications/", include("notifications.urls")),
     path("", include("welcome.urls")),
 ]
 
 
+if settings.SERVE_STATIC:
+    urlpatterns.insert(0, re_path(rf"^{settings.STATIC_URL.lstrip('/')}(?P<path>.*)$", assets.serve))
+
 if settings.SQL_DEBUG:
     import debug_toolbar
 
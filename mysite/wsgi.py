@@ -14,3 +14,10 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "mysite.settings")
 
 application = get_wsgi_application()
+
+# Compile the URLconf and templates and load the optional social graph once,
+# before a preforking server (gunicorn --preload) forks its workers. runserver
+# imports this module too; warming up there only costs a moment per reload.
+from mysite.startup import warm  # noqa: E402
+
+warm()
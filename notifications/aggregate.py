@@ -0,0 +1,56 @@
+import re
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from mysite.memoize import invalidate_tags
+from mysite.metrics import record_write
+
+from .models import Notification, NotificationActor
+from .queries import inbox_tag
+
+MENTION_RE = re.compile(r"@([\w.+-]+)")
+
+
+def window():
+    return int(timezone.now().timestamp()) // settings.NOTIFICATION_AGGREGATION_WINDOW
+
+
+def notify(recipient_id, verb, actor_id, group_key, tweet_id=None):
+    """Add an event to the recipient's row for group_key, creating it if needed.
+
+    Events sharing a group key collapse into one row whose actor_count grows,
+    so a burst of likes updates a single row instead of adding one each. An
+    actor already counted in the row (say, liking again after an unlike) is
+    not counted or notified twice.
+    """
+    if recipient_id == actor_id:
+        return
+    group = Notification.objects.filter(recipient_id=recipient_id, group_key=group_key)
+    notification_id = group.values_list("pk", flat=True).first()
+    created = False
+    if notification_id is None:
+        try:
+            with transaction.atomic():
+                notification_id = Notification.objects.create(
+                    recipient_id=recipient_id, verb=verb, actor_id=actor_id, tweet_id=tweet_id, group_key=group_key
+                ).pk
+                NotificationActor.objects.create(notification_id=notification_id, actor_id=actor_id)
+            created = True
+        except IntegrityError:
+            notification_id = group.values_list("pk", flat=True).get()
+    if not created:
+        try:
+            with transaction.atomic():
+                NotificationActor.objects.create(notification_id=notification_id, actor_id=actor_id)
+        except IntegrityError:
+            return
+        group.update(actor_id=actor_id, actor_count=F("actor_count") + 1, is_read=False, updated_at=timezone.now())
+    record_write("notification")
+    invalidate_tags(inbox_tag(recipient_id))
+
+
+def mentioned_usernames(content):
+    return list(dict.fromkeys(MENTION_RE.findall(content)))[: settings.NOTIFICATION_MAX_MENTIONS]
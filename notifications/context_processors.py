@@ -0,0 +1,11 @@
+import functools
+
+from .queries import unread_count
+
+
+def unread_notifications(request):
+    if not request.user.is_authenticated:
+        return {}
+    # Templates call callables on access, so pages that don't show the
+    # counter never look it up.
+    return {"unread_notification_count": functools.partial(unread_count, request.user.pk)}
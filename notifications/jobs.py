@@ -0,0 +1,32 @@
+from django.contrib.auth import get_user_model
+
+from tasks.models import Task
+from tasks.queue import task
+from tweets.models import Tweet
+
+from .aggregate import mentioned_usernames, notify, window
+from .models import Notification
+
+User = get_user_model()
+
+
+@task("notifications.like", priority=Task.HIGH)
+def notify_like(tweet_id, actor_id):
+    author_id = Tweet.objects.filter(pk=tweet_id).values_list("user_id", flat=True).first()
+    if author_id is not None:
+        notify(author_id, Notification.LIKE, actor_id, f"like:{tweet_id}:{window()}", tweet_id=tweet_id)
+
+
+@task("notifications.follow", priority=Task.HIGH)
+def notify_follow(user_id, actor_id):
+    notify(user_id, Notification.FOLLOW, actor_id, f"follow:{window()}")
+
+
+@task("notifications.mentions", priority=Task.HIGH)
+def notify_mentions(tweet_id):
+    tweet = Tweet.objects.filter(pk=tweet_id).only("user_id", "content").first()
+    if tweet is None:
+        return
+    names = mentioned_usernames(tweet.content)
+    for user_id in User.objects.filter(username__in=names).values_list("pk", flat=True):
+        notify(user_id, Notification.MENTION, tweet.user_id, f"mention:{tweet_id}", tweet_id=tweet_id)
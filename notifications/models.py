@@ -0,0 +1,57 @@
+from django.conf import settings
+from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+
+from tweets.models import Tweet
+
+
+class NotificationQuerySet(models.QuerySet):
+    def visible(self):
+        """Rows whose tweet and actor are still shown; the inbox and its badge both use this."""
+        return self.filter(Q(tweet__isnull=True) | Q(tweet__visible=True), actor__deleted_at__isnull=True)
+
+
+class Notification(models.Model):
+    LIKE = "like"
+    FOLLOW = "follow"
+    MENTION = "mention"
+    VERB_CHOICES = [(LIKE, "like"), (FOLLOW, "follow"), (MENTION, "mention")]
+
+    recipient = models.ForeignKey(settings.AUTH_USER_MODEL, related_name="notifications", on_delete=models.CASCADE)
+    verb = models.CharField(max_length=10, choices=VERB_CHOICES)
+    # The most recent actor; actor_count is how many distinct actors (see
+    # NotificationActor) are folded into this row.
+    actor = models.ForeignKey(settings.AUTH_USER_MODEL, related_name="+", on_delete=models.CASCADE)
+    actor_count = models.PositiveIntegerField(default=1)
+    tweet = models.ForeignKey(Tweet, null=True, blank=True, related_name="+", on_delete=models.CASCADE)
+    group_key = models.CharField(max_length=100)
+    is_read = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    objects = NotificationQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["recipient", "group_key"], name="unique_notification_group"),
+        ]
+        indexes = [
+            models.Index(fields=["recipient", "-updated_at", "-id"], name="notification_inbox_idx"),
+            models.Index(fields=["recipient", "is_read"], name="notification_unread_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.verb} for {self.recipient_id}"
+
+
+class NotificationActor(models.Model):
+    """An actor already counted in a notification, so repeating an event doesn't count them twice."""
+
+    notification = models.ForeignKey(Notification, related_name="actors", on_delete=models.CASCADE)
+    actor = models.ForeignKey(settings.AUTH_USER_MODEL, related_name="+", on_delete=models.CASCADE)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["notification", "actor"], name="unique_notification_actor"),
+        ]
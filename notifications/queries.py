@@ -0,0 +1,38 @@
+from django.db import transaction
+
+from mysite.caches import is_shared
+from mysite.memoize import invalidate_tags, memoize
+
+from .models import Notification
+
+
+def inbox_tag(user_id):
+    return f"notifications:{user_id}"
+
+
+def _count_unread(user_id):
+    return Notification.objects.visible().filter(recipient_id=user_id, is_read=False).count()
+
+
+@memoize(tags=lambda user_id: [inbox_tag(user_id)], ttl=300)
+def _cached_unread_count(user_id):
+    return _count_unread(user_id)
+
+
+def forget_unread(notifications):
+    """Drop the cached unread counts of everyone with unread rows in `notifications`
+    once the transaction commits, e.g. when those rows are about to be hidden."""
+    tags = [
+        inbox_tag(user_id)
+        for user_id in notifications.filter(is_read=False).values_list("recipient_id", flat=True).distinct()
+    ]
+    if tags:
+        transaction.on_commit(lambda: invalidate_tags(*tags))
+
+
+def unread_count(user_id):
+    # Notifications are written by runworker, whose invalidate_tags() only
+    # reaches the web processes through a shared cache.
+    if not is_shared("default"):
+        return _count_unread(user_id)
+    return _cached_unread_count(user_id)
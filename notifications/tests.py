@@ -0,0 +1,132 @@
+import io
+import tempfile
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+
+from accounts.forms import User
+from mysite.testcases import TestCase
+from tweets.models import Tweet
+
+from .models import Notification
+from .queries import unread_count
+
+
+class TestNotifications(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", email="test@example.com", password="testpassword")
+        self.others = [
+            User.objects.create_user(username=f"other{i}", email=f"other{i}@example.com", password="testpassword")
+            for i in range(3)
+        ]
+        self.tweet = Tweet.objects.create(user=self.user, title="test", content="tweet")
+
+    def post_as(self, user, url):
+        self.client.force_login(user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(url)
+        call_command("runworker", "--once", "--threads=0", stdout=io.StringIO())
+
+    def test_likes_are_aggregated_per_tweet(self):
+        for other in self.others:
+            self.post_as(other, reverse("tweets:like", kwargs={"pk": self.tweet.pk}))
+        notification = Notification.objects.get()
+        self.assertEqual(notification.verb, Notification.LIKE)
+        self.assertEqual(notification.actor_count, 3)
+        self.assertEqual(notification.actor, self.others[-1])
+        self.assertEqual(unread_count(self.user.pk), 1)
+
+    def test_repeated_actor_is_counted_once(self):
+        like = reverse("tweets:like", kwargs={"pk": self.tweet.pk})
+        unlike = reverse("tweets:unlike", kwargs={"pk": self.tweet.pk})
+        follow = reverse("accounts:follow", kwargs={"username": "testuser"})
+        unfollow = reverse("accounts:unfollow", kwargs={"username": "testuser"})
+        for url in [like, unlike, like, unlike, like, follow, unfollow, follow]:
+            self.post_as(self.others[0], url)
+        self.post_as(self.others[1], like)
+        self.assertQuerysetEqual(
+            Notification.objects.order_by("verb").values_list("verb", "actor_count"),
+            [("follow", 1), ("like", 2)],
+            transform=tuple,
+        )
+
+    def test_badge_counts_what_the_inbox_shows(self):
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        shared = {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache", "LOCATION": cache_dir.name}
+        other_tweet = Tweet.objects.create(user=self.user, title="other", content="tweet")
+        for tweet in [self.tweet, other_tweet]:
+            self.post_as(self.others[0], reverse("tweets:like", kwargs={"pk": tweet.pk}))
+        self.post_as(self.others[1], reverse("accounts:follow", kwargs={"username": "testuser"}))
+        with override_settings(CACHES={**settings.CACHES, "default": shared}):
+            self.assertEqual(unread_count(self.user.pk), 3)
+            with self.captureOnCommitCallbacks(execute=True):
+                self.tweet.soft_delete()
+            self.assertEqual(unread_count(self.user.pk), 2)
+            with self.captureOnCommitCallbacks(execute=True):
+                self.others[1].soft_delete()
+            self.assertEqual(unread_count(self.user.pk), 1)
+            self.client.force_login(self.user)
+            response = self.client.get(reverse("notifications:inbox"))
+        self.assertEqual([n.tweet_id for n in response.context["notifications"]], [other_tweet.pk])
+
+    def test_own_like_is_not_notified(self):
+        self.post_as(self.user, reverse("tweets:like", kwargs={"pk": self.tweet.pk}))
+        self.assertFalse(Notification.objects.exists())
+
+    def test_follow_is_notified(self):
+        self.post_as(self.others[0], reverse("accounts:follow", kwargs={"username": "testuser"}))
+        notification = Notification.objects.get()
+        self.assertEqual((notification.recipient, notification.verb), (self.user, Notification.FOLLOW))
+
+    def test_mentions_are_notified(self):
+        self.client.force_login(self.others[0])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("tweets:create"), {"title": "hi", "content": "@testuser @other1 @nobody"})
+        call_command("runworker", "--once", "--threads=0", stdout=io.StringIO())
+        self.assertQuerysetEqual(
+            Notification.objects.order_by("recipient_id").values_list("recipient__username", "verb"),
+            [("testuser", "mention"), ("other1", "mention")],
+            transform=tuple,
+        )
+
+    @override_settings(NOTIFICATION_PAGE_SIZE=2)
+    def test_inbox_keyset_pagination(self):
+        for i, other in enumerate(self.others):
+            Notification.objects.create(recipient=self.user, verb=Notification.FOLLOW, actor=other, group_key=str(i))
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("notifications:inbox"))
+        first_page = [n.actor for n in response.context["notifications"]]
+        self.assertEqual(first_page, [self.others[2], self.others[1]])
+
+        response = self.client.get(reverse("notifications:inbox"), {"before": response.context["next_cursor"]})
+        self.assertEqual([n.actor for n in response.context["notifications"]], [self.others[0]])
+        self.assertNotIn("next_cursor", response.context)
+
+    def test_inbox_rejects_invalid_cursor(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("notifications:inbox"), {"before": "nope"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_mark_all_read_resets_cached_count(self):
+        self.post_as(self.others[0], reverse("accounts:follow", kwargs={"username": "testuser"}))
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("tweets:home"))
+        self.assertContains(response, "通知 (1)")
+
+        self.client.post(reverse("notifications:read"))
+        self.assertEqual(unread_count(self.user.pk), 0)
+        self.assertNotContains(self.client.get(reverse("tweets:home")), "通知 (")
+
+    def test_badge_sees_notifications_written_by_other_processes(self):
+        url = reverse("accounts:user_profile", kwargs={"username": "testuser"})
+        self.client.force_login(self.user)
+        self.client.get(url)
+        self.assertEqual(self.client.get(url)["X-Cache"], "miss")
+        self.assertEqual(unread_count(self.user.pk), 0)
+        # runworker's invalidate_tags() never reaches this process's cache.
+        Notification.objects.create(recipient=self.user, verb=Notification.FOLLOW, actor=self.others[0], group_key="f")
+        self.assertEqual(unread_count(self.user.pk), 1)
+        self.assertContains(self.client.get(url), "通知 (1)")
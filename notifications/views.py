@@ -0,0 +1,65 @@
+from datetime import datetime, timedelta, timezone
+
+from django.conf import settings
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.db.models import Q
+from django.http import HttpResponseBadRequest
+from django.urls import reverse_lazy
+from django.views.generic import ListView, RedirectView
+
+from mysite.memoize import invalidate_tags
+
+from .models import Notification
+from .queries import inbox_tag
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def encode_cursor(notification):
+    micros = (notification.updated_at - EPOCH) // timedelta(microseconds=1)
+    return f"{micros}-{notification.pk}"
+
+
+def decode_cursor(cursor):
+    micros, pk = map(int, cursor.split("-"))
+    return EPOCH + timedelta(microseconds=micros), pk
+
+
+class InboxView(LoginRequiredMixin, ListView):
+    template_name = "notifications/inbox.html"
+    context_object_name = "notifications"
+
+    def get(self, request, *args, **kwargs):
+        try:
+            return super().get(request, *args, **kwargs)
+        except ValueError:
+            return HttpResponseBadRequest("invalid cursor.")
+
+    def get_queryset(self):
+        # Keyset pagination: the next page starts after the last row shown, so
+        # deep pages cost the same as the first one and new rows don't shift it.
+        queryset = Notification.objects.visible().filter(recipient_id=self.request.user.pk)
+        if cursor := self.request.GET.get("before"):
+            updated_at, pk = decode_cursor(cursor)
+            queryset = queryset.filter(Q(updated_at__lt=updated_at) | Q(updated_at=updated_at, pk__lt=pk))
+        queryset = queryset.select_related("actor", "tweet").only(
+            "verb", "actor_count", "is_read", "updated_at", "tweet_id", "actor__username", "tweet__content"
+        )
+        return list(queryset.order_by("-updated_at", "-pk")[: settings.NOTIFICATION_PAGE_SIZE + 1])
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        notifications = context["notifications"]
+        if len(notifications) > settings.NOTIFICATION_PAGE_SIZE:
+            del notifications[settings.NOTIFICATION_PAGE_SIZE :]
+            context["next_cursor"] = encode_cursor(notifications[-1])
+        return context
+
+
+class MarkAllReadView(LoginRequiredMixin, RedirectView):
+    url = reverse_lazy("notifications:inbox")
+
+    def post(self, request, *args, **kwargs):
+        if Notification.objects.filter(recipient_id=request.user.pk, is_read=False).update(is_read=True):
+            invalidate_tags(inbox_tag(request.user.pk))
+        return super().post(request, *args, **kwargs)
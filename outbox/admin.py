@@ -0,0 +1,12 @@
+from django.contrib import admin
+
+from .models import Change, Offset
+
+
+class ChangeAdmin(admin.ModelAdmin):
+    list_display = ("__str__", "created_at")
+    list_filter = ("topic", "op")
+
+
+admin.site.register(Change, ChangeAdmin)
+admin.site.register(Offset, list_display=("consumer", "position", "updated_at"))
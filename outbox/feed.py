@@ -0,0 +1,76 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from .models import Change, Offset
+
+registry = {}
+
+
+def consumer(name, topics=None):
+    """Register handle(changes) to receive changes in order, one batch at a time.
+
+    A batch is handled in the same transaction that advances the consumer's
+    offset, so a handler that raises sees the batch again; handlers should be
+    idempotent.
+    """
+
+    def decorator(func):
+        func.consumer_name = name
+        func.topics = topics
+        registry[name] = func
+        return func
+
+    return decorator
+
+
+def record_change(topic, op, key, **data):
+    """Append a change. Call it inside the transaction that made the change."""
+    return Change.objects.create(topic=topic, op=op, key=key, data=data)
+
+
+def record_changes(topic, op, rows):
+    """Append one change per (key, data) in rows with a single insert."""
+    return Change.objects.bulk_create([Change(topic=topic, op=op, key=key, data=data) for key, data in rows])
+
+
+def consume(name, batch_size=None):
+    """Feed the next batch to a consumer and return how many changes it got."""
+    handle = registry[name]
+    with transaction.atomic():
+        Offset.objects.get_or_create(consumer=name)
+        offset = Offset.objects.select_for_update().get(consumer=name)
+        changes = Change.objects.filter(pk__gt=offset.position).order_by("pk")
+        if handle.topics is not None:
+            changes = changes.filter(topic__in=handle.topics)
+        if settings.OUTBOX_SETTLE_SECONDS:
+            changes = changes.filter(
+                created_at__lte=timezone.now() - timedelta(seconds=settings.OUTBOX_SETTLE_SECONDS)
+            )
+        changes = list(changes[: batch_size or settings.OUTBOX_BATCH_SIZE])
+        if not changes:
+            return 0
+        handle(changes)
+        offset.position = changes[-1].pk
+        offset.save(update_fields=["position", "updated_at"])
+    return len(changes)
+
+
+def compact():
+    """Shrink the log and return the number of changes deleted.
+
+    Changes every registered consumer has read are dropped. Past
+    OUTBOX_COMPACT_AFTER only the latest change per (topic, key) is kept, so a
+    consumer that falls that far behind sees the final state of each row
+    rather than every step.
+    """
+    positions = dict(Offset.objects.filter(consumer__in=registry).values_list("consumer", "position"))
+    watermark = min((positions.get(name, 0) for name in registry), default=0)
+    deleted = Change.objects.filter(pk__lte=watermark).delete()[0]
+    cutoff = timezone.now() - timedelta(seconds=settings.OUTBOX_COMPACT_AFTER)
+    newer = Change.objects.filter(topic=OuterRef("topic"), key=OuterRef("key"), pk__gt=OuterRef("pk"))
+    deleted += Change.objects.filter(created_at__lt=cutoff).filter(Exists(newer)).delete()[0]
+    return deleted
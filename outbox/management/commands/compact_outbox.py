@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+
+from outbox.feed import compact
+
+
+class Command(BaseCommand):
+    help = "Delete outbox changes that are consumed or superseded."
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"deleted {compact()} changes")
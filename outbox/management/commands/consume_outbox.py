@@ -0,0 +1,34 @@
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from outbox.feed import consume, registry
+
+
+class Command(BaseCommand):
+    help = "Feed new outbox changes to the registered consumers."
+
+    def add_arguments(self, parser):
+        parser.add_argument("names", nargs="*", help="Consumers to run; all of them by default.")
+        parser.add_argument("--batch-size", type=int, default=None)
+        parser.add_argument("--poll-interval", type=float, default=settings.OUTBOX_POLL_INTERVAL)
+        parser.add_argument("--once", action="store_true", help="Exit once every consumer has caught up.")
+
+    def handle(self, *args, names, batch_size, poll_interval, once, **options):
+        unknown = set(names) - set(registry)
+        if unknown:
+            raise CommandError(f"Unknown consumer {', '.join(sorted(unknown))}.")
+        names = names or list(registry)
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.stop)
+        while not self.stopping:
+            consumed = sum(consume(name, batch_size) for name in names)
+            if not consumed:
+                if once:
+                    break
+                time.sleep(poll_interval)
+
+    def stop(self, signum, frame):
+        self.stopping = True
@@ -0,0 +1,20 @@
+# Generated by Django 4.1.13 on 2026-10-19 16:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("outbox", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="change",
+            name="op",
+            field=models.CharField(
+                choices=[("create", "create"), ("delete", "delete"), ("archive", "archive")], max_length=10
+            ),
+        ),
+    ]
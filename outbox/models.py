@@ -0,0 +1,32 @@
+from django.db import models
+
+
+class Change(models.Model):
+    CREATE = "create"
+    DELETE = "delete"
+    # Moved out of the hot tables by archive_tweets.
+    ARCHIVE = "archive"
+    OP_CHOICES = [(CREATE, "create"), (DELETE, "delete"), (ARCHIVE, "archive")]
+
+    topic = models.CharField(max_length=20)
+    op = models.CharField(max_length=10, choices=OP_CHOICES)
+    key = models.CharField(max_length=100)
+    data = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["topic", "key"], name="change_key_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.pk}:{self.op} {self.topic}:{self.key}"
+
+
+class Offset(models.Model):
+    consumer = models.CharField(max_length=100, unique=True)
+    position = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.consumer}@{self.position}"
@@ -0,0 +1,164 @@
+import io
+from datetime import timedelta
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import DatabaseError
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.forms import User
+from accounts.models import FriendShip, PurgeJob
+from accounts.purge import run_purge_job
+from mysite.testcases import TestCase
+from tweets.archive import archive_before
+from tweets.models import Like, Tweet
+
+from .feed import compact, consume, consumer, record_change, registry
+from .models import Change, Offset
+
+batches = []
+
+
+@consumer("tests.likes", topics=["like"])
+def collect_likes(changes):
+    batches.append([(change.op, change.key) for change in changes])
+
+
+@consumer("tests.fail")
+def fail(changes):
+    raise RuntimeError("boom")
+
+
+class TestViewsRecordChanges(TestCase):
+    def setUp(self):
+        self.user1 = User.objects.create_user(username="testuser1", password="testpassword")
+        self.user2 = User.objects.create_user(username="testuser2", password="testpassword")
+        self.client.login(username="testuser1", password="testpassword")
+
+    def changes(self):
+        return list(Change.objects.order_by("pk").values_list("topic", "op", "key"))
+
+    def test_writes_are_logged_in_order(self):
+        self.client.post(reverse("tweets:create"), {"title": "title", "content": "content"})
+        tweet = Tweet.objects.get()
+        self.client.post(reverse("tweets:like", kwargs={"pk": tweet.pk}))
+        self.client.post(reverse("tweets:unlike", kwargs={"pk": tweet.pk}))
+        self.client.post(reverse("accounts:follow", kwargs={"username": "testuser2"}))
+        self.client.post(reverse("accounts:unfollow", kwargs={"username": "testuser2"}))
+        self.client.post(reverse("tweets:delete", kwargs={"pk": tweet.pk}))
+        like_key = f"{tweet.pk}:{self.user1.pk}"
+        follow_key = f"{self.user1.pk}:{self.user2.pk}"
+        self.assertEqual(
+            self.changes(),
+            [
+                ("tweet", Change.CREATE, str(tweet.pk)),
+                ("like", Change.CREATE, like_key),
+                ("like", Change.DELETE, like_key),
+                ("follow", Change.CREATE, follow_key),
+                ("follow", Change.DELETE, follow_key),
+                ("tweet", Change.DELETE, str(tweet.pk)),
+            ],
+        )
+
+    def test_repeated_writes_are_not_logged(self):
+        tweet = Tweet.objects.create(user=self.user2, title="title", content="content")
+        for _ in range(2):
+            self.client.post(reverse("tweets:like", kwargs={"pk": tweet.pk}))
+            self.client.post(reverse("accounts:unfollow", kwargs={"username": "testuser2"}))
+        self.assertEqual(self.changes(), [("like", Change.CREATE, f"{tweet.pk}:{self.user1.pk}")])
+
+    def test_write_rolled_back_with_its_change(self):
+        tweet = Tweet.objects.create(user=self.user2, title="title", content="content")
+        with mock.patch.object(Change.objects, "create", side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                self.client.post(reverse("tweets:like", kwargs={"pk": tweet.pk}))
+        self.assertFalse(Like.objects.exists())
+
+
+class TestBackgroundWritesRecordChanges(TestCase):
+    def setUp(self):
+        self.user1 = User.objects.create_user(username="testuser1", password="testpassword")
+        self.user2 = User.objects.create_user(username="testuser2", password="testpassword")
+        self.tweet = Tweet.objects.create(user=self.user2, title="title", content="content")
+        Like.objects.create(tweet=self.tweet, user=self.user1)
+        FriendShip.objects.create(follower=self.user1, following=self.user2)
+        self.like_key = f"{self.tweet.pk}:{self.user1.pk}"
+        self.follow_key = f"{self.user1.pk}:{self.user2.pk}"
+
+    def changes(self):
+        return list(Change.objects.order_by("pk").values_list("topic", "op", "key"))
+
+    def test_tweet_soft_delete_records_its_likes(self):
+        self.tweet.soft_delete()
+        self.assertEqual(
+            self.changes(), [("like", Change.DELETE, self.like_key), ("tweet", Change.DELETE, str(self.tweet.pk))]
+        )
+
+    def test_user_soft_delete_and_purge_record_hidden_rows(self):
+        self.user2.soft_delete()
+        hidden = [
+            ("tweet", Change.DELETE, str(self.tweet.pk)),
+            ("like", Change.DELETE, self.like_key),
+            ("follow", Change.DELETE, self.follow_key),
+        ]
+        self.assertEqual(self.changes(), hidden)
+        run_purge_job(PurgeJob.objects.get())
+        self.assertEqual(sorted(self.changes()[3:]), sorted(hidden))
+
+    def test_archive_records_moved_rows(self):
+        archive_before(timezone.now() + timedelta(seconds=1), batch_size=10)
+        self.assertEqual(
+            self.changes(), [("like", Change.ARCHIVE, self.like_key), ("tweet", Change.ARCHIVE, str(self.tweet.pk))]
+        )
+        self.assertEqual(Change.objects.get(topic="tweet").data, {"user_id": self.user2.pk})
+
+
+class TestConsume(TestCase):
+    def setUp(self):
+        batches.clear()
+        for key in ("1:1", "1:2", "2:1"):
+            record_change("like", Change.CREATE, key)
+        record_change("tweet", Change.CREATE, "1")
+
+    def test_batches_resume_from_stored_offset(self):
+        self.assertEqual(consume("tests.likes", batch_size=2), 2)
+        self.assertEqual(consume("tests.likes", batch_size=2), 1)
+        self.assertEqual(consume("tests.likes", batch_size=2), 0)
+        self.assertEqual(batches, [[("create", "1:1"), ("create", "1:2")], [("create", "2:1")]])
+        record_change("like", Change.DELETE, "1:1")
+        self.assertEqual(consume("tests.likes"), 1)
+        self.assertEqual(batches[-1], [("delete", "1:1")])
+
+    def test_failed_batch_is_retried(self):
+        with self.assertRaises(RuntimeError):
+            consume("tests.fail")
+        self.assertFalse(Offset.objects.filter(consumer="tests.fail", position__gt=0).exists())
+
+    def test_command_runs_until_caught_up(self):
+        with mock.patch.dict(registry, {"tests.likes": collect_likes}, clear=True):
+            call_command("consume_outbox", "--once", stdout=io.StringIO())
+        self.assertEqual(len(batches), 1)
+        self.assertEqual(
+            Offset.objects.get(consumer="tests.likes").position, Change.objects.filter(topic="like").last().pk
+        )
+
+
+class TestCompact(TestCase):
+    def test_drops_consumed_and_superseded_changes(self):
+        old = [record_change("like", op, "1:1") for op in (Change.CREATE, Change.DELETE, Change.CREATE)]
+        Change.objects.filter(pk__in=[change.pk for change in old]).update(
+            created_at=timezone.now() - timedelta(days=30)
+        )
+        recent = record_change("like", Change.DELETE, "1:1")
+        other = record_change("like", Change.CREATE, "2:2")
+        with mock.patch.dict(registry, {"tests.likes": collect_likes}, clear=True):
+            Offset.objects.create(consumer="tests.likes", position=old[0].pk)
+            self.assertEqual(compact(), 3)
+        self.assertEqual(list(Change.objects.order_by("pk")), [recent, other])
+
+    def test_unread_changes_kept_for_new_consumers(self):
+        record_change("like", Change.CREATE, "1:1")
+        with mock.patch.dict(registry, {"tests.likes": collect_likes}, clear=True):
+            self.assertEqual(compact(), 0)
+        self.assertEqual(Change.objects.count(), 1)
@@ -0,0 +1,11 @@
+from django.contrib import admin
+
+from .models import Task
+
+
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ("__str__", "priority", "status", "attempts", "run_at", "finished_at")
+    list_filter = ("status", "priority", "name")
+
+
+admin.site.register(Task, TaskAdmin)
@@ -0,0 +1,87 @@
+import os
+import signal
+import socket
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from tasks.queue import LANES
+from tasks.worker import Heartbeat, claim, execute, execute_in_thread, prune, requeue_expired
+
+
+class Command(BaseCommand):
+    help = "Run queued background tasks on a thread pool."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--threads",
+            type=int,
+            default=settings.TASKS_WORKER_THREADS,
+            help="Size of the thread pool; 0 runs tasks one by one in the main thread.",
+        )
+        parser.add_argument("--lanes", default=",".join(LANES), help="Comma separated lanes, e.g. high,default.")
+        parser.add_argument("--poll-interval", type=float, default=settings.TASKS_POLL_INTERVAL)
+        parser.add_argument("--once", action="store_true", help="Exit once no task is due.")
+
+    def handle(self, *args, threads, lanes, poll_interval, once, **options):
+        try:
+            priorities = [LANES[lane] for lane in lanes.split(",")]
+        except KeyError as exc:
+            raise CommandError(f"Unknown lane {exc}.")
+        worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.stop)
+
+        self.heartbeat = Heartbeat(worker_id, settings.TASKS_HEARTBEAT_INTERVAL)
+        self.heartbeat.start()
+        try:
+            if threads:
+                self.run_pool(worker_id, priorities, threads, poll_interval, once)
+            else:
+                self.run_inline(worker_id, priorities, poll_interval, once)
+        finally:
+            self.heartbeat.stop()
+
+    def maintain(self):
+        if time.monotonic() - self.last_maintenance > settings.TASKS_LOCK_TIMEOUT:
+            requeue_expired()
+            prune()
+            self.last_maintenance = time.monotonic()
+
+    def run_inline(self, worker_id, priorities, poll_interval, once):
+        self.last_maintenance = 0.0
+        while not self.stopping:
+            self.maintain()
+            claimed = claim(worker_id, priorities, 1)
+            for pk in claimed:
+                with self.heartbeat.track(pk):
+                    execute(pk)
+            if not claimed:
+                if once:
+                    break
+                time.sleep(poll_interval)
+
+    def run_pool(self, worker_id, priorities, threads, poll_interval, once):
+        self.last_maintenance = 0.0
+        running = set()
+        with ThreadPoolExecutor(threads) as pool:
+            while not self.stopping:
+                self.maintain()
+                claimed = claim(worker_id, priorities, threads - len(running))
+                running |= {pool.submit(self.execute_in_thread, pk) for pk in claimed}
+                if running:
+                    _, running = wait(running, timeout=poll_interval, return_when=FIRST_COMPLETED)
+                elif once:
+                    break
+                else:
+                    time.sleep(poll_interval)
+            wait(running)
+
+    def execute_in_thread(self, pk):
+        with self.heartbeat.track(pk):
+            return execute_in_thread(pk)
+
+    def stop(self, signum, frame):
+        self.stopping = True
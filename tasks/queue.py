@@ -0,0 +1,54 @@
+import functools
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import Task
+
+registry = {}
+
+LANES = {label: value for value, label in Task.PRIORITY_CHOICES}
+
+
+def task(name, priority=Task.DEFAULT, max_attempts=5):
+    """Register a function that the worker can run by name."""
+
+    def decorator(func):
+        func.task_name = name
+        func.priority = priority
+        func.max_attempts = max_attempts
+        registry[name] = func
+        return func
+
+    return decorator
+
+
+def enqueue(func, *args, key=None, priority=None, delay=None, **kwargs):
+    """Queue func(*args, **kwargs) and return the Task.
+
+    Arguments must be JSON serializable. A task enqueued again with the key of
+    an existing task is not queued twice; the existing task is returned.
+    delay postpones the first run by that many seconds.
+    """
+    fields = {
+        "name": func.task_name,
+        "args": list(args),
+        "kwargs": kwargs,
+        "priority": func.priority if priority is None else priority,
+        "max_attempts": func.max_attempts,
+    }
+    if delay:
+        fields["run_at"] = timezone.now() + timedelta(seconds=delay)
+    if key is None:
+        return Task.objects.create(**fields)
+    try:
+        with transaction.atomic():
+            return Task.objects.create(idempotency_key=key, **fields)
+    except IntegrityError:
+        return Task.objects.get(idempotency_key=key)
+
+
+def enqueue_on_commit(func, *args, **kwargs):
+    """Queue the task once the current transaction commits, if it commits."""
+    transaction.on_commit(functools.partial(enqueue, func, *args, **kwargs))
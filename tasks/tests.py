@@ -0,0 +1,149 @@
+import io
+from datetime import timedelta
+
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.forms import User
+from accounts.models import PurgeJob
+from mysite.testcases import TestCase
+from tweets.models import Tweet
+
+from .models import Task
+from .queue import enqueue, enqueue_on_commit, task
+from .worker import Heartbeat, claim, execute, extend_locks, requeue_expired
+
+calls = []
+
+
+@task("tests.record")
+def record(value):
+    calls.append(value)
+
+
+@task("tests.fail", max_attempts=2)
+def fail():
+    raise RuntimeError("boom")
+
+
+@task("tests.urgent", priority=Task.HIGH)
+def urgent():
+    calls.append("urgent")
+
+
+class TestQueue(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_enqueue_with_key_is_idempotent(self):
+        first = enqueue(record, 1, key="once")
+        second = enqueue(record, 2, key="once")
+        self.assertEqual(first.pk, second.pk)
+        self.assertEqual(Task.objects.count(), 1)
+
+    def test_enqueue_on_commit_waits_for_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            enqueue_on_commit(record, 1)
+            self.assertFalse(Task.objects.exists())
+        self.assertEqual(len(callbacks), 1)
+        callbacks[0]()
+        self.assertEqual(Task.objects.get().args, [1])
+
+    def test_claim_orders_by_priority_and_skips_future_tasks(self):
+        enqueue(record, 1)
+        enqueue(record, 2, delay=60)
+        high = enqueue(urgent)
+        low = enqueue(record, 3, priority=Task.LOW)
+        claimed = claim("worker", [Task.HIGH, Task.DEFAULT, Task.LOW], limit=10)
+        self.assertEqual(claimed[0], high.pk)
+        self.assertEqual(claimed[-1], low.pk)
+        self.assertEqual(len(claimed), 3)
+        self.assertEqual(claim("other", [Task.HIGH, Task.DEFAULT, Task.LOW], limit=10), [])
+
+    def test_claim_respects_lanes(self):
+        enqueue(record, 1)
+        high = enqueue(urgent)
+        self.assertEqual(claim("worker", [Task.HIGH], limit=10), [high.pk])
+
+    def test_execute_marks_done(self):
+        pk = enqueue(record, "value").pk
+        claim("worker", [Task.DEFAULT], limit=1)
+        self.assertTrue(execute(pk))
+        self.assertEqual(calls, ["value"])
+        self.assertEqual(Task.objects.get(pk=pk).status, Task.DONE)
+
+    @override_settings(TASKS_BACKOFF_BASE=10)
+    def test_failure_retries_with_backoff_then_fails(self):
+        pk = enqueue(fail).pk
+        claim("worker", [Task.DEFAULT], limit=1)
+        with self.assertLogs("tasks.worker", "WARNING"):
+            self.assertFalse(execute(pk))
+        failed = Task.objects.get(pk=pk)
+        self.assertEqual(failed.status, Task.QUEUED)
+        self.assertGreaterEqual(failed.run_at, timezone.now() + timedelta(seconds=4))
+        self.assertIn("boom", failed.last_error)
+
+        Task.objects.filter(pk=pk).update(run_at=timezone.now())
+        claim("worker", [Task.DEFAULT], limit=1)
+        with self.assertLogs("tasks.worker", "WARNING"):
+            execute(pk)
+        self.assertEqual(Task.objects.get(pk=pk).status, Task.FAILED)
+
+    def test_requeue_expired(self):
+        pk = enqueue(record, 1).pk
+        claim("worker", [Task.DEFAULT], limit=1)
+        Task.objects.filter(pk=pk).update(locked_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(requeue_expired(), 1)
+        self.assertEqual(Task.objects.get(pk=pk).status, Task.QUEUED)
+
+    def test_extend_locks_keeps_running_task(self):
+        pk = enqueue(record, 1).pk
+        claim("worker", [Task.DEFAULT], limit=1)
+        Task.objects.filter(pk=pk).update(locked_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(extend_locks("other", [pk]), 0)
+        self.assertEqual(extend_locks("worker", [pk]), 1)
+        self.assertEqual(requeue_expired(), 0)
+        self.assertEqual(Task.objects.get(pk=pk).status, Task.RUNNING)
+
+    def test_heartbeat_tracks_running_tasks(self):
+        heartbeat = Heartbeat("worker", 60)
+        with heartbeat.track(1):
+            self.assertEqual(heartbeat.running, {1})
+        self.assertEqual(heartbeat.running, set())
+
+    def test_runworker_once(self):
+        enqueue(record, 1)
+        enqueue(record, 2)
+        call_command("runworker", "--once", "--threads=0", stdout=io.StringIO())
+        self.assertEqual(sorted(calls), [1, 2])
+        self.assertFalse(Task.objects.exclude(status=Task.DONE).exists())
+
+
+class TestTaskHooks(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", email="test@example.com", password="testpassword")
+        self.user2 = User.objects.create_user(username="testuser2", email="test2@example.com", password="testpassword")
+        self.client.login(username="testuser", password="testpassword")
+
+    def test_follow_enqueues_notification(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("accounts:follow", kwargs={"username": "testuser2"}))
+        task = Task.objects.get()
+        self.assertEqual(task.name, "notifications.follow")
+        self.assertEqual(task.args, [self.user2.pk, self.user.pk])
+
+    def test_like_enqueues_notification(self):
+        tweet = Tweet.objects.create(user=self.user2, title="test", content="tweet")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("tweets:like", kwargs={"pk": tweet.pk}))
+        self.assertEqual(list(Task.objects.values_list("name", flat=True)), ["notifications.like"])
+
+    def test_tweet_delete_is_purged_by_worker(self):
+        tweet = Tweet.objects.create(user=self.user, title="test", content="tweet")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("tweets:delete", kwargs={"pk": tweet.pk}))
+        call_command("runworker", "--once", "--threads=0", stdout=io.StringIO())
+        self.assertFalse(Tweet.all_objects.filter(pk=tweet.pk).exists())
+        self.assertIsNotNone(PurgeJob.objects.get().finished_at)
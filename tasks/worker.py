@@ -0,0 +1,140 @@
+import logging
+import random
+import threading
+import traceback
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, connection
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Task
+from .queue import registry
+
+logger = logging.getLogger(__name__)
+
+
+def backoff(attempts):
+    # Exponential backoff with full jitter, so tasks that failed together
+    # don't all come back at the same moment.
+    delay = min(settings.TASKS_BACKOFF_BASE * 2 ** (attempts - 1), settings.TASKS_BACKOFF_MAX)
+    return timedelta(seconds=random.uniform(delay / 2, delay))
+
+
+def requeue_expired():
+    """Put back tasks whose worker died while running them."""
+    return Task.objects.filter(status=Task.RUNNING, locked_until__lt=timezone.now()).update(
+        status=Task.QUEUED, locked_by=""
+    )
+
+
+def extend_locks(worker_id, pks):
+    """Push back the lock expiry of tasks this worker is still running."""
+    return Task.objects.filter(pk__in=pks, status=Task.RUNNING, locked_by=worker_id).update(
+        locked_until=timezone.now() + timedelta(seconds=settings.TASKS_LOCK_TIMEOUT)
+    )
+
+
+class Heartbeat:
+    """Background thread that calls extend_locks for tracked tasks every interval seconds."""
+
+    def __init__(self, worker_id, interval):
+        self.worker_id = worker_id
+        self.interval = interval
+        self.running = set()
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="task-heartbeat", daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+    @contextmanager
+    def track(self, pk):
+        with self.lock:
+            self.running.add(pk)
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.running.discard(pk)
+
+    def run(self):
+        try:
+            while not self.stopped.wait(self.interval):
+                with self.lock:
+                    pks = list(self.running)
+                if not pks:
+                    continue
+                try:
+                    extend_locks(self.worker_id, pks)
+                except DatabaseError:
+                    # The next beat retries; the lock only lapses if every
+                    # beat within TASKS_LOCK_TIMEOUT fails.
+                    logger.exception("Task heartbeat failed")
+                    connection.close()
+        finally:
+            connection.close()
+
+
+def claim(worker_id, priorities, limit):
+    """Lock up to limit due tasks for this worker, highest priority first."""
+    now = timezone.now()
+    candidates = list(
+        Task.objects.filter(status=Task.QUEUED, run_at__lte=now, priority__in=priorities)
+        .order_by("priority", "run_at", "pk")
+        .values_list("pk", flat=True)[:limit]
+    )
+    claimed = []
+    for pk in candidates:
+        # Compare-and-set instead of SELECT ... FOR UPDATE, so several workers
+        # can share one queue on any database, SQLite included.
+        won = Task.objects.filter(pk=pk, status=Task.QUEUED).update(
+            status=Task.RUNNING,
+            locked_by=worker_id,
+            locked_until=now + timedelta(seconds=settings.TASKS_LOCK_TIMEOUT),
+            attempts=F("attempts") + 1,
+        )
+        if won:
+            claimed.append(pk)
+    return claimed
+
+
+def execute(pk):
+    task = Task.objects.get(pk=pk)
+    try:
+        registry[task.name](*task.args, **task.kwargs)
+    except Exception:
+        error = traceback.format_exc()
+        logger.warning("Task %s failed (attempt %d/%d)", task, task.attempts, task.max_attempts)
+        if task.attempts < task.max_attempts:
+            Task.objects.filter(pk=pk).update(
+                status=Task.QUEUED, run_at=timezone.now() + backoff(task.attempts), last_error=error, locked_by=""
+            )
+        else:
+            Task.objects.filter(pk=pk).update(status=Task.FAILED, finished_at=timezone.now(), last_error=error)
+        return False
+    Task.objects.filter(pk=pk).update(status=Task.DONE, finished_at=timezone.now())
+    return True
+
+
+def execute_in_thread(pk):
+    # Pool threads keep their own connections; drop broken or expired ones
+    # the way request handling does.
+    close_old_connections()
+    try:
+        return execute(pk)
+    finally:
+        close_old_connections()
+
+
+def prune():
+    """Delete finished tasks older than TASKS_RETENTION seconds."""
+    cutoff = timezone.now() - timedelta(seconds=settings.TASKS_RETENTION)
+    return Task.objects.filter(status__in=[Task.DONE, Task.FAILED], finished_at__lt=cutoff).delete()[0]
@@ -3,6 +3,21 @@ from django.contrib import admin
 
 from .models import Like, Tweet
 
-admin.site.register(Tweet)
+
+@admin.action(description="Soft-delete selected tweets")
+def soft_delete_tweets(modeladmin, request, queryset):
+    for tweet in queryset.filter(deleted_at__isnull=True):
+        tweet.soft_delete()
+
+
+class TweetAdmin(admin.ModelAdmin):
+    list_display = ("__str__", "user", "created_at", "deleted_at")
+    actions = [soft_delete_tweets]
+
+    def get_queryset(self, request):
+        return Tweet.all_objects.all()
+
+
+admin.site.register(Tweet, TweetAdmin)
 admin.site.register(Like)
 # Register your models here.
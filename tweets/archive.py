@@ -0,0 +1,44 @@
+from django.db import transaction
+
+from outbox.feed import record_changes
+from outbox.models import Change
+
+from .changes import like_rows
+from .models import ArchivedLike, ArchivedTweet, Like, Tweet
+
+
+def archive_before(cutoff, batch_size, on_progress=None):
+    """Move tweets created before cutoff, with their likes, into the archive.
+
+    Each batch is copied and removed from the hot tables in one transaction,
+    so a crash never loses or duplicates tweets. Soft-deleted tweets are left
+    for the purge job. Moved tweets and likes are recorded in the outbox as
+    ARCHIVE changes.
+    """
+    moved = 0
+    while True:
+        with transaction.atomic():
+            rows = list(
+                Tweet.objects.filter(created_at__lt=cutoff)
+                .with_like_count()
+                .order_by("created_at")
+                .values("id", "title", "content", "user_id", "created_at", "like_count")[:batch_size]
+            )
+            if not rows:
+                return moved
+            ids = [row["id"] for row in rows]
+            ArchivedTweet.objects.bulk_create(
+                [ArchivedTweet(month=row["created_at"].strftime("%Y-%m"), **row) for row in rows],
+                ignore_conflicts=True,
+            )
+            likes = like_rows(Like.all_objects.filter(tweet_id__in=ids))
+            ArchivedLike.objects.bulk_create(
+                [ArchivedLike(tweet_id=data["tweet_id"], user_id=data["user_id"]) for _, data in likes],
+                ignore_conflicts=True,
+            )
+            record_changes("like", Change.ARCHIVE, likes)
+            record_changes("tweet", Change.ARCHIVE, [(str(row["id"]), {"user_id": row["user_id"]}) for row in rows])
+            Tweet._base_manager.filter(pk__in=ids).delete()
+        moved += len(ids)
+        if on_progress:
+            on_progress(moved)
@@ -0,0 +1,115 @@
+CARD_FIELDS = ("id", "title", "content", "created_at", "user_id", "user__username", "like_count")
+
+
+class CardUser:
+    __slots__ = ("id", "username")
+
+    def __init__(self, id, username):
+        self.id = id
+        self.username = username
+
+    @property
+    def pk(self):
+        return self.id
+
+    def __str__(self):
+        return self.username
+
+
+class TweetCard:
+    """Read-only view of a tweet holding just what a timeline renders.
+
+    Archived cards can't be liked or unliked, so their controls are hidden.
+    """
+
+    __slots__ = ("id", "title", "content", "created_at", "user", "like_count", "archived")
+
+    def __init__(self, id, title, content, created_at, user_id, username, like_count, archived=False):
+        self.id = id
+        self.title = title
+        self.content = content
+        self.created_at = created_at
+        self.user = CardUser(user_id, username)
+        self.like_count = like_count
+        self.archived = archived
+
+    @property
+    def pk(self):
+        return self.id
+
+    @property
+    def user_id(self):
+        return self.user.id
+
+    def __str__(self):
+        return str(self.content)
+
+
+class Cards:
+    """TweetCard objects for the rows of a queryset.
+
+    Rows are read with values_list(*CARD_FIELDS). filter(), exclude(),
+    order_by() and slicing return Cards again; iterating, indexing, get(),
+    first() and iterator() produce cards. Iterating twice reuses the rows
+    fetched the first time, as a QuerySet does.
+    """
+
+    def __init__(self, rows, archived=False):
+        self.rows = rows
+        self.archived = archived
+
+    def _card(self, row):
+        return TweetCard(*row, archived=self.archived)
+
+    @property
+    def model(self):
+        return self.rows.model
+
+    @property
+    def ordered(self):
+        return self.rows.ordered
+
+    def filter(self, *args, **kwargs):
+        return Cards(self.rows.filter(*args, **kwargs), self.archived)
+
+    def exclude(self, *args, **kwargs):
+        return Cards(self.rows.exclude(*args, **kwargs), self.archived)
+
+    def order_by(self, *fields):
+        return Cards(self.rows.order_by(*fields), self.archived)
+
+    def count(self):
+        return self.rows.count()
+
+    def exists(self):
+        return self.rows.exists()
+
+    def get(self, *args, **kwargs):
+        return self._card(self.rows.get(*args, **kwargs))
+
+    def first(self):
+        row = self.rows.first()
+        return None if row is None else self._card(row)
+
+    def iterator(self, chunk_size=None):
+        for row in self.rows.iterator(chunk_size):
+            yield self._card(row)
+
+    def __iter__(self):
+        for row in self.rows:
+            yield self._card(row)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __bool__(self):
+        return bool(self.rows)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return Cards(self.rows[key], self.archived)
+        return self._card(self.rows[key])
+
+
+def as_cards(queryset, archived=False):
+    return Cards(queryset.values_list(*CARD_FIELDS), archived)
@@ -0,0 +1,10 @@
+def tweet_rows(queryset):
+    """(key, data) of each tweet, as TweetCreateView records them."""
+    return [(str(pk), {"user_id": user_id}) for pk, user_id in queryset.values_list("pk", "user_id").iterator()]
+
+
+def like_rows(queryset):
+    return [
+        (f"{tweet_id}:{user_id}", {"tweet_id": tweet_id, "user_id": user_id})
+        for tweet_id, user_id in queryset.values_list("tweet_id", "user_id").iterator()
+    ]
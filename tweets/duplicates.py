@@ -0,0 +1,109 @@
+import hashlib
+import math
+import re
+import time
+import unicodedata
+from collections import namedtuple
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import caches
+
+DUPLICATE = "duplicate"
+FLOOD = "flood"
+
+SHINGLE = 3
+BANDS = 8
+BAND_BITS = 64 // BANDS
+
+Fingerprint = namedtuple("Fingerprint", ["digest", "simhash", "length"])
+
+_punctuation = re.compile(r"[\W_]+")
+
+
+def _cache():
+    return caches[settings.DUPLICATE_CACHE]
+
+
+def normalize(text):
+    """Casefolded NFKC text with punctuation and whitespace removed."""
+    return _punctuation.sub("", unicodedata.normalize("NFKC", text).casefold())
+
+
+def simhash(text):
+    """64-bit SimHash over character shingles; near-identical texts differ in few bits."""
+    shingles = {text[i : i + SHINGLE] for i in range(max(len(text) - SHINGLE + 1, 1))}
+    digests = b"".join(hashlib.blake2b(shingle.encode(), digest_size=8).digest() for shingle in shingles)
+    bits = np.unpackbits(np.frombuffer(digests, dtype=np.uint8).reshape(-1, 8), axis=1)
+    return int.from_bytes(np.packbits(bits.sum(axis=0) * 2 > len(shingles)).tobytes(), "big")
+
+
+def fingerprint(*texts):
+    text = "\n".join(normalize(text) for text in texts)
+    digest = hashlib.blake2b(text.encode(), digest_size=8).hexdigest()
+    return Fingerprint(digest, simhash(text), len(text))
+
+
+def _near(a, b):
+    return (a ^ b).bit_count() <= settings.DUPLICATE_DISTANCE
+
+
+def _user_key(user_id):
+    return f"duplicates:user:{user_id}"
+
+
+def _band_keys(value):
+    # With at most DUPLICATE_DISTANCE (< BANDS) differing bits, two near
+    # duplicates share at least one band exactly, so each band is a bucket.
+    # Unrelated texts land in a bucket too, but are filtered by distance.
+    mask = (1 << BAND_BITS) - 1
+    return [f"duplicates:band:{band}:{(value >> (band * BAND_BITS)) & mask}" for band in range(BANDS)]
+
+
+def check(user_id, fp):
+    """Return (verdict, seconds until retrying makes sense); verdict is None if the post looks fine.
+
+    DUPLICATE means the user posted the same or nearly the same text within
+    DUPLICATE_USER_WINDOW. FLOOD means DUPLICATE_GLOBAL_LIMIT other users
+    posted it within DUPLICATE_GLOBAL_WINDOW. Only one cache round trip is
+    made, so the cost is bounded by the history and bucket sizes.
+    """
+    now = time.time()
+    keys = [_user_key(user_id), *_band_keys(fp.simhash)]
+    found = _cache().get_many(keys)
+    for digest, value, posted_at in found.get(keys[0], ()):
+        if now - posted_at < settings.DUPLICATE_USER_WINDOW and (digest == fp.digest or _near(value, fp.simhash)):
+            return DUPLICATE, 0
+    if fp.length < settings.DUPLICATE_GLOBAL_MIN_LENGTH:
+        return None, 0
+    matches = {
+        entry
+        for key in keys[1:]
+        for entry in found.get(key, ())
+        if entry[1] != user_id and now - entry[2] < settings.DUPLICATE_GLOBAL_WINDOW and _near(entry[0], fp.simhash)
+    }
+    if len({entry[1] for entry in matches}) >= settings.DUPLICATE_GLOBAL_LIMIT:
+        oldest = min(entry[2] for entry in matches)
+        return FLOOD, max(math.ceil(oldest + settings.DUPLICATE_GLOBAL_WINDOW - now), 1)
+    return None, 0
+
+
+def remember(user_id, fp):
+    """Add a posted tweet's fingerprint to the user's history and the global buckets.
+
+    Updates are read-modify-write, so concurrent posts can drop each other's
+    entries; that only makes the check more lenient.
+    """
+    now = time.time()
+    user_key = _user_key(user_id)
+    band_keys = _band_keys(fp.simhash)
+    found = _cache().get_many([user_key, *band_keys])
+    history = [entry for entry in found.get(user_key, ()) if now - entry[2] < settings.DUPLICATE_USER_WINDOW] + [
+        (fp.digest, fp.simhash, now)
+    ]
+    values = {user_key: history[-settings.DUPLICATE_USER_HISTORY :]}
+    if fp.length >= settings.DUPLICATE_GLOBAL_MIN_LENGTH:
+        for key in band_keys:
+            bucket = [entry for entry in found.get(key, ()) if now - entry[2] < settings.DUPLICATE_GLOBAL_WINDOW]
+            values[key] = (bucket + [(fp.simhash, user_id, now)])[-settings.DUPLICATE_BUCKET_SIZE :]
+    _cache().set_many(values, max(settings.DUPLICATE_USER_WINDOW, settings.DUPLICATE_GLOBAL_WINDOW))
@@ -0,0 +1,150 @@
+import functools
+import zlib
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import FieldError
+from django.db import models
+from django.db.models import lookups
+
+# Stored values start with one header byte: RAW is plain UTF-8, DEFLATE is
+# raw deflate without a dictionary and any higher number is raw deflate with
+# the preset dictionary <number>.dict. Rows written before the column was
+# converted come back from the database as str and are used as they are.
+RAW = 0
+DEFLATE = 1
+FIRST_DICTIONARY = 2
+
+
+_loaded = {}
+
+
+def load_dictionaries(directory):
+    """Read every dictionary in directory, replacing what dictionaries() had kept."""
+    found = {DEFLATE: b""}
+    for path in Path(directory).glob("*.dict"):
+        found[int(path.stem)] = path.read_bytes()
+    _loaded[directory] = found
+    return found
+
+
+def dictionaries():
+    directory = str(settings.TWEET_TEXT_DICTIONARY_DIR)
+    return _loaded.get(directory) or load_dictionaries(directory)
+
+
+def dictionary(version):
+    try:
+        return dictionaries()[version]
+    except KeyError:
+        # Trained by another process after this one loaded the directory.
+        return load_dictionaries(str(settings.TWEET_TEXT_DICTIONARY_DIR))[version]
+
+
+def _deflate(data, zdict):
+    compressor = zlib.compressobj(9, zlib.DEFLATED, -15, 9, **({"zdict": zdict} if zdict else {}))
+    return compressor.compress(data) + compressor.flush()
+
+
+def encode(text, version=None):
+    data = text.encode()
+    if version is None:
+        version = max(dictionaries()) if settings.TWEET_TEXT_COMPRESSION else RAW
+    if version != RAW:
+        compressed = _deflate(data, dictionary(version))
+        if len(compressed) < len(data):
+            return bytes([version]) + compressed
+    return bytes([RAW]) + data
+
+
+@functools.lru_cache(maxsize=4096)
+def decode(value):
+    if value[0] == RAW:
+        return value[1:].decode()
+    zdict = dictionary(value[0])
+    decompressor = zlib.decompressobj(-15, **({"zdict": zdict} if zdict else {}))
+    return (decompressor.decompress(value[1:]) + decompressor.flush()).decode()
+
+
+def train_dictionary(samples, size, lengths=(4, 6, 8, 12, 16)):
+    """Build a preset dictionary from the substrings that save the most bytes."""
+    counts = Counter()
+    for text in samples:
+        data = text.encode()
+        for n in lengths:
+            counts.update(data[i : i + n] for i in range(len(data) - n + 1))
+    chosen = []
+    total = 0
+    for piece, count in sorted(counts.items(), key=lambda item: (item[1] - 1) * len(item[0]), reverse=True):
+        if count < 2 or total >= size:
+            break
+        if any(piece in other for other in chosen):
+            continue
+        chosen.append(piece)
+        total += len(piece)
+    # Deflate reaches the end of the dictionary with the shortest distances,
+    # so the most valuable pieces go last.
+    return b"".join(reversed(chosen))[-size:]
+
+
+class Legacy(str):
+    """A value matched as stored before the column held encoded bytes."""
+
+
+class CompressedTextMixin:
+    """Store text as bytes, deflated with a preset dictionary when
+    TWEET_TEXT_COMPRESSION is on. Only exact and isnull lookups are supported;
+    anything else would compare encoded bytes and raises FieldError."""
+
+    supported_lookups = ("exact", "isnull")
+
+    def get_internal_type(self):
+        return "BinaryField"
+
+    def from_db_value(self, value, expression, connection):
+        if value is None or isinstance(value, str):
+            return value
+        return decode(bytes(value))
+
+    def get_prep_value(self, value):
+        if value is None or isinstance(value, (bytes, Legacy)):
+            return value
+        return encode(self.to_python(value))
+
+    def get_db_prep_value(self, value, connection, prepared=False):
+        if not prepared:
+            value = self.get_prep_value(value)
+        if isinstance(value, bytes):
+            return connection.Database.Binary(value)
+        return value
+
+    def get_lookup(self, lookup_name):
+        if lookup_name not in self.supported_lookups:
+            raise FieldError(
+                f"{self.model.__name__}.{self.name} is compressed and can't be used in a {lookup_name} lookup."
+            )
+        return super().get_lookup(lookup_name)
+
+    def encodings(self, text):
+        """Every form text may be stored in, for equality lookups."""
+        return [Legacy(text), *{encode(text, version) for version in [RAW, *dictionaries()]}]
+
+
+class CompressedCharField(CompressedTextMixin, models.CharField):
+    pass
+
+
+class CompressedTextField(CompressedTextMixin, models.TextField):
+    pass
+
+
+class CompressedExact(lookups.In):
+    lookup_name = "exact"
+
+    def get_prep_lookup(self):
+        return self.lhs.output_field.encodings(self.rhs)
+
+
+CompressedCharField.register_lookup(CompressedExact)
+CompressedTextField.register_lookup(CompressedExact)
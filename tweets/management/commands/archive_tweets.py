@@ -0,0 +1,20 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from tweets.archive import archive_before
+
+
+class Command(BaseCommand):
+    help = "Move old tweets and their likes from the hot tables into the archive."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--older-than-days", type=int, default=settings.ARCHIVE_AFTER_DAYS)
+        parser.add_argument("--batch-size", type=int, default=settings.ARCHIVE_BATCH_SIZE)
+
+    def handle(self, *args, older_than_days, batch_size, **options):
+        cutoff = timezone.now() - timedelta(days=older_than_days)
+        moved = archive_before(cutoff, batch_size, on_progress=lambda moved: self.stdout.write(f"{moved} tweets"))
+        self.stdout.write(f"Archived {moved} tweets created before {cutoff:%Y-%m-%d}.")
@@ -0,0 +1,52 @@
+import random
+import string
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from tweets.duplicates import check, fingerprint, remember
+
+
+class Command(BaseCommand):
+    help = "Time the duplicate check added to posting a tweet."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--length", type=int, default=100, help="Characters per title and content.")
+        parser.add_argument("--rounds", type=int, default=1000)
+        parser.add_argument(
+            "--max-check-us", type=float, help="Fail if a check with full buckets takes longer, e.g. 5000."
+        )
+
+    def handle(self, *args, length, rounds, max_check_us, **options):
+        rng = random.Random(0)
+        texts = ["".join(rng.choices(string.ascii_letters + "あいうえお ", k=length)) for _ in range(rounds)]
+        # Start with a full history for the posting user.
+        for text in texts[: settings.DUPLICATE_USER_HISTORY]:
+            remember(0, fingerprint(text, text[::-1]))
+        timings = {"fingerprint": 0.0, "check": 0.0, "remember": 0.0}
+        for text in texts:
+            start = time.perf_counter()
+            fp = fingerprint(text, text)
+            checked = time.perf_counter()
+            check(0, fp)
+            remembered = time.perf_counter()
+            remember(0, fp)
+            timings["fingerprint"] += checked - start
+            timings["check"] += remembered - checked
+            timings["remember"] += time.perf_counter() - remembered
+        for name, total in timings.items():
+            self.stdout.write(f"{name}: {total / rounds * 1e6:.0f} µs per tweet")
+        self.stdout.write(f"total: {sum(timings.values()) / rounds * 1e6:.0f} µs per tweet")
+
+        # Worst case: every band bucket of the post is full of its near duplicates.
+        fp = fingerprint(texts[0], texts[0])
+        for user_id in range(1, settings.DUPLICATE_BUCKET_SIZE + 1):
+            remember(user_id, fp)
+        start = time.perf_counter()
+        for _ in range(rounds):
+            check(-1, fp)
+        check_us = (time.perf_counter() - start) / rounds * 1e6
+        self.stdout.write(f"check with full buckets: {check_us:.0f} µs per tweet")
+        if max_check_us is not None and check_us > max_check_us:
+            raise CommandError(f"A check took {check_us:.0f} µs, over the {max_check_us:.0f} µs budget.")
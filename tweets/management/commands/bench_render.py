@@ -0,0 +1,41 @@
+import time
+from datetime import datetime
+
+from django.core.management.base import BaseCommand
+from django.template import Context, Engine, engines
+
+from tweets.cards import TweetCard
+
+LOADERS = ["django.template.loaders.filesystem.Loader", "django.template.loaders.app_directories.Loader"]
+
+
+def page_context(count):
+    tweets = [
+        TweetCard(pk, f"title {pk}", f"content {pk}", datetime(2024, 1, 1), pk % 7 + 1, f"user{pk % 7}", pk % 5)
+        for pk in range(1, count + 1)
+    ]
+    return {"tweets": tweets, "liked_list": {tweet.id for tweet in tweets[::3]}}
+
+
+class Command(BaseCommand):
+    help = "Time rendering a timeline page of tweets with and without the cached template loader."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--tweets", type=int, default=100)
+        parser.add_argument("--rounds", type=int, default=200)
+        parser.add_argument("--template", default="tweets/tweet_list.html")
+
+    def handle(self, *args, tweets, rounds, template, **options):
+        configured = engines["django"].engine
+        context = page_context(tweets)
+        for label, loaders in (
+            ("uncached", LOADERS),
+            ("cached", [("django.template.loaders.cached.Loader", LOADERS)]),
+        ):
+            engine = Engine(dirs=configured.dirs, loaders=loaders, libraries=configured.libraries)
+            engine.get_template(template).render(Context(context))
+            start = time.perf_counter()
+            for _ in range(rounds):
+                engine.get_template(template).render(Context(context))
+            elapsed = (time.perf_counter() - start) / rounds
+            self.stdout.write(f"{label}: {elapsed * 1000:.2f} ms per {tweets}-tweet page")
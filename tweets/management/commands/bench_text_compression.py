@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from tweets.fields import RAW, decode, dictionaries, encode
+from tweets.models import Tweet
+
+PAGE_SIZE = 4096
+ROW_OVERHEAD = 40
+
+
+class Command(BaseCommand):
+    help = "Compare stored size and decode cost of tweet text for each encoding."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sample", type=int, default=5000)
+        parser.add_argument("--page", type=int, default=500, help="Rows per timeline page.")
+        parser.add_argument("--cache-pages", type=int, default=2000, help="Database page cache size, in pages.")
+
+    def handle(self, *args, sample, page, cache_pages, **options):
+        rows = list(Tweet.objects.order_by("-created_at").values_list("title", "content")[:sample])
+        if not rows:
+            self.stdout.write("No tweets to measure.")
+            return
+        total = Tweet.all_objects.count()
+        for version in [RAW, *sorted(dictionaries())]:
+            encoded = [(encode(title, version), encode(content, version)) for title, content in rows]
+            row_size = sum(len(t) + len(c) for t, c in encoded) / len(encoded) + ROW_OVERHEAD
+            pages = total * row_size / PAGE_SIZE
+            decode.cache_clear()
+            start = time.perf_counter()
+            for title, content in encoded[:page]:
+                decode(title)
+                decode(content)
+            per_page = (time.perf_counter() - start) * 1000 * page / min(page, len(encoded))
+            self.stdout.write(
+                f"encoding {version}: {row_size:.0f} B/row, {pages:.0f} pages for {total} tweets, "
+                f"{min(1, cache_pages / max(pages, 1)):.0%} cacheable in {cache_pages} pages, "
+                f"decode {per_page:.2f} ms/page"
+            )
@@ -0,0 +1,37 @@
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+
+from tweets.models import Tweet
+
+
+def model_page(limit):
+    tweets = list(Tweet.objects.select_related("user").prefetch_related("liked_tweet").order_by("-created_at")[:limit])
+    return [(t.user.username, t.title, t.content, t.liked_tweet.count()) for t in tweets]
+
+
+def card_page(limit):
+    cards = list(Tweet.objects.cards().order_by("-created_at")[:limit])
+    return [(c.user.username, c.title, c.content, c.like_count) for c in cards]
+
+
+class Command(BaseCommand):
+    help = "Compare memory and throughput of a timeline page read as models versus tweet cards."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type=int, default=500)
+        parser.add_argument("--rounds", type=int, default=20)
+
+    def handle(self, *args, limit, rounds, **options):
+        for label, page in (("models", model_page), ("cards", card_page)):
+            tracemalloc.start()
+            rows = len(page(limit))
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+            start = time.perf_counter()
+            for _ in range(rounds):
+                page(limit)
+            rate = rows * rounds / (time.perf_counter() - start)
+            self.stdout.write(f"{label}: {rows} rows, peak {peak / 1024:.0f} KiB per page, {rate:.0f} rows/s")
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from tweets.models import ArchivedTweet, Tweet
+
+
+class Command(BaseCommand):
+    help = "Re-encode stored tweet text with the current compression settings, in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, batch_size, **options):
+        for model in (Tweet, ArchivedTweet):
+            manager = model._base_manager
+            last, done = 0, 0
+            while True:
+                with transaction.atomic():
+                    rows = list(
+                        manager.filter(pk__gt=last).order_by("pk").values_list("pk", "title", "content")[:batch_size]
+                    )
+                    if not rows:
+                        break
+                    manager.bulk_update(
+                        [model(pk=pk, title=title, content=content) for pk, title, content in rows],
+                        ["title", "content"],
+                    )
+                last = rows[-1][0]
+                done += len(rows)
+                self.stdout.write(f"{model._meta.label}: {done} rows")
@@ -0,0 +1,28 @@
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from tweets.fields import FIRST_DICTIONARY, dictionaries, load_dictionaries, train_dictionary
+from tweets.models import Tweet
+
+
+class Command(BaseCommand):
+    help = "Train a new preset dictionary for compressed tweet text from recent tweets."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sample", type=int, default=5000)
+        parser.add_argument("--size", type=int, default=4096)
+
+    def handle(self, *args, sample, size, **options):
+        rows = Tweet.objects.order_by("-created_at").values_list("title", "content")[:sample]
+        samples = [text for row in rows for text in row]
+        if not samples:
+            raise CommandError("No tweets to train on.")
+        version = max(max(dictionaries()) + 1, FIRST_DICTIONARY)
+        if version > 255:
+            raise CommandError("No dictionary numbers left.")
+        path = Path(settings.TWEET_TEXT_DICTIONARY_DIR) / f"{version}.dict"
+        path.write_bytes(train_dictionary(samples, size))
+        load_dictionaries(str(settings.TWEET_TEXT_DICTIONARY_DIR))
+        self.stdout.write(f"Wrote {path} from {len(samples)} texts; run compress_tweet_text to re-encode.")
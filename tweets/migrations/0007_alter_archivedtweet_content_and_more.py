@@ -0,0 +1,34 @@
+# Generated by Django 4.1.13 on 2026-10-19 15:16
+
+from django.db import migrations
+import tweets.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tweets", "0006_archivedtweet_archivedlike_and_more"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="archivedtweet",
+            name="content",
+            field=tweets.fields.CompressedTextField(max_length=100),
+        ),
+        migrations.AlterField(
+            model_name="archivedtweet",
+            name="title",
+            field=tweets.fields.CompressedCharField(max_length=100),
+        ),
+        migrations.AlterField(
+            model_name="tweet",
+            name="content",
+            field=tweets.fields.CompressedTextField(max_length=100),
+        ),
+        migrations.AlterField(
+            model_name="tweet",
+            name="title",
+            field=tweets.fields.CompressedCharField(max_length=100),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.1.13 on 2026-10-19 15:58
+
+from django.db import migrations, models
+from django.db.models import Q
+
+
+def hide_deleted(apps, schema_editor):
+    Tweet = apps.get_model("tweets", "Tweet")
+    Like = apps.get_model("tweets", "Like")
+    Tweet.objects.filter(Q(deleted_at__isnull=False) | Q(user__deleted_at__isnull=False)).update(visible=False)
+    Like.objects.filter(
+        Q(user__deleted_at__isnull=False) | Q(tweet__deleted_at__isnull=False) | Q(tweet__user__deleted_at__isnull=False)
+    ).update(visible=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0003_purgejob_alter_user_options_alter_user_managers_and_more"),
+        ("tweets", "0008_like_created_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="like",
+            name="visible",
+            field=models.BooleanField(default=True),
+        ),
+        migrations.AddField(
+            model_name="tweet",
+            name="visible",
+            field=models.BooleanField(default=True),
+        ),
+        migrations.RunPython(hide_deleted, migrations.RunPython.noop),
+    ]
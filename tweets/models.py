@@ -1,23 +1,137 @@
 from django.conf import settings
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from .cards import as_cards
+from .fields import CompressedCharField, CompressedTextField
+
+
+class TweetQuerySet(models.QuerySet):
+    def with_like_count(self):
+        return self.annotate(like_count=Count("liked_tweet", filter=Q(liked_tweet__visible=True)))
+
+    def cards(self):
+        """Fetch only the columns a timeline renders, as TweetCard objects."""
+        return as_cards(self.with_like_count())
+
+    def timeline(self, **filters):
+        """Cards newest first, continuing into the archive once the hot tweets run out; see Timeline.page."""
+        from .timeline import Timeline
+
+        return Timeline(self.filter(**filters).cards(), ArchivedTweet.objects.filter(**filters))
+
+
+class TweetManager(models.Manager.from_queryset(TweetQuerySet)):
+    def get_queryset(self):
+        return super().get_queryset().filter(visible=True)
 
 
 class Tweet(models.Model):
-    title = models.CharField(max_length=100)
-    content = models.TextField(max_length=100)
+    title = CompressedCharField(max_length=100)
+    content = CompressedTextField(max_length=100)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
+    deleted_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    # False once the tweet or its author is soft-deleted; kept on the row so
+    # hot reads don't have to join the author.
+    visible = models.BooleanField(default=True)
+
+    objects = TweetManager()
+    all_objects = models.Manager()
 
     def __str__(self):
         return str(self.content)
 
+    def soft_delete(self):
+        from accounts.jobs import purge
+        from accounts.models import PurgeJob
+        from notifications.models import Notification
+        from notifications.queries import forget_unread
+        from outbox.feed import record_change, record_changes
+        from outbox.models import Change
+        from tasks.queue import enqueue_on_commit
+
+        from .changes import like_rows
+
+        with transaction.atomic():
+            self.deleted_at = timezone.now()
+            self.visible = False
+            self.save(update_fields=["deleted_at", "visible"])
+            likes = Like.all_objects.filter(tweet_id=self.pk, visible=True)
+            record_changes("like", Change.DELETE, like_rows(likes))
+            likes.update(visible=False)
+            record_change("tweet", Change.DELETE, str(self.pk), user_id=self.user_id)
+            forget_unread(Notification.objects.filter(tweet_id=self.pk))
+            job, _ = PurgeJob.objects.get_or_create(target_type=PurgeJob.TWEET, target_id=self.pk)
+            enqueue_on_commit(purge, job.pk, key=f"purge:{job.pk}")
+
     class Meta:
         ordering = ["-created_at"]
 
 
+class ArchivedTweetQuerySet(models.QuerySet):
+    def cards(self):
+        return as_cards(self, archived=True).order_by("-created_at")
+
+    def months(self):
+        return self.order_by("-month").values_list("month", flat=True).distinct()
+
+
+class ArchivedTweetManager(models.Manager.from_queryset(ArchivedTweetQuerySet)):
+    def get_queryset(self):
+        return super().get_queryset().filter(user__deleted_at__isnull=True)
+
+
+class ArchivedTweet(models.Model):
+    """A tweet moved out of the hot table by archive_tweets, read-only from then on."""
+
+    id = models.BigIntegerField(primary_key=True)
+    title = CompressedCharField(max_length=100)
+    content = CompressedTextField(max_length=100)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, related_name="+", on_delete=models.CASCADE)
+    created_at = models.DateTimeField()
+    # Partition key: archiving and timeline reads walk the archive month by month.
+    month = models.CharField(max_length=7)
+    like_count = models.PositiveIntegerField(default=0)
+
+    objects = ArchivedTweetManager()
+    all_objects = models.Manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["month", "-created_at"], name="archived_tweet_month_idx"),
+            models.Index(fields=["user", "-created_at"], name="archived_tweet_user_idx"),
+        ]
+
+    def __str__(self):
+        return str(self.content)
+
+
+class ArchivedLike(models.Model):
+    tweet = models.ForeignKey(ArchivedTweet, related_name="likes", on_delete=models.CASCADE)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, related_name="+", on_delete=models.CASCADE)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["tweet", "user"], name="unique_archived_like"),
+        ]
+
+
+class LikeManager(models.Manager):
+    def get_queryset(self):
+        return super().get_queryset().filter(visible=True)
+
+
 class Like(models.Model):
     tweet = models.ForeignKey(Tweet, on_delete=models.CASCADE, related_name="liked_tweet")
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="liked_user")
+    created_at = models.DateTimeField(auto_now_add=True)
+    # False once the liking user, the tweet or its author is soft-deleted.
+    visible = models.BooleanField(default=True)
+
+    objects = LikeManager()
+    all_objects = models.Manager()
 
     class Meta:
         constraints = [
@@ -0,0 +1,7 @@
+from mysite.bloom import MembershipFilter
+
+from .models import Like
+
+liked_filter = MembershipFilter(
+    "liked", lambda user_id: Like.objects.filter(user_id=user_id).values_list("tweet_id", flat=True)
+)
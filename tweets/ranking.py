@@ -0,0 +1,111 @@
+import heapq
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from accounts.queries import following_ids
+from mysite.memoize import memoize
+
+from .models import Like, Tweet
+
+HOUR = 3600
+
+
+def affinities(user_id, since):
+    """Per author, how many of their tweets the user has liked since `since`."""
+    return dict(
+        Like.objects.filter(user_id=user_id, created_at__gte=since)
+        .values_list("tweet__user_id")
+        .annotate(count=Count("id"))
+        .order_by()
+    )
+
+
+def candidate_batches(author_ids, since, batch_size, limit):
+    """Yield (ids, author ids, timestamps, like counts) arrays, newest tweets first.
+
+    Batches are read with a keyset on (created_at, id), so each query stays
+    as cheap as the first; at most `limit` tweets are read in total.
+    """
+    queryset = (
+        Tweet.objects.filter(user_id__in=author_ids, created_at__gte=since)
+        .with_like_count()
+        .order_by("-created_at", "-id")
+        .values_list("id", "user_id", "created_at", "like_count")
+    )
+    page = queryset
+    while limit > 0:
+        rows = list(page[: min(batch_size, limit)])
+        if not rows:
+            return
+        limit -= len(rows)
+        ids, authors, created, likes = zip(*rows)
+        yield (
+            np.array(ids, dtype=np.int64),
+            np.array(authors, dtype=np.int64),
+            np.array([value.timestamp() for value in created]),
+            np.array(likes, dtype=np.float64),
+        )
+        if len(rows) < batch_size:
+            return
+        last_id, _, last_created, _ = rows[-1]
+        page = queryset.filter(Q(created_at__lt=last_created) | Q(created_at=last_created, id__lt=last_id))
+
+
+def _lookup(counts, keys):
+    if not counts:
+        return np.zeros(len(keys))
+    known = np.array(sorted(counts), dtype=np.int64)
+    values = np.array([counts[key] for key in known.tolist()], dtype=np.float64)
+    index = np.minimum(np.searchsorted(known, keys), len(known) - 1)
+    return np.where(known[index] == keys, values[index], 0.0)
+
+
+def score(now, timestamps, likes, affinity):
+    """Recency decay times boosts for like velocity and the viewer's affinity."""
+    age = np.maximum(now - timestamps, 0) / HOUR
+    decay = np.exp2(-age * HOUR / settings.TOP_TIMELINE_HALF_LIFE)
+    velocity = likes / (age + 2)
+    return (
+        decay
+        * (1 + settings.TOP_TIMELINE_VELOCITY_WEIGHT * velocity)
+        * (1 + settings.TOP_TIMELINE_AFFINITY_WEIGHT * np.log1p(affinity))
+    )
+
+
+@memoize(key=lambda user_id: user_id, tags=lambda user_id: [f"user:{user_id}"], ttl=settings.TOP_TIMELINE_CACHE_TTL)
+def ranked_ids(user_id):
+    """Ids of the best TOP_TIMELINE_SIZE recent tweets from people the user follows, best first."""
+    authors = following_ids(user_id)
+    if not authors:
+        return []
+    now = timezone.now()
+    affinity = affinities(user_id, now - timedelta(seconds=settings.TOP_TIMELINE_AFFINITY_WINDOW))
+    size = settings.TOP_TIMELINE_SIZE
+    heap = []
+    batches = candidate_batches(
+        authors,
+        now - timedelta(seconds=settings.TOP_TIMELINE_MAX_AGE),
+        settings.TOP_TIMELINE_BATCH_SIZE,
+        settings.TOP_TIMELINE_CANDIDATES,
+    )
+    for ids, author_ids, timestamps, likes in batches:
+        scores = score(now.timestamp(), timestamps, likes, _lookup(affinity, author_ids))
+        # Only a batch's own top `size` can make it into the heap.
+        keep = np.argpartition(-scores, size - 1)[:size] if len(scores) > size else np.arange(len(scores))
+        for item in zip(scores[keep].tolist(), ids[keep].tolist()):
+            if len(heap) < size:
+                heapq.heappush(heap, item)
+            elif item > heap[0]:
+                heapq.heapreplace(heap, item)
+    return [tweet_id for _, tweet_id in sorted(heap, reverse=True)]
+
+
+def top_timeline(user_id):
+    """Cards for the user's ranked tweets; like counts are current, the order is cached."""
+    ids = ranked_ids(user_id)
+    cards = {card.id: card for card in Tweet.objects.filter(pk__in=ids).cards()}
+    return [cards[tweet_id] for tweet_id in ids if tweet_id in cards]
@@ -1,9 +1,29 @@
-from django.test import TestCase
+import gzip
+import io
+import re
+import tempfile
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import FieldError
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 
 from accounts.forms import User
+from accounts.models import FriendShip, PurgeJob
+from accounts.purge import run_purge_job
+from mysite.checks import check_shared_caches
+from mysite.testcases import TestCase
 
-from .models import Like, Tweet
+from .cards import TweetCard
+from .fields import decode, dictionaries, encode
+from .models import ArchivedLike, ArchivedTweet, Like, Tweet
+from .ranking import candidate_batches, ranked_ids
 
 
 class TestHomeView(TestCase):
@@ -16,7 +36,104 @@ class TestHomeView(TestCase):
         Tweet.objects.create(user=self.user, content="test tweet")
         response = self.client.get(self.url)
         self.assertEqual(response.status_code, 200)
-        self.assertQuerysetEqual(response.context["object_list"], Tweet.objects.all())
+        self.assertQuerysetEqual(
+            response.context["object_list"], Tweet.objects.values_list("pk", flat=True), transform=lambda card: card.pk
+        )
+
+    def test_like_script_is_loaded_once(self):
+        Tweet.objects.bulk_create([Tweet(user=self.user, title="test", content=f"tweet {i}") for i in range(100)])
+        response = self.client.get(self.url)
+        self.assertEqual(response.content.count(b"<script"), 1)
+        self.assertEqual(response.content.count(b"<link"), 1)
+        # Each tweet used to carry ~2KB of inlined script and stylesheet links.
+        self.assertLess(len(response.content) / 100, 500)
+
+    @override_settings(STREAM_TIMELINES=True, STREAM_CHUNK_SIZE=2)
+    def test_streamed_timeline_matches_buffered_render(self):
+        Tweet.objects.bulk_create([Tweet(user=self.user, title="test", content=f"tweet {i}") for i in range(5)])
+        response = self.client.get(self.url)
+        self.assertTrue(response.streaming)
+        chunks = [chunk.decode() for chunk in response.streaming_content]
+        self.assertIn("<h1>ホーム</h1>", chunks[0])
+        self.assertEqual([chunk.count("alert-success") for chunk in chunks], [0, 2, 2, 1, 0])
+        self.assertIn("</html>", chunks[-1])
+
+        with override_settings(STREAM_TIMELINES=False):
+            buffered = self.client.get(self.url).content.decode()
+
+        def normalize(html):
+            html = re.sub(r'name="csrfmiddlewaretoken" value="[^"]+"', "", html)
+            return re.sub(r"\s+", " ", html)
+
+        self.assertEqual(normalize("".join(chunks)), normalize(buffered))
+
+    def test_response_is_gzipped(self):
+        Tweet.objects.bulk_create([Tweet(user=self.user, title="test", content=f"tweet {i}") for i in range(20)])
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn("tweet 19", gzip.decompress(response.content).decode())
+
+
+class TestTopTimelineView(TestCase):
+    def setUp(self):
+        self.url = reverse("tweets:top")
+        self.user = User.objects.create_user(username="testuser", password="testpassword")
+        self.user2 = User.objects.create_user(username="testuser2", password="testpassword")
+        self.user3 = User.objects.create_user(username="testuser3", password="testpassword")
+        self.stranger = User.objects.create_user(username="testuser4", password="testpassword")
+        FriendShip.objects.create(follower=self.user, following=self.user2)
+        FriendShip.objects.create(follower=self.user, following=self.user3)
+        self.client.login(username="testuser", password="testpassword")
+
+    def tweet(self, user, hours_ago, likes=0):
+        tweet = Tweet.objects.create(user=user, title="test", content="testtweet")
+        Tweet.objects.filter(pk=tweet.pk).update(created_at=timezone.now() - timedelta(hours=hours_ago))
+        fans = [User.objects.create_user(username=f"fan{tweet.pk}-{i}", password="x") for i in range(likes)]
+        Like.objects.bulk_create(Like(tweet=tweet, user=fan) for fan in fans)
+        return tweet
+
+    def test_success_get(self):
+        old = self.tweet(self.user2, hours_ago=20)
+        new = self.tweet(self.user3, hours_ago=1)
+        popular = self.tweet(self.user2, hours_ago=5, likes=5)
+        self.tweet(self.stranger, hours_ago=0)
+        self.tweet(self.user3, hours_ago=24 * 4)
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([card.pk for card in response.context["tweets"]], [popular.pk, new.pk, old.pk])
+
+    def test_affinity_boosts_liked_authors(self):
+        self.tweet(self.user2, hours_ago=3)
+        self.tweet(self.user3, hours_ago=2)
+        self.assertEqual(
+            [tweet.user.id for tweet in self.client.get(self.url).context["tweets"]], [self.user3.pk, self.user2.pk]
+        )
+
+        liked = self.tweet(self.user2, hours_ago=24 * 10)
+        Like.objects.create(tweet=liked, user=self.user)
+        ranked_ids.invalidate(self.user.pk)
+        self.assertEqual(
+            [tweet.user.id for tweet in self.client.get(self.url).context["tweets"]], [self.user2.pk, self.user3.pk]
+        )
+
+    def test_ranking_is_cached(self):
+        self.tweet(self.user2, hours_ago=1)
+        ranked_ids(self.user.pk)
+        self.tweet(self.user3, hours_ago=0)
+        with self.assertNumQueries(0):
+            self.assertEqual(len(ranked_ids(self.user.pk)), 1)
+
+    @override_settings(TOP_TIMELINE_BATCH_SIZE=2, TOP_TIMELINE_CANDIDATES=5, TOP_TIMELINE_SIZE=2)
+    def test_candidates_are_bounded(self):
+        tweets = [self.tweet(self.user2, hours_ago=hours) for hours in range(7)]
+        since = timezone.now() - timedelta(days=1)
+        with CaptureQueriesContext(connection) as queries:
+            batches = list(candidate_batches([self.user2.pk], since, 2, 5))
+        self.assertEqual([len(ids) for ids, *_ in batches], [2, 2, 1])
+        self.assertEqual(len(queries), 3)
+        self.assertEqual([tweet_id for ids, *_ in batches for tweet_id in ids.tolist()], [t.pk for t in tweets[:5]])
+        self.assertEqual(ranked_ids(self.user.pk), [tweets[0].pk, tweets[1].pk])
 
 
 class TestTweetCreateView(TestCase):
@@ -56,6 +173,41 @@ class TestTweetCreateView(TestCase):
         )
         self.assertFalse(Tweet.objects.exists())
 
+    @override_settings(DUPLICATE_DETECTION=True)
+    def test_failure_post_duplicate(self):
+        self.client.post(self.url, {"title": "sale", "content": "Buy cheap followers now at example"})
+        for content in ["buy CHEAP followers now, at example!!", "Buy cheap followers now at example2"]:
+            response = self.client.post(self.url, {"title": "sale", "content": content})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(
+                response.context["form"].non_field_errors(), ["同じ内容のツイートは続けて投稿できません。"]
+            )
+        self.assertEqual(Tweet.objects.count(), 1)
+
+        response = self.client.post(self.url, {"title": "sale", "content": "Something else entirely today"})
+        self.assertEqual(response.status_code, 302)
+
+    @override_settings(DUPLICATE_DETECTION=True)
+    def test_flood_is_throttled(self):
+        spam = {"title": "sale", "content": "Buy cheap followers now at example"}
+        for i in range(5):
+            self.client.force_login(User.objects.create_user(username=f"bot{i}", password="testpassword"))
+            self.assertEqual(self.client.post(self.url, spam).status_code, 302)
+        self.client.force_login(self.user)
+        response = self.client.post(self.url, spam)
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response["Retry-After"]), 0)
+        self.assertEqual(self.client.post(self.url, {"title": "hi", "content": "おはよう"}).status_code, 302)
+
+    def test_duplicates_allowed_when_detection_is_off(self):
+        for _ in range(2):
+            self.assertEqual(self.client.post(self.url, {"title": "hi", "content": "おはよう"}).status_code, 302)
+        self.assertEqual(Tweet.objects.count(), 2)
+
+    @override_settings(DUPLICATE_DETECTION=True)
+    def test_detection_requires_shared_cache(self):
+        self.assertEqual([error.id for error in check_shared_caches(None)], ["mysite.E001"])
+
 
 class TestTweetDetailView(TestCase):
     def setUp(self):
@@ -88,6 +240,25 @@ class TestTweetDeleteView(TestCase):
         self.assertRedirects(response, reverse("tweets:home"), status_code=302, target_status_code=200)
         self.assertEqual(Tweet.objects.filter(content="tweet").count(), 0)
 
+    def test_success_post_keeps_rows_until_purged(self):
+        Like.objects.create(tweet=self.tweet, user=self.user2)
+        self.client.post(self.url)
+        self.assertTrue(Tweet.all_objects.filter(pk=self.tweet.pk, deleted_at__isnull=False).exists())
+        self.assertFalse(Like.objects.filter(tweet=self.tweet).exists())
+        self.assertEqual(Like.all_objects.filter(tweet=self.tweet).count(), 1)
+
+        job = PurgeJob.objects.get(target_type=PurgeJob.TWEET, target_id=self.tweet.pk)
+        run_purge_job(job, batch_size=1)
+        self.assertFalse(Tweet.all_objects.filter(pk=self.tweet.pk).exists())
+        self.assertFalse(Like.objects.filter(tweet_id=self.tweet.pk).exists())
+        self.assertEqual(job.deleted_rows, 2)
+        self.assertIsNotNone(job.finished_at)
+
+    def test_deleted_tweet_detail_returns_404(self):
+        self.client.post(self.url)
+        response = self.client.get(reverse("tweets:detail", kwargs={"pk": self.tweet.pk}))
+        self.assertEqual(response.status_code, 404)
+
     def test_failure_post_with_not_exist_tweet(self):
         response = self.client.post(reverse("tweets:delete", kwargs={"pk": 3}))
         self.assertEqual(response.status_code, 404)
@@ -145,3 +316,146 @@ class TestUnfavoriteView(TestCase):
         Like.objects.filter(tweet=self.tweet, user=self.user).delete()
         response = self.client.post(self.url)
         self.assertEqual(response.status_code, 200)
+
+
+class TestTweetCards(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", email="test@example.com", password="testpassword")
+        self.user2 = User.objects.create_user(username="testuser2", email="test2@example.com", password="testpassword")
+        self.tweet = Tweet.objects.create(user=self.user, title="test", content="tweet")
+        Like.objects.create(tweet=self.tweet, user=self.user)
+        Like.objects.create(tweet=self.tweet, user=self.user2)
+
+    def test_cards_hold_only_rendered_columns(self):
+        with CaptureQueriesContext(connection) as queries:
+            card = Tweet.objects.cards().get()
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn("password", queries[0]["sql"])
+        self.assertIsInstance(card, TweetCard)
+        self.assertEqual(
+            (card.user.username, card.title, card.content, card.like_count), ("testuser", "test", "tweet", 2)
+        )
+        self.assertEqual(card.id, self.tweet.pk)
+
+    def test_like_count_skips_deleted_users(self):
+        self.user2.soft_delete()
+        self.assertEqual(Tweet.objects.cards().get().like_count, 1)
+
+
+class TestArchive(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", email="test@example.com", password="testpassword")
+        self.user2 = User.objects.create_user(username="testuser2", email="test2@example.com", password="testpassword")
+        self.client.login(username="testuser", password="testpassword")
+        self.old = [Tweet.objects.create(user=self.user2, title="old", content=f"old {i}") for i in range(3)]
+        for i, tweet in enumerate(self.old):
+            Tweet.objects.filter(pk=tweet.pk).update(created_at=timezone.now() - timedelta(days=400 + 40 * i))
+        Like.objects.create(tweet=self.old[0], user=self.user)
+        self.new = Tweet.objects.create(user=self.user2, title="new", content="new")
+
+    def archive(self):
+        call_command("archive_tweets", "--batch-size=2", stdout=io.StringIO())
+
+    def test_archive_moves_old_tweets_and_likes(self):
+        self.archive()
+        self.assertEqual(list(Tweet.objects.all()), [self.new])
+        self.assertEqual(ArchivedTweet.objects.count(), 3)
+        self.assertEqual(ArchivedTweet.objects.get(pk=self.old[0].pk).like_count, 1)
+        self.assertTrue(ArchivedLike.objects.filter(tweet_id=self.old[0].pk, user=self.user).exists())
+        self.assertFalse(Like.objects.exists())
+
+    def test_timeline_reads_archive_after_hot_tweets(self):
+        self.archive()
+        response = self.client.get(reverse("tweets:home"))
+        self.assertEqual([tweet.pk for tweet in response.context["tweets"]], [self.new.pk] + [t.pk for t in self.old])
+        self.assertContains(response, "old 2")
+
+        response = self.client.get(reverse("accounts:user_profile", kwargs={"username": "testuser2"}))
+        self.assertEqual(len(list(response.context["tweets"])), 4)
+        self.assertEqual(self.client.get(reverse("tweets:detail", kwargs={"pk": self.old[0].pk})).status_code, 200)
+
+    def test_archive_is_untouched_while_in_hot_window(self):
+        self.archive()
+        newer = Tweet.objects.create(user=self.user2, title="newer", content="newer")
+        with CaptureQueriesContext(connection) as queries:
+            cards, more = Tweet.objects.timeline().page(1)
+        self.assertEqual([card.pk for card in cards], [newer.pk])
+        self.assertTrue(more)
+        self.assertEqual(len(queries), 1)
+
+    @override_settings(TIMELINE_PAGE_SIZE=2)
+    def test_timeline_pages_continue_into_archive(self):
+        self.archive()
+        response = self.client.get(reverse("tweets:home"))
+        self.assertEqual([tweet.pk for tweet in response.context["tweets"]], [self.new.pk, self.old[0].pk])
+        cursor = response.context["next_cursor"]
+        self.assertContains(response, f"?before={cursor}")
+
+        response = self.client.get(reverse("tweets:home"), {"before": cursor})
+        self.assertEqual([tweet.pk for tweet in response.context["tweets"]], [t.pk for t in self.old[1:]])
+        self.assertNotIn("next_cursor", response.context)
+
+    def test_timeline_rejects_invalid_cursor(self):
+        response = self.client.get(reverse("tweets:home"), {"before": "x"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_archived_cards_have_no_like_button(self):
+        self.archive()
+        response = self.client.get(reverse("tweets:home"))
+        self.assertContains(response, reverse("tweets:like", kwargs={"pk": self.new.pk}))
+        self.assertNotContains(response, reverse("tweets:like", kwargs={"pk": self.old[0].pk}))
+        self.assertNotContains(response, reverse("tweets:unlike", kwargs={"pk": self.old[0].pk}))
+
+
+class TestCompressedText(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", email="test@example.com", password="testpassword")
+        dictionary_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(dictionary_dir.cleanup)
+        overrides = override_settings(TWEET_TEXT_COMPRESSION=True, TWEET_TEXT_DICTIONARY_DIR=dictionary_dir.name)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        Tweet.objects.bulk_create(
+            [Tweet(user=self.user, title="今日の天気", content=f"今日はとてもいい天気ですね {i}") for i in range(20)]
+        )
+        call_command("train_text_dictionary", stdout=io.StringIO())
+
+    def stored(self, pk):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT content FROM tweets_tweet WHERE id = %s", [pk])
+            return cursor.fetchone()[0]
+
+    def test_round_trip_and_lookup(self):
+        content = "今日はとてもいい天気ですね 明日も晴れるといいですね"
+        tweet = Tweet.objects.create(user=self.user, title="天気", content=content)
+        stored = self.stored(tweet.pk)
+        self.assertGreaterEqual(stored[0], 2)
+        self.assertLess(len(stored), len(content.encode()))
+        self.assertEqual(Tweet.objects.get(pk=tweet.pk).content, content)
+        self.assertEqual(Tweet.objects.filter(content=content).get(), tweet)
+        self.assertEqual(Tweet.objects.cards().filter(pk=tweet.pk).get().content, content)
+
+    def test_backfill_encodes_legacy_text(self):
+        tweet = Tweet.objects.create(user=self.user, title="天気", content="placeholder")
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "UPDATE tweets_tweet SET content = %s WHERE id = %s", ["今日はとてもいい天気ですね", tweet.pk]
+            )
+        self.assertIsInstance(self.stored(tweet.pk), str)
+        self.assertTrue(Tweet.objects.filter(pk=tweet.pk, content="今日はとてもいい天気ですね").exists())
+
+        call_command("compress_tweet_text", stdout=io.StringIO())
+        self.assertIsInstance(self.stored(tweet.pk), bytes)
+        self.assertEqual(Tweet.objects.get(pk=tweet.pk).content, "今日はとてもいい天気ですね")
+
+    def test_dictionary_trained_elsewhere_is_loaded(self):
+        dictionaries()
+        (Path(settings.TWEET_TEXT_DICTIONARY_DIR) / "99.dict").write_bytes("今日はとてもいい天気".encode())
+        value = encode("今日はとてもいい天気ですね", 99)
+        self.assertEqual(value[0], 99)
+        self.assertEqual(decode(value), "今日はとてもいい天気ですね")
+
+    def test_unsupported_lookup_raises(self):
+        with self.assertRaises(FieldError):
+            Tweet.objects.filter(content__contains="天気")
+        self.assertTrue(Tweet.objects.filter(title__isnull=False).exists())
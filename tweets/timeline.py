@@ -0,0 +1,80 @@
+from datetime import datetime, timedelta, timezone
+
+from django.conf import settings
+from django.db.models import Q
+from django.http import HttpResponseBadRequest
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def encode_cursor(card):
+    micros = (card.created_at - EPOCH) // timedelta(microseconds=1)
+    return f"{micros}-{card.id}"
+
+
+def decode_cursor(cursor):
+    micros, pk = map(int, cursor.split("-"))
+    return EPOCH + timedelta(microseconds=micros), pk
+
+
+def _older_than(queryset, position):
+    if position is None:
+        return queryset
+    created_at, pk = position
+    return queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+
+
+class Timeline:
+    """Hot tweet cards followed by archived ones, newest first.
+
+    Read a page at a time with a keyset on (created_at, id). The archive is
+    only queried when a page runs past the last hot tweet, and then one month
+    partition at a time.
+    """
+
+    def __init__(self, hot, archived):
+        self.hot = hot
+        self.archived = archived
+
+    def page(self, size, before=None):
+        """Up to `size` cards older than the (created_at, id) `before` position,
+        and whether more cards follow."""
+        cards = list(_older_than(self.hot, before).order_by("-created_at", "-id")[: size + 1])
+        if len(cards) <= size:
+            # Archived tweets are all older than hot ones, so they simply
+            # continue the page.
+            archived = _older_than(self.archived, before)
+            for month in archived.months():
+                wanted = size + 1 - len(cards)
+                cards += archived.filter(month=month).cards().order_by("-created_at", "-id")[:wanted]
+                if len(cards) > size:
+                    break
+        more = len(cards) > size
+        del cards[size:]
+        return cards, more
+
+
+class TimelineMixin:
+    """ListView showing one page of get_timeline(), continued with ?before=<cursor>."""
+
+    def get_timeline(self):
+        raise NotImplementedError
+
+    def get(self, request, *args, **kwargs):
+        try:
+            return super().get(request, *args, **kwargs)
+        except ValueError:
+            return HttpResponseBadRequest("invalid cursor.")
+
+    def get_queryset(self):
+        before = self.request.GET.get("before")
+        cards, self.more = self.get_timeline().page(
+            settings.TIMELINE_PAGE_SIZE, decode_cursor(before) if before else None
+        )
+        return cards
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        if self.more:
+            context["next_cursor"] = encode_cursor(self.object_list[-1])
+        return context
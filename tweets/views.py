@@ -1,52 +1,117 @@
+from django.conf import settings
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
-from django.http import JsonResponse
+from django.db import IntegrityError, transaction
+from django.http import Http404, HttpResponseRedirect, JsonResponse
 from django.shortcuts import get_object_or_404
 from django.urls import reverse, reverse_lazy
 from django.views import View
 from django.views.generic import CreateView, DeleteView, DetailView, ListView
 
-from .models import Like, Tweet
+from mysite.memoize import invalidate_tags
+from mysite.metrics import record_write
+from mysite.ratelimit import HttpResponseTooManyRequests, RateLimitMixin
+from mysite.responsecache import CachedResponseMixin
+from mysite.streaming import StreamingListMixin
+from notifications.jobs import notify_like, notify_mentions
+from outbox.feed import record_change
+from outbox.models import Change
+from tasks.queue import enqueue_on_commit
 
+from .duplicates import DUPLICATE, FLOOD, check, fingerprint, remember
+from .models import ArchivedTweet, Like, Tweet
+from .queries import liked_filter
+from .ranking import top_timeline
+from .timeline import TimelineMixin
 
-class HomeView(LoginRequiredMixin, ListView):
+
+class HomeView(LoginRequiredMixin, TimelineMixin, StreamingListMixin, ListView):
     template_name = "tweets/home.html"
+    stream_template_name = "tweets/tweet_list.html"
     model = Tweet
-    queryset = model.objects.select_related("user").prefetch_related("liked_tweet").order_by("-created_at")
     context_object_name = "tweets"
 
+    def get_timeline(self):
+        return Tweet.objects.timeline()
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["liked_list"] = set(Like.objects.filter(user=self.request.user).values_list("tweet_id", flat=True))
+        return context
+
+
+class TopTimelineView(LoginRequiredMixin, ListView):
+    template_name = "tweets/top.html"
+    context_object_name = "tweets"
+
+    def get_queryset(self):
+        return top_timeline(self.request.user.pk)
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context["liked_list"] = (
-            Like.objects.select_related("tweet").filter(user=self.request.user).values_list("tweet", flat=True)
+        context["liked_list"] = set(
+            Like.objects.filter(
+                user=self.request.user, tweet_id__in=[tweet.id for tweet in self.object_list]
+            ).values_list("tweet_id", flat=True)
         )
         return context
 
 
-class TweetDetailView(LoginRequiredMixin, DetailView):
+class TweetDetailView(LoginRequiredMixin, CachedResponseMixin, DetailView):
     template_name = "tweets/detail.html"
     model = Tweet
-    queryset = Tweet.objects.select_related("user")
+    queryset = Tweet.objects.select_related("user").with_like_count()
+    context_object_name = "tweet"
+
+    def get_cache_entities(self):
+        return [f"tweet:{self.kwargs['pk']}"]
+
+    def get_object(self, queryset=None):
+        try:
+            return super().get_object(queryset)
+        except Http404:
+            card = ArchivedTweet.objects.filter(pk=self.kwargs["pk"]).cards().first()
+            if card is None:
+                raise
+            return card
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        liked_list = (
-            Like.objects.filter(tweet=self.object, user=self.request.user)
-            .prefetch_related("user")
-            .values_list("tweet", flat=True)
+        context["liked_list"] = set(
+            Like.objects.filter(tweet_id=self.object.pk, user=self.request.user).values_list("tweet_id", flat=True)
         )
-        context["liked_list"] = liked_list
+        context["tweets"] = [self.object]
         return context
 
 
-class TweetCreateView(LoginRequiredMixin, CreateView):
+class TweetCreateView(LoginRequiredMixin, RateLimitMixin, CreateView):
     model = Tweet
     template_name = "tweets/create.html"
     fields = ["title", "content"]
     success_url = reverse_lazy("tweets:home")
 
     def form_valid(self, form):
+        fp = None
+        if settings.DUPLICATE_DETECTION:
+            fp = fingerprint(form.cleaned_data["title"], form.cleaned_data["content"])
+            verdict, retry_after = check(self.request.user.pk, fp)
+            if verdict == DUPLICATE:
+                form.add_error(None, "同じ内容のツイートは続けて投稿できません。")
+                return self.form_invalid(form)
+            if verdict == FLOOD:
+                response = HttpResponseTooManyRequests("too many identical tweets.")
+                response["Retry-After"] = str(retry_after)
+                return response
         form.instance.user = self.request.user
-        return super().form_valid(form)
+        with transaction.atomic():
+            response = super().form_valid(form)
+            record_change("tweet", Change.CREATE, str(self.object.pk), user_id=self.request.user.pk)
+        if fp is not None:
+            remember(self.request.user.pk, fp)
+        record_write("tweet_create")
+        invalidate_tags(f"user:{self.request.user.pk}")
+        if "@" in self.object.content:
+            enqueue_on_commit(notify_mentions, self.object.pk)
+        return response
 
 
 class TweetDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
@@ -57,12 +122,23 @@ class TweetDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
     def test_func(self):
         return self.get_object().user == self.request.user
 
+    def form_valid(self, form):
+        # Hide the tweet now; its likes are removed later by purge_deleted.
+        self.object.soft_delete()
+        response = HttpResponseRedirect(self.get_success_url())
+        record_write("tweet_delete")
+        invalidate_tags(f"user:{self.object.user_id}", f"tweet:{self.object.pk}")
+        return response
+
 
-class LikeView(LoginRequiredMixin, View):
+class LikeView(LoginRequiredMixin, RateLimitMixin, View):
     def post(self, request, *args, **kwargs):
         tweet_id = self.kwargs["pk"]
         tweet = get_object_or_404(Tweet, id=tweet_id)
-        Like.objects.get_or_create(tweet=tweet, user=self.request.user)
+        if self.like(tweet, request.user):
+            record_write("like")
+            invalidate_tags(f"tweet:{tweet_id}", f"user:{tweet.user_id}")
+            enqueue_on_commit(notify_like, tweet_id, request.user.pk)
         unlike_url = reverse("tweets:unlike", kwargs={"pk": tweet_id})
         tweet = Tweet.objects.prefetch_related("liked_tweet").get(id=tweet_id)
         like_count = tweet.liked_tweet.count()
@@ -75,13 +151,28 @@ class LikeView(LoginRequiredMixin, View):
         }
         return JsonResponse(context)
 
-
-class UnlikeView(LoginRequiredMixin, View):
+    def like(self, tweet, user):
+        # Definite misses go straight to the insert; the unique constraint
+        # covers both a false "maybe" and a concurrent like.
+        if liked_filter.might_contain(user.pk, tweet.pk) and Like.objects.filter(tweet=tweet, user=user).exists():
+            return False
+        try:
+            with transaction.atomic():
+                Like.objects.create(tweet=tweet, user=user)
+                record_change("like", Change.CREATE, f"{tweet.pk}:{user.pk}", tweet_id=tweet.pk, user_id=user.pk)
+        except IntegrityError:
+            return False
+        liked_filter.add(user.pk, tweet.pk)
+        return True
+
+
+class UnlikeView(LoginRequiredMixin, RateLimitMixin, View):
     def post(self, request, *args, **kwargs):
         tweet_id = self.kwargs["pk"]
         tweet = get_object_or_404(Tweet, pk=tweet_id)
-        if like := Like.objects.filter(user=self.request.user, tweet=tweet):
-            like.delete()
+        if self.unlike(tweet, request.user):
+            record_write("unlike")
+            invalidate_tags(f"tweet:{tweet_id}", f"user:{tweet.user_id}")
         is_liked = False
         like_url = reverse("tweets:like", kwargs={"pk": tweet_id})
         tweet = Tweet.objects.prefetch_related("liked_tweet").get(id=tweet_id)
@@ -93,3 +184,10 @@ class UnlikeView(LoginRequiredMixin, View):
             "like_url": like_url,
         }
         return JsonResponse(context)
+
+    def unlike(self, tweet, user):
+        with transaction.atomic():
+            deleted, _ = Like.objects.filter(user=user, tweet=tweet).delete()
+            if deleted:
+                record_change("like", Change.DELETE, f"{tweet.pk}:{user.pk}", tweet_id=tweet.pk, user_id=user.pk)
+        return deleted
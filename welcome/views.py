@@ -1,5 +1,7 @@
 from django.views.generic import TemplateView
 
+from mysite.responsecache import CachedResponseMixin
 
-class WelcomeView(TemplateView):
+
+class WelcomeView(CachedResponseMixin, TemplateView):
     template_name = "welcome/index.html"